@@ -0,0 +1,349 @@
+# Copyright 2018 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A content addressable cache of the files installed by packages.
+
+Each entry is stored in a directory named after its key and contains a
+``manifest.json`` describing the installed files as well as the files
+themselves (relative to the install space).
+The modification time of the manifest is updated whenever an entry is being
+restored, which is used to evict the least recently used entries once the
+cache exceeds its maximum size.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tarfile
+import uuid
+
+from ament_tools.helper import clone_file
+
+ARTIFACT_KEY_CACHE = 'artifact_key'
+ARTIFACT_LINKS_CACHE = 'artifact_links'
+
+DEFAULT_MAX_SIZE = 10 * 1024  # in MiB
+
+MANIFEST_FILENAME = 'manifest.json'
+
+# the files generated in the build space listing the installed files
+INSTALL_MANIFESTS = ['install_manifest.txt', 'install.log']
+
+# the options which affect the installed files
+KEY_OPTIONS = [
+    'ament_cmake_args',
+    'build_tests',
+    'cmake_args',
+    'install_space',
+    'python_install_engine',
+]
+
+
+def compute_artifact_key(source_fingerprint, build_type, options, toolchain,
+                         dependency_keys):
+    """
+    Compute the key of the artifacts of a package.
+
+    :param str source_fingerprint: the fingerprint of the source space
+    :param str build_type: the build type of the package
+    :param dict options: the options affecting the installed files
+    :param dict toolchain: the identity of the toolchain
+    :param dict dependency_keys: the artifact keys of the dependencies
+    :returns: the hex digest of the key
+    :rtype: str
+    """
+    content = json.dumps({
+        'build_type': build_type,
+        'dependencies': dependency_keys,
+        'options': options,
+        'source': source_fingerprint,
+        'toolchain': toolchain,
+    }, sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def get_installed_files(context):
+    """
+    Get the files installed by a package.
+
+    The files are collected from the install manifests in the build space, the
+    files deployed by ament_tools and the package marker file.
+
+    :returns: a sorted list of paths relative to the install space, or
+        ``None`` if the installed files can't be determined
+    """
+    install_space = os.path.abspath(context.install_space)
+    paths = []
+    found_manifest = False
+    for name in INSTALL_MANIFESTS:
+        manifest_path = os.path.join(context.build_space, name)
+        if not os.path.isfile(manifest_path):
+            continue
+        found_manifest = True
+        with open(manifest_path, 'r') as h:
+            paths += [line.strip() for line in h.read().splitlines() if line.strip()]
+    if not found_manifest:
+        return None
+    paths += context.get('deployed_files', [])
+    paths.append(os.path.join(
+        install_space, 'share', 'ament_index', 'resource_index', 'packages',
+        context.package_manifest.name))
+
+    files = set()
+    for path in paths:
+        path = os.path.abspath(path)
+        if not path.startswith(install_space + os.sep):
+            # files outside of the install space can't be restored
+            return None
+        if os.path.lexists(path) and not os.path.isdir(path):
+            files.add(os.path.relpath(path, install_space))
+    return sorted(files)
+
+
+def _get_tree_size(path):
+    size = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            size += os.lstat(os.path.join(dirpath, filename)).st_size
+    return size
+
+
+def is_path_within(rel_path):
+    """Check if a relative path stays within the directory it is relative to."""
+    if not isinstance(rel_path, str) or not rel_path or os.path.isabs(rel_path):
+        return False
+    rel_path = os.path.normpath(rel_path)
+    return rel_path != os.curdir and rel_path != os.pardir and \
+        not rel_path.startswith(os.pardir + os.sep)
+
+
+class ArtifactCache:
+    """
+    Store and restore the installed files of packages.
+
+    The cache directory can be shared between multiple checkouts and machines
+    (e.g. on a network file system), entries are written to a temporary
+    location first and then moved into place atomically.
+    """
+
+    def __init__(self, path, max_size=DEFAULT_MAX_SIZE):
+        """
+        :param str path: the cache directory
+        :param int max_size: the maximum size of the cache in MiB
+        """
+        self.path = os.path.abspath(path)
+        self.max_size = max_size * 1024 * 1024
+
+    def _get_entry_path(self, key):
+        return os.path.join(self.path, key[:2], key)
+
+    def _load_manifest(self, key):
+        manifest_path = os.path.join(self._get_entry_path(key), MANIFEST_FILENAME)
+        try:
+            with open(manifest_path, 'r') as h:
+                return json.loads(h.read())
+        except (OSError, ValueError):
+            return None
+
+    def _validate_manifest(self, key, manifest):
+        # the manifest of a fetched artifact must not reach outside of the
+        # install space
+        try:
+            rel_paths = list(manifest['files']) + list(manifest['symlinks'].keys())
+        except (AttributeError, KeyError, TypeError):
+            raise ValueError("Artifact '%s' has an invalid manifest" % key)
+        for rel_path in rel_paths:
+            if not is_path_within(rel_path):
+                raise ValueError(
+                    "Unexpected path '%s' in the manifest of artifact '%s'" % (rel_path, key))
+
+    def has(self, key):
+        return self._load_manifest(key) is not None
+
+    def export_entry(self, key, fileobj):
+        """
+        Write an entry as a gzip compressed tarball.
+
+        :returns: ``False`` if the key is not in the cache
+        """
+        if not self.has(key):
+            return False
+        with tarfile.open(fileobj=fileobj, mode='w:gz') as tar:
+            tar.add(self._get_entry_path(key), arcname='.')
+        return True
+
+    def import_entry(self, key, fileobj):
+        """
+        Add an entry from a tarball created by :py:meth:`export_entry`.
+
+        :returns: ``True`` if a new entry has been added
+        :raises ValueError: if the tarball contains unexpected members
+        """
+        if self.has(key):
+            return False
+        tmp_path = os.path.join(self.path, 'tmp', '%s.%s' % (key, uuid.uuid4().hex))
+        try:
+            with tarfile.open(fileobj=fileobj, mode='r:gz') as tar:
+                members = tar.getmembers()
+                for member in members:
+                    name = os.path.normpath(member.name)
+                    if os.path.isabs(name) or name.split(os.sep)[0] == '..' or \
+                            not (member.isfile() or member.isdir()):
+                        raise ValueError(
+                            "Unexpected member '%s' in artifact '%s'" % (member.name, key))
+                kwargs = {}
+                if hasattr(tarfile, 'data_filter'):
+                    kwargs['filter'] = 'data'
+                tar.extractall(tmp_path, members=members, **kwargs)
+            manifest_path = os.path.join(tmp_path, MANIFEST_FILENAME)
+            if not os.path.isfile(manifest_path):
+                raise ValueError("Artifact '%s' lacks a manifest" % key)
+            with open(manifest_path, 'r') as h:
+                self._validate_manifest(key, json.loads(h.read()))
+            entry_path = self._get_entry_path(key)
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+            try:
+                os.rename(tmp_path, entry_path)
+            except OSError:
+                return False
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        self.evict(keep=[key])
+        return True
+
+    def store(self, key, install_space, files):
+        """
+        Store the installed files of a package.
+
+        Existing entries are kept untouched.
+
+        :param str key: the artifact key
+        :param str install_space: the install space containing the files
+        :param list files: the paths relative to the install space
+        :returns: ``True`` if a new entry has been added
+        """
+        if self.has(key):
+            return False
+        tmp_path = os.path.join(self.path, 'tmp', '%s.%s' % (key, uuid.uuid4().hex))
+        symlinks = {}
+        try:
+            for rel_path in files:
+                source_path = os.path.join(install_space, rel_path)
+                if os.path.islink(source_path):
+                    symlinks[rel_path] = os.readlink(source_path)
+                    continue
+                destination_path = os.path.join(tmp_path, 'files', rel_path)
+                os.makedirs(os.path.dirname(destination_path), exist_ok=True)
+                # never share the inode with the install space since the
+                # installed file might be modified later
+                clone_file(source_path, destination_path, allow_hardlink=False)
+            os.makedirs(tmp_path, exist_ok=True)
+            with open(os.path.join(tmp_path, MANIFEST_FILENAME), 'w') as h:
+                h.write(json.dumps({
+                    'files': [f for f in files if f not in symlinks],
+                    'size': _get_tree_size(tmp_path),
+                    'symlinks': symlinks,
+                }, sort_keys=True))
+            entry_path = self._get_entry_path(key)
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+            try:
+                os.rename(tmp_path, entry_path)
+            except OSError:
+                # another process stored the same entry concurrently
+                return False
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        self.evict(keep=[key])
+        return True
+
+    def restore(self, key, install_space):
+        """
+        Restore the installed files of a package into the install space.
+
+        :param str key: the artifact key
+        :param str install_space: the install space
+        :returns: a list of the restored files which are hardlinks of the
+            cached files, or ``None`` if the key is not in the cache or its
+            manifest is invalid
+        """
+        manifest = self._load_manifest(key)
+        if manifest is None:
+            return None
+        try:
+            self._validate_manifest(key, manifest)
+        except ValueError as e:
+            print(str(e), file=sys.stderr)
+            return None
+        entry_path = self._get_entry_path(key)
+        hardlinks = []
+        for rel_path in manifest['files']:
+            destination_path = os.path.join(install_space, rel_path)
+            os.makedirs(os.path.dirname(destination_path), exist_ok=True)
+            if os.path.lexists(destination_path):
+                os.remove(destination_path)
+            method = clone_file(
+                os.path.join(entry_path, 'files', rel_path), destination_path)
+            if method == 'hardlink':
+                hardlinks.append(rel_path)
+        for rel_path, target in manifest['symlinks'].items():
+            destination_path = os.path.join(install_space, rel_path)
+            os.makedirs(os.path.dirname(destination_path), exist_ok=True)
+            if os.path.lexists(destination_path):
+                os.remove(destination_path)
+            os.symlink(target, destination_path)
+        # mark the entry as recently used
+        os.utime(os.path.join(entry_path, MANIFEST_FILENAME))
+        return hardlinks
+
+    def evict(self, keep=None):
+        """
+        Remove the least recently used entries exceeding the maximum size.
+
+        :param list keep: keys which must not be removed
+        """
+        keep = keep or []
+        entries = []
+        total_size = 0
+        for prefix in os.listdir(self.path):
+            if len(prefix) != 2:
+                continue
+            for key in os.listdir(os.path.join(self.path, prefix)):
+                manifest_path = os.path.join(self.path, prefix, key, MANIFEST_FILENAME)
+                manifest = self._load_manifest(key)
+                if manifest is None:
+                    continue
+                try:
+                    last_used = os.stat(manifest_path).st_mtime
+                except OSError:
+                    continue
+                entries.append((last_used, key, manifest['size']))
+                total_size += manifest['size']
+        for _, key, size in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            if key in keep:
+                continue
+            entry_path = self._get_entry_path(key)
+            # move the entry out of the way first to not expose partial entries
+            tmp_path = os.path.join(self.path, 'tmp', '%s.%s' % (key, uuid.uuid4().hex))
+            os.makedirs(os.path.dirname(tmp_path), exist_ok=True)
+            try:
+                os.rename(entry_path, tmp_path)
+            except OSError:
+                continue
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            total_size -= size
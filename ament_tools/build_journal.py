@@ -0,0 +1,235 @@
+# Copyright 2018 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import os
+from threading import Lock
+
+from ament_tools.fingerprint import compute_package_fingerprint
+from ament_tools.fingerprint import compute_tree_stamp
+
+# each verb has its own journal, e.g. build_journal.json
+JOURNAL_FILENAME = '{verb}_journal.json'
+
+STATE_FAILED = 'failed'
+STATE_NOT_STARTED = 'not started'
+STATE_SUCCEEDED = 'succeeded'
+
+# options which only select or schedule packages but don't affect their result
+IGNORED_OPTIONS = [
+    'artifact_cache',
+    'artifact_cache_size',
+    'artifact_cache_url',
+    'basepath',
+    'directory',
+    'end_with',
+    'explain_rebuild',
+    'install_mode',
+    'ionice',
+    'make_flags',
+    'nice',
+    'only_packages',
+    'parallel',
+    'path',
+    'python_workers',
+    'resume',
+    'skip_packages',
+    'skip_unchanged',
+    'start_with',
+    'super_build',
+    'workers',
+]
+
+
+def _is_plain_value(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return True
+    if isinstance(value, (list, tuple)):
+        return all(_is_plain_value(v) for v in value)
+    return False
+
+
+def get_fingerprinted_options(opts, ignored_options=None):
+    """
+    Get the options which affect the result of processing a package.
+
+    Only options with plain values (strings, numbers, booleans and lists of
+    those) are considered.
+    Options which only affect the package selection or scheduling are
+    ignored.
+
+    :param opts: the per package options
+    :type opts: :py:class:`argparse.Namespace`
+    :param list ignored_options: names of options to ignore, defaults to
+        ``IGNORED_OPTIONS``
+    :returns: a dictionary of option names and values
+    """
+    if ignored_options is None:
+        ignored_options = IGNORED_OPTIONS
+    data = {}
+    for key, value in vars(opts).items():
+        if key in ignored_options or not _is_plain_value(value):
+            continue
+        data[key] = value
+    return data
+
+
+def compute_options_fingerprint(opts, callback=None, ignored_options=None):
+    """
+    Compute a fingerprint of the options used to process a package.
+
+    See :py:func:`get_fingerprinted_options` for the considered options.
+
+    :param opts: the per package options
+    :type opts: :py:class:`argparse.Namespace`
+    :param callback: the callable processing the package, its qualified name
+        is part of the fingerprint
+    :param list ignored_options: names of options to ignore, defaults to
+        ``IGNORED_OPTIONS``
+    :returns: the hex digest of the fingerprint
+    :rtype: str
+    """
+    data = _get_options_data(opts, callback, ignored_options)
+    content = json.dumps(data, sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def _get_options_data(opts, callback, ignored_options):
+    data = get_fingerprinted_options(opts, ignored_options=ignored_options)
+    if callback is not None:
+        data['__callback__'] = '%s.%s' % (
+            callback.__module__, getattr(callback, '__qualname__', callback.__name__))
+    return data
+
+
+def compute_journal_fingerprint(opts, callback=None, dependency_fingerprints=None):
+    """
+    Compute the fingerprint of a package recorded in the journal.
+
+    Beside the options (see :py:func:`compute_options_fingerprint`) it covers
+    a stamp of the files in the source space of the package and the
+    fingerprints of its dependencies.
+
+    :param opts: the per package options
+    :type opts: :py:class:`argparse.Namespace`
+    :param callback: the callable processing the package
+    :param dict dependency_fingerprints: the journal fingerprints of the
+        dependencies of the package
+    :returns: the hex digest of the fingerprint
+    :rtype: str
+    """
+    source_stamp = compute_tree_stamp(
+        opts.path, ignored_paths=[opts.build_space, opts.install_space])
+    return compute_package_fingerprint(
+        json.dumps(source_stamp), _get_options_data(opts, callback, IGNORED_OPTIONS),
+        dependency_fingerprints or {})
+
+
+class BuildJournal:
+    """
+    Persist the state of each package processed in a workspace.
+
+    The journal is stored as a JSON file in the build space and is updated
+    every time the state of a package changes.
+    Each verb uses a separate journal since e.g. testing a package doesn't
+    affect whether it has been built.
+    This allows a later invocation to resume after a failed or interrupted
+    build by skipping packages which have already been processed successfully
+    with the same options.
+
+    The journal can be used from multiple threads.
+    """
+
+    def __init__(self, build_space, verb='build'):
+        self.path = os.path.join(build_space, JOURNAL_FILENAME.format(verb=verb))
+        self._lock = Lock()
+        self._packages = self._load()
+
+    def _load(self):
+        if not os.path.isfile(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as h:
+                data = json.loads(h.read())
+        except ValueError:
+            # a journal which can't be parsed is treated as empty
+            return {}
+        return data.get('packages', {})
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = '%s.%d.tmp' % (self.path, os.getpid())
+        with open(tmp_path, 'w') as h:
+            h.write(json.dumps({'packages': self._packages}, sort_keys=True))
+        os.replace(tmp_path, self.path)
+
+    def get_state(self, package_name):
+        with self._lock:
+            return self._packages.get(package_name, {}).get('state', STATE_NOT_STARTED)
+
+    def is_up_to_date(self, package_name, fingerprint):
+        """Check if the package succeeded before with the same fingerprint."""
+        with self._lock:
+            entry = self._packages.get(package_name, {})
+        return entry.get('state') == STATE_SUCCEEDED and \
+            entry.get('fingerprint') == fingerprint
+
+    def set_state(self, package_name, state, fingerprint=None):
+        assert state in [STATE_FAILED, STATE_NOT_STARTED, STATE_SUCCEEDED]
+        with self._lock:
+            self._packages[package_name] = {
+                'state': state,
+                'fingerprint': fingerprint,
+            }
+            self._save()
+
+    def set_states(self, states):
+        """
+        Update the state of multiple packages at once.
+
+        :param dict states: mapping of package names to a tuple of the state
+            and the fingerprint
+        """
+        with self._lock:
+            for package_name, (state, fingerprint) in states.items():
+                assert state in [STATE_FAILED, STATE_NOT_STARTED, STATE_SUCCEEDED]
+                self._packages[package_name] = {
+                    'state': state,
+                    'fingerprint': fingerprint,
+                }
+            self._save()
+
+
+def create_journaled_callback(journal, package_name, fingerprint, callback):
+    """
+    Wrap a per package callback to record its result in the journal.
+
+    :param journal: the journal to update
+    :type journal: :py:class:`BuildJournal`
+    :param str package_name: the name of the package
+    :param str fingerprint: the fingerprint of the package
+    :param callback: the per package callback
+    :returns: a callable with the same signature as the callback
+    """
+    def journaled_callback(opts):
+        try:
+            rc = callback(opts)
+        except BaseException:
+            journal.set_state(package_name, STATE_FAILED, fingerprint)
+            raise
+        journal.set_state(
+            package_name, STATE_FAILED if rc else STATE_SUCCEEDED, fingerprint)
+        return rc
+    return journaled_callback
@@ -15,6 +15,8 @@
 import os
 
 from .context import ContextExtender
+from .environment_snapshots import get_dependency_environment
+from .helper import write_file_if_changed
 
 IS_WINDOWS = os.name == 'nt'
 
@@ -224,6 +226,47 @@ class BuildType:
             dependencies=context.build_dependencies + additional_dependencies,
             additional_lines=additional_lines)
 
+    def _get_command_prefix_and_env(
+        self, build_type, name, context, *,
+        additional_dependencies=None, additional_lines=None
+    ):
+        """
+        Get the command prefix and environment to run commands with.
+
+        On platforms other than Windows the prefix is empty and the
+        environment contains the merged snapshots of the dependencies.
+        On Windows or if ``additional_lines`` are passed the prefix is a
+        generated script sourcing the setup files of all dependencies and the
+        ``additional_lines`` and the environment is ``None``.
+
+        :returns: a tuple of the prefix and the environment
+        """
+        if additional_dependencies is None:
+            additional_dependencies = []
+        dependencies = context.build_dependencies + additional_dependencies
+        if IS_WINDOWS or additional_lines:
+            prefix = get_command_prefix(
+                '%s__%s' % (build_type, name),
+                context.build_space,
+                dependencies=dependencies,
+                additional_lines=additional_lines)
+            return prefix, None
+        return [], get_command_environment(context.build_space, dependencies)
+
+
+def get_command_environment(build_space, dependencies):
+    """
+    Get the environment with the setup files of all dependencies applied.
+
+    See :py:mod:`ament_tools.environment_snapshots`.
+
+    :param str build_space: the build space of the package
+    :param list dependencies: the share folders of the dependencies in
+        topological order
+    :returns: the environment dictionary
+    """
+    return get_dependency_environment(os.path.dirname(build_space), dependencies)
+
 
 def get_command_prefix(
     generated_filename, build_space, dependencies, additional_lines=None
@@ -259,9 +302,7 @@ def get_command_prefix(
 
     generated_file = os.path.join(
         build_space, '%s.%s' % (generated_filename, extension))
-    with open(generated_file, 'w') as h:
-        for line in lines:
-            h.write('%s\n' % line)
+    write_file_if_changed(generated_file, ''.join('%s\n' % line for line in lines))
 
     if not IS_WINDOWS:
         return ['.', generated_file, '&&']
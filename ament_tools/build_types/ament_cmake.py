@@ -24,6 +24,9 @@ from ament_tools.build_types.cmake_common import ninjabuild_exists_at
 from ament_tools.build_types.common import get_cached_config
 from ament_tools.build_types.common import set_cached_config
 
+from ament_tools.build_types.compiler_cache import get_compiler_cache_env
+from ament_tools.build_types.compiler_cache import get_compiler_launcher_cmake_args
+
 from ament_tools.helper import extract_argument_group
 
 IS_WINDOWS = os.name == 'nt'
@@ -84,6 +87,7 @@ class AmentCmakeBuildType(CmakeBuildType):
             'build_tests': context.build_tests,
             'install_space': context.install_space,
             'symlink_install': context.symlink_install,
+            'compiler_launcher': context.compiler_launcher,
         }
         if ament_cmake_config != cached_ament_cmake_config:
             should_run_configure = True
@@ -92,20 +96,24 @@ class AmentCmakeBuildType(CmakeBuildType):
         set_cached_config(context.build_space, 'ament_cmake_args',
                           ament_cmake_config)
         # Figure out if there is a setup file to source
-        prefix = self._get_command_prefix('build', context)
+        prefix, env = self._get_command_prefix_and_env('build', context)
         # Calculate any extra cmake args which are not common between cmake build types
         extra_cmake_args = []
         if should_run_configure:
             extra_cmake_args += ['-DBUILD_TESTING=%d' % int(context.build_tests)]
             if context.symlink_install:
                 extra_cmake_args += ['-DAMENT_CMAKE_SYMLINK_INSTALL=1']
+            extra_cmake_args += get_compiler_launcher_cmake_args(
+                context.compiler_launcher,
+                (cached_ament_cmake_config or {}).get('compiler_launcher'))
             extra_cmake_args += context.cmake_args
             extra_cmake_args += context.ament_cmake_args
         if context.use_ninja:
             extra_cmake_args += ['-G', 'Ninja']
         # Yield the cmake common on_build (defined in CmakeBuildType)
         for step in self._common_cmake_on_build(
-            should_run_configure, context, prefix, extra_cmake_args
+            should_run_configure, context, prefix, extra_cmake_args,
+            env=get_compiler_cache_env(context, env)
         ):
             yield step
 
@@ -15,6 +15,8 @@
 """Implements the BuildType support for cmake based ament packages."""
 
 from distutils.sysconfig import get_python_lib
+import functools
+import hashlib
 import os
 import re
 import shutil
@@ -25,9 +27,18 @@ from ament_package.templates import get_package_level_template_names
 from ament_tools.build_type import BuildAction
 from ament_tools.build_type import BuildType
 from ament_tools.build_types.common import expand_package_level_setup_files
+from ament_tools.build_types.common import get_cached_config
+from ament_tools.build_types.common import set_cached_config
+from ament_tools.byte_compile import BYTE_COMPILE_LIST
+from ament_tools.byte_compile import get_byte_compile_command
+from ament_tools.context import ContextExtender
+from ament_tools.environment_snapshots import prepend_path
 from ament_tools.helper import deploy_file
+from ament_tools.helper import write_file_if_changed
 from ament_tools.setup_arguments import get_data_files_mapping
 from ament_tools.setup_arguments import get_setup_arguments_with_context
+from ament_tools.wheel_install import build_wheel
+from ament_tools.wheel_install import install_wheel
 
 try:
     import pytest
@@ -36,11 +47,47 @@ except ImportError:
 
 IS_WINDOWS = os.name == 'nt'
 
+# the symlinks of a symlink install and the state of its setup.py develop step
+SYMLINK_INSTALL_CACHE = 'symlink_install'
+
 
 class AmentPythonBuildType(BuildType):
     build_type = 'ament_python'
     description = 'ament package built with Python'
 
+    def prepare_arguments(self, parser):
+        parser.add_argument(
+            '--python-install-engine',
+            choices=['setuptools', 'wheel'],
+            default='setuptools',
+            help="The engine installing Python packages without '--symlink-install': "
+                 "either 'setuptools' invoking 'setup.py install' (default) or "
+                 "'wheel' building a wheel through the PEP 517 hooks of the "
+                 'build backend and unpacking it into the install space')
+        parser.add_argument(
+            '--parallel-byte-compile',
+            action='store_true',
+            help='Byte-compile the installed Python files of Python packages '
+                 'with a pool of processes after the install step instead of '
+                 'within setuptools, files with an up-to-date compiled file '
+                 'are skipped')
+        parser.add_argument(
+            '--python-workers',
+            action='store_true',
+            help="Run the 'setup.py' commands of Python packages in pre-warmed "
+                 'worker interpreters which fork for each command instead of '
+                 'starting a new interpreter each time (not supported on Windows)')
+        return parser
+
+    def extend_context(self, options):
+        ce = ContextExtender()
+        ce.add(
+            'python_install_engine',
+            getattr(options, 'python_install_engine', None) or 'setuptools')
+        ce.add('python_workers', getattr(options, 'python_workers', False))
+        ce.add('parallel_byte_compile', getattr(options, 'parallel_byte_compile', False))
+        return ce
+
     def on_build(self, context):
         self._update_context_with_setup_arguments(context)
 
@@ -70,8 +117,7 @@ class AmentPythonBuildType(BuildType):
         destination_path = os.path.join(
             context.build_space, pythonpath_environment_hook)
         os.makedirs(os.path.dirname(destination_path), exist_ok=True)
-        with open(destination_path, 'w') as h:
-            h.write(content)
+        write_file_if_changed(destination_path, content)
 
         environment_hooks = [
             ament_prefix_path_environment_hook,
@@ -102,26 +148,25 @@ class AmentPythonBuildType(BuildType):
             '--cov-branch',
         ]
         additional_lines = []
-        if not IS_WINDOWS:
-            additional_lines.append(
-                'export PYTEST_ADDOPTS="%s"' % ' '.join(args))
-        else:
+        if IS_WINDOWS:
             # backslashes need to be escaped to be passed through env var
-            args = [a.replace('\\', '\\\\') for a in args]
-            additional_lines.append('set "PYTEST_ADDOPTS=%s"' % ' '.join(args))
+            additional_lines.append('set "PYTEST_ADDOPTS=%s"' % ' '.join(
+                a.replace('\\', '\\\\') for a in args))
         # also pass the exec dependencies into the command prefix file
-        prefix = self._get_command_prefix(
+        prefix, env = self._get_command_prefix_and_env(
             'test', context,
             additional_lines=additional_lines,
             additional_dependencies=context.exec_dependency_paths_in_workspace,
         )
+        if env is not None:
+            env['PYTEST_ADDOPTS'] = ' '.join(args)
         assert pytest, 'Could not find pytest'
         cmd = [
             context.python_interpreter,
             'setup.py', 'pytest',
             'egg_info', '--egg-base', context.build_space,
         ]
-        yield BuildAction(prefix + cmd, cwd=context.source_space)
+        yield BuildAction(prefix + cmd, cwd=context.source_space, env=env)
 
     def on_install(self, context):
         self._update_context_with_setup_arguments(context)
@@ -136,30 +181,38 @@ class AmentPythonBuildType(BuildType):
         os.makedirs(python_path, exist_ok=True)
 
         # Figure out if there is a setup file to source
-        prefix = self._get_command_prefix('install', context)
+        prefix, env = self._get_command_prefix_and_env('install', context)
 
         if not context.symlink_install:
-            for action in self._undo_develop(context, prefix) or []:
+            for action in self._undo_develop(context, prefix, env) or []:
                 yield action
 
-            # Execute the setup.py install step with lots of arguments
-            # to avoid placing any files in the source space
-            cmd = [
-                context.python_interpreter, 'setup.py',
-                'egg_info', '--egg-base', context.build_space,
-                'build', '--build-base', os.path.join(
-                    context.build_space, 'build'),
-                'install', '--prefix', context.install_space,
-                '--record', os.path.join(context.build_space, 'install.log'),
-                # prevent installation of dependencies specified in the setup.py file
-                '--single-version-externally-managed',
-            ]
-            self._add_install_layout(context, cmd)
-            cmd += [
-                'bdist_egg', '--dist-dir', os.path.join(
-                    context.build_space, 'dist'),
-            ]
-            yield BuildAction(prefix + cmd, cwd=context.source_space)
+            if context.get('python_install_engine') == 'wheel':
+                yield BuildAction(
+                    functools.partial(self._install_action_wheel, env=env),
+                    type='function')
+            else:
+                # Execute the setup.py install step with lots of arguments
+                # to avoid placing any files in the source space
+                cmd = [
+                    context.python_interpreter, 'setup.py',
+                    'egg_info', '--egg-base', context.build_space,
+                    'build', '--build-base', os.path.join(
+                        context.build_space, 'build'),
+                    'install', '--prefix', context.install_space,
+                    '--record', os.path.join(context.build_space, 'install.log'),
+                    # prevent installation of dependencies specified in the setup.py file
+                    '--single-version-externally-managed',
+                ]
+                if context.get('parallel_byte_compile'):
+                    # the installed files are compiled afterwards
+                    cmd.append('--no-compile')
+                self._add_install_layout(context, cmd)
+                cmd += [
+                    'bdist_egg', '--dist-dir', os.path.join(
+                        context.build_space, 'dist'),
+                ]
+                yield BuildAction(prefix + cmd, cwd=context.source_space, env=env)
 
         else:
             yield BuildAction(self._install_action_python, type='function')
@@ -175,7 +228,7 @@ class AmentPythonBuildType(BuildType):
                 cmd += ['install_data', '--install-dir', context.install_space]
             self._add_install_layout(context, cmd)
 
-            env = dict(os.environ)
+            env = dict(os.environ if env is None else env)
             # Ensure that develop packages in an overlay workspace will get preference in the event
             # of collision. For setuptools versions < 25.0.0, there is no impact. In version
             # 25.0.0, the default behavior changed from 'rewrite' to 'raw'. Specifying 'rewrite' is
@@ -184,9 +237,61 @@ class AmentPythonBuildType(BuildType):
             if 'SETUPTOOLS_SYS_PATH_TECHNIQUE' not in env:
                 env['SETUPTOOLS_SYS_PATH_TECHNIQUE'] = 'rewrite'
 
-            yield BuildAction(prefix + cmd, cwd=context.build_space, env=env)
+            # the state is determined after the symlinks have been updated
+            cached = get_cached_config(context.build_space, SYMLINK_INSTALL_CACHE) or {}
+            develop_state = self._get_develop_state(
+                context, prefix + cmd, env,
+                (cached.get('develop') or {}).get('outputs'))
+            if develop_state is None or develop_state != cached.get('develop'):
+                yield BuildAction(prefix + cmd, cwd=context.build_space, env=env)
+                yield BuildAction(
+                    functools.partial(self._store_develop_state, cmd=prefix + cmd, env=env),
+                    type='function')
+            else:
+                print("-- [ament] Skipping 'setup.py develop' since the entry points "
+                      'and metadata are unchanged')
+
+        if context.get('parallel_byte_compile'):
+            for action in self._byte_compile(context, prefix, env):
+                yield action
+
+    def _byte_compile(self, context, prefix, env=None):
+        # the files are only known after the previous actions have been performed
+        if not context.symlink_install:
+            python_path = os.path.join(
+                context.install_space, self._get_python_lib(context)) + os.sep
+            install_log = os.path.join(context.build_space, 'install.log')
+            if not os.path.exists(install_log):
+                return
+            with open(install_log, 'r') as h:
+                paths = [
+                    line.rstrip('\n') for line in h.readlines()
+                    if line.startswith(python_path) and line.rstrip('\n').endswith('.py')]
+        else:
+            # the compiled files end up in the source space where the
+            # interpreter would place them on the first import anyway
+            install_log = None
+            paths = []
+            for item in self._get_symlinked_python_items(context):
+                path = os.path.join(context.build_space, item)
+                if os.path.isfile(path):
+                    paths.append(path)
+                    continue
+                for dirpath, dirnames, filenames in os.walk(path):
+                    dirnames[:] = [d for d in dirnames if d != '__pycache__']
+                    paths += [
+                        os.path.join(dirpath, f) for f in sorted(filenames)
+                        if f.endswith('.py')]
+        if not paths:
+            return
 
-    def _undo_develop(self, context, prefix):
+        list_path = os.path.join(context.build_space, BYTE_COMPILE_LIST)
+        write_file_if_changed(list_path, ''.join('%s\n' % p for p in paths))
+        cmd = get_byte_compile_command(
+            context.python_interpreter, list_path, manifest_path=install_log)
+        yield BuildAction(prefix + cmd, cwd=context.build_space, env=env)
+
+    def _undo_develop(self, context, prefix, env=None):
         # Undo previous develop if .egg-info is found and develop symlinks
         egg_info = os.path.join(context.build_space, '%s.egg-info' %
                                 context.package_manifest.name)
@@ -201,7 +306,12 @@ class AmentPythonBuildType(BuildType):
                 '--uninstall',
             ]
             self._add_install_layout(context, cmd)
-            yield BuildAction(prefix + cmd, cwd=context.build_space)
+            yield BuildAction(prefix + cmd, cwd=context.build_space, env=env)
+            # the next symlink install needs to run setup.py develop again
+            cached = get_cached_config(context.build_space, SYMLINK_INSTALL_CACHE)
+            if cached and 'develop' in cached:
+                del cached['develop']
+                set_cached_config(context.build_space, SYMLINK_INSTALL_CACHE, cached)
 
     def _install_action_files(self, context):
         # deploy package manifest
@@ -276,32 +386,55 @@ class AmentPythonBuildType(BuildType):
             additional_dependencies=additional_dependencies,
             additional_lines=additional_lines)
 
+    def _get_command_prefix_and_env(
+        self, name, context, *,
+        additional_dependencies=None, additional_lines=None
+    ):
+        python_path = os.path.join(context.install_space, self._get_python_lib(context))
+        if additional_lines or IS_WINDOWS:
+            # the commands are run with a generated prefix instead of an environment
+            additional_lines = list(additional_lines or [])
+            if not IS_WINDOWS:
+                additional_lines.append('export PYTHONPATH="%s:$PYTHONPATH"' % python_path)
+            else:
+                additional_lines.append('set "PYTHONPATH={0};%PYTHONPATH%"'.format(python_path))
+        prefix, env = super(AmentPythonBuildType, self)._get_command_prefix_and_env(
+            AmentPythonBuildType.build_type, name, context,
+            additional_dependencies=additional_dependencies,
+            additional_lines=additional_lines)
+        if env is not None:
+            prepend_path(env, 'PYTHONPATH', python_path)
+        return prefix, env
+
     def _install_action_python(self, context):
         self._undo_install(context)
 
         items = ['setup.py']
         if os.path.exists(os.path.join(context.source_space, 'setup.cfg')):
             items.append('setup.cfg')
-        # add all first level packages
-        items += [p for p in context['setup.py']['packages'] if '.' not in p]
-        # relative python-ish paths are allowed as entries in py_modules, see:
-        # https://docs.python.org/3.5/distutils/setupscript.html#listing-individual-modules
-        py_modules = context['setup.py'].get('py_modules')
-        if py_modules:
-            py_modules_list = [p.replace('.', os.path.sep) + '.py' for p in py_modules]
-            for py_module in py_modules_list:
-                if not os.path.exists(os.path.join(context.source_space, py_module)):
-                    raise RuntimeError(
-                        "Provided py_modules '{0}' does not exist".format(py_module))
-            items += py_modules_list
+        items += self._get_symlinked_python_items(context)
         items += list(context['setup.py']['data_files'].keys())
 
+        # only apply the differences to the previously created symlinks
+        cached = get_cached_config(context.build_space, SYMLINK_INSTALL_CACHE) or {}
+        links = {
+            item: os.path.join(context.source_space, item) for item in items}
+        for item, src in cached.get('links', {}).items():
+            dst = os.path.join(context.build_space, item)
+            if item not in links and os.path.islink(dst):
+                os.remove(dst)
+
         # symlink files / folders from source space into build space
         for item in items:
             src = os.path.join(context.source_space, item)
             dst = os.path.join(context.build_space, item)
+            if cached.get('links', {}).get(item) == src and os.path.islink(dst):
+                continue
             dst_dir = os.path.dirname(dst)
             os.makedirs(dst_dir, exist_ok=True)
+            if os.path.islink(dst) and not os.path.exists(dst):
+                # dangling symlink
+                os.remove(dst)
             if os.path.exists(dst):
                 if not os.path.islink(dst) or \
                         not os.path.samefile(src, dst):
@@ -312,6 +445,83 @@ class AmentPythonBuildType(BuildType):
             if not os.path.exists(dst):
                 os.symlink(src, dst)
 
+        if cached.get('links') != links:
+            cached['links'] = links
+            set_cached_config(context.build_space, SYMLINK_INSTALL_CACHE, cached)
+
+    def _get_develop_state(self, context, cmd, env, outputs):
+        # the state of everything affecting the outcome of setup.py develop,
+        # None if its outputs are missing
+        if not outputs or not all(os.path.exists(o) for o in outputs):
+            return None
+        data_files = context['setup.py']['data_files']
+        if not all(
+            os.path.exists(os.path.join(context.install_space, dst))
+            for dst in data_files.values()
+        ):
+            return None
+        files = {}
+        for filename in ['setup.py', 'setup.cfg'] + sorted(data_files.keys()):
+            try:
+                st = os.stat(os.path.join(context.source_space, filename))
+            except OSError:
+                files[filename] = None
+                continue
+            files[filename] = [st.st_mtime_ns, st.st_size]
+        return {
+            # the entry points and the metadata
+            'arguments': context['setup.py'].get('arguments_digest'),
+            'command': cmd,
+            'files': files,
+            'outputs': outputs,
+            'sys_path_technique': env.get('SETUPTOOLS_SYS_PATH_TECHNIQUE'),
+        }
+
+    def _store_develop_state(self, context, cmd, env):
+        # the egg-info in the build space and the egg-link in the install space
+        outputs = [
+            os.path.join(context.build_space, name)
+            for name in os.listdir(context.build_space) if name.endswith('.egg-info')]
+        python_path = os.path.join(context.install_space, self._get_python_lib(context))
+        for name in os.listdir(python_path):
+            if not name.endswith('.egg-link'):
+                continue
+            with open(os.path.join(python_path, name), 'r') as h:
+                if os.path.realpath(h.readline().rstrip('\n')) == \
+                        os.path.realpath(context.build_space):
+                    outputs.append(os.path.join(python_path, name))
+        cached = get_cached_config(context.build_space, SYMLINK_INSTALL_CACHE) or {}
+        cached['develop'] = self._get_develop_state(context, cmd, env, sorted(outputs))
+        set_cached_config(context.build_space, SYMLINK_INSTALL_CACHE, cached)
+
+    def _install_action_wheel(self, context, env=None):
+        # the wheel replaces an installation done by setuptools
+        self._remove_easy_install_entry(context)
+        wheel_path = build_wheel(
+            context.source_space, context.build_space,
+            context.python_interpreter, env=env)
+        installed_files = install_wheel(
+            wheel_path, context.install_space, self._get_python_lib(context),
+            context.python_interpreter,
+            os.path.join(context.build_space, 'install.log'))
+        print("-- [ament] Installed %d files from '%s'" %
+              (len(installed_files), os.path.basename(wheel_path)))
+
+    def _get_symlinked_python_items(self, context):
+        # add all first level packages
+        items = [p for p in context['setup.py']['packages'] if '.' not in p]
+        # relative python-ish paths are allowed as entries in py_modules, see:
+        # https://docs.python.org/3.5/distutils/setupscript.html#listing-individual-modules
+        py_modules = context['setup.py'].get('py_modules')
+        if py_modules:
+            py_modules_list = [p.replace('.', os.path.sep) + '.py' for p in py_modules]
+            for py_module in py_modules_list:
+                if not os.path.exists(os.path.join(context.source_space, py_module)):
+                    raise RuntimeError(
+                        "Provided py_modules '{0}' does not exist".format(py_module))
+            items += py_modules_list
+        return items
+
     def _undo_install(self, context):
         # Undo previous install if install.log is found
         install_log = os.path.join(context.build_space, 'install.log')
@@ -338,30 +548,33 @@ class AmentPythonBuildType(BuildType):
                     pass
             os.remove(install_log)
 
-            # remove entry from easy-install.pth file
-            easy_install = os.path.join(
-                context.install_space, self._get_python_lib(context),
-                'easy-install.pth')
-            if os.path.exists(easy_install):
-                with open(easy_install, 'r') as h:
-                    content = h.read()
-                pattern = r'^\./%s-\d.+\.egg\n' % \
-                    re.escape(context.package_manifest.name)
-                matches = re.findall(pattern, content, re.MULTILINE)
-                if len(matches) > 0:
-                    assert len(matches) == 1, \
-                        "Multiple matching entries in '%s'" % easy_install
-                    content = content.replace(matches[0], '')
-                    with open(easy_install, 'w') as h:
-                        h.write(content)
+            self._remove_easy_install_entry(context)
+
+    def _remove_easy_install_entry(self, context):
+        # remove entry from easy-install.pth file
+        easy_install = os.path.join(
+            context.install_space, self._get_python_lib(context),
+            'easy-install.pth')
+        if os.path.exists(easy_install):
+            with open(easy_install, 'r') as h:
+                content = h.read()
+            pattern = r'^\./%s-\d.+\.egg\n' % \
+                re.escape(context.package_manifest.name)
+            matches = re.findall(pattern, content, re.MULTILINE)
+            if len(matches) > 0:
+                assert len(matches) == 1, \
+                    "Multiple matching entries in '%s'" % easy_install
+                content = content.replace(matches[0], '')
+                with open(easy_install, 'w') as h:
+                    h.write(content)
 
     def on_uninstall(self, context):
         yield BuildAction(self._uninstall_action_files, type='function')
 
         # Figure out if there is a setup file to source
-        prefix = self._get_command_prefix('uninstall', context)
+        prefix, env = self._get_command_prefix_and_env('uninstall', context)
 
-        for action in self._undo_develop(context, prefix) or []:
+        for action in self._undo_develop(context, prefix, env) or []:
             yield action
         self._undo_install(context)
 
@@ -411,6 +624,7 @@ class AmentPythonBuildType(BuildType):
             AmentPythonBuildType.build_type, context)
         data_files = get_data_files_mapping(args.get('data_files', []))
         context['setup.py'] = {
+            'arguments_digest': hashlib.sha256(repr(args).encode()).hexdigest(),
             'data_files': data_files,
             'packages': args['packages'],
             'py_modules': args.get('py_modules'),
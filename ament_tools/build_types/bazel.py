@@ -12,30 +12,70 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
 import subprocess
 
 from ament_tools.build_type import BuildAction
 from ament_tools.build_type import BuildType
 
+from ament_tools.build_types.common import get_cached_config
+from ament_tools.build_types.common import set_cached_config
+
 from ament_tools.context import ContextExtender
 
 from ament_tools.helper import extract_argument_group
 
+from ament_tools.verbs import VerbExecutionError
+
 from osrf_pycommon.process_utils import which
 
 BAZEL_EXECUTABLE = which('bazel')
 
 
-def _has_target(path, target):
-    # To query bazel for a list of all labels, we use:
-    # bazel query '//...' --output=label
-    cmd = [BAZEL_EXECUTABLE, 'query', '//...', '--output=label']
-    output = subprocess.check_output(cmd, cwd=path)
-    lines = output.decode().splitlines()
-    # Each line in the output starts with a double slash, followed by
-    # either a colon and a target name, or a package name.  We look to see
-    # if the requested target exists.
-    return target in lines
+BAZEL_TARGETS_CACHE = 'bazel_targets'
+
+# the errors reported by bazel query when a label doesn't exist
+BAZEL_MISSING_TARGET_ERRORS = ['no such target', 'no such package']
+
+# the files defining the targets of the root package of a bazel workspace
+BAZEL_ROOT_FILES = ['BUILD', 'BUILD.bazel', 'WORKSPACE', 'WORKSPACE.bazel']
+
+
+def _get_root_files_key(path):
+    key = []
+    for name in BAZEL_ROOT_FILES:
+        try:
+            st = os.stat(os.path.join(path, name))
+        except FileNotFoundError:
+            key.append(None)
+            continue
+        key.append([st.st_mtime_ns, st.st_size])
+    return key
+
+
+def _has_target(path, target, build_space):
+    # Query only the requested label instead of all labels in the workspace.
+    # The result is cached in the build space until the BUILD / WORKSPACE
+    # files of the root package change.
+    key = _get_root_files_key(path)
+    cached = get_cached_config(build_space, BAZEL_TARGETS_CACHE)
+    if not cached or cached.get('key') != key:
+        cached = {'key': key, 'targets': {}}
+    if target not in cached['targets']:
+        cmd = [BAZEL_EXECUTABLE, 'query', target, '--output=label']
+        proc = subprocess.run(
+            cmd, cwd=path, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        stderr = proc.stderr.decode(errors='replace')
+        if proc.returncode != 0 and not any(
+            e in stderr for e in BAZEL_MISSING_TARGET_ERRORS
+        ):
+            # don't cache failures which don't tell if the target exists
+            raise VerbExecutionError(
+                "Failed to query bazel target '{0}' (return code {1}):\n{2}"
+                .format(target, proc.returncode, stderr.rstrip()))
+        cached['targets'][target] = proc.returncode == 0
+        set_cached_config(build_space, BAZEL_TARGETS_CACHE, cached)
+    return cached['targets'][target]
 
 
 class BazelBuildType(BuildType):
@@ -70,7 +110,7 @@ class BazelBuildType(BuildType):
         # clalancette: Note that bazel has no real concept of an install
         # target.  Thus, we define a de-facto one here which is a run
         # command with a target of //:install.
-        if _has_target(context.source_space, '//:install'):
+        if _has_target(context.source_space, '//:install', context.build_space):
             cmd = [BAZEL_EXECUTABLE, 'run'] + context.bazel_args + \
                 ['//:install', context.install_space]
             yield BuildAction(cmd, cwd=context.source_space)
@@ -82,7 +122,7 @@ class BazelBuildType(BuildType):
         # clalancette: Note that bazel has no real concept of an install
         # target.  Thus, we define a de-facto one here which is a run
         # command with a target of //:uninstall.
-        if _has_target(context.source_space, '//:uninstall'):
+        if _has_target(context.source_space, '//:uninstall', context.build_space):
             cmd = [BAZEL_EXECUTABLE, 'run'] + context.bazel_args + \
                 ['//:uninstall', context.install_space]
             yield BuildAction(cmd, cwd=context.source_space)
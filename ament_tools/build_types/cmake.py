@@ -25,9 +25,11 @@ from ament_tools.build_type import BuildType
 
 from ament_tools.build_types.cmake_common import CMAKE_EXECUTABLE
 from ament_tools.build_types.cmake_common import CMAKE_EXECUTABLE_ENV
+from ament_tools.build_types.cmake_common import cmake_inputs_changed
 from ament_tools.build_types.cmake_common import cmakecache_exists_at
 from ament_tools.build_types.cmake_common import CTEST_EXECUTABLE
 from ament_tools.build_types.cmake_common import CTEST_EXECUTABLE_ENV
+from ament_tools.build_types.cmake_common import get_ninja_output_path_prefix
 from ament_tools.build_types.cmake_common import get_visual_studio_version
 from ament_tools.build_types.cmake_common import has_make_target
 from ament_tools.build_types.cmake_common import MAKE_EXECUTABLE
@@ -36,18 +38,34 @@ from ament_tools.build_types.cmake_common import MSBUILD_EXECUTABLE
 from ament_tools.build_types.cmake_common import NINJA_EXECUTABLE
 from ament_tools.build_types.cmake_common import ninjabuild_exists_at
 from ament_tools.build_types.cmake_common import project_file_exists_at
+from ament_tools.build_types.cmake_common import record_cmake_inputs
 from ament_tools.build_types.cmake_common import solution_file_exists_at
 from ament_tools.build_types.cmake_common import XCODEBUILD_EXECUTABLE
 
+from ament_tools.build_types.cmake_file_api import get_file_api_data
+from ament_tools.build_types.cmake_file_api import get_partial_build
+from ament_tools.build_types.cmake_file_api import has_build_target
+from ament_tools.build_types.cmake_file_api import write_file_api_query
+
+from ament_tools.build_types.cmake_seed_cache import apply_seed
+from ament_tools.build_types.cmake_seed_cache import get_seed
+
 from ament_tools.build_types.common import expand_package_level_setup_files
 from ament_tools.build_types.common import get_cached_config
 from ament_tools.build_types.common import set_cached_config
 
+from ament_tools.build_types.compiler_cache import get_compiler_cache_env
+from ament_tools.build_types.compiler_cache import get_compiler_launcher
+from ament_tools.build_types.compiler_cache import get_compiler_launcher_cmake_args
+from ament_tools.build_types.compiler_cache import record_compiler_cache_stats
+from ament_tools.build_types.compiler_cache import reset_compiler_cache_stats
+
 from ament_tools.context import ContextExtender
 
 from ament_tools.helper import compute_deploy_destination
 from ament_tools.helper import deploy_file
 from ament_tools.helper import extract_argument_group
+from ament_tools.helper import link_installed_files
 
 from ament_tools.verbs import VerbExecutionError
 
@@ -87,6 +105,20 @@ class CmakeBuildType(BuildType):
             '--use-ninja',
             action='store_true',
             help="Invoke 'cmake' with '-G Ninja' and call ninja instead of make.")
+        parser.add_argument(
+            '--cmake-target',
+            action='append',
+            default=[],
+            metavar='[PKG:]TARGET',
+            help='Only build the CMake target of the package PKG (or of all packages '
+                 'providing it) and the targets installed by the same install components, '
+                 'can be passed multiple times (Makefile and Ninja generators only)')
+        parser.add_argument(
+            '--cmake-seed-cache',
+            action='store_true',
+            help='Configure a probe project once per toolchain and use its results '
+                 'for the first configure of every CMake package (Makefile and '
+                 'Ninja generators only)')
 
     def argument_preprocessor(self, args):
         # The CMake pass-through flag collects dashed options.
@@ -110,6 +142,15 @@ class CmakeBuildType(BuildType):
         ce.add('ctest_args', getattr(options, 'ctest_args', []))
         ce.add('use_xcode', getattr(options, 'use_xcode', False))
         ce.add('use_ninja', getattr(options, 'use_ninja', False))
+        ce.add('cmake_seed_cache', getattr(options, 'cmake_seed_cache', False))
+        ce.add('cmake_target', getattr(options, 'cmake_target', []))
+        ce.add('super_build', getattr(options, 'super_build', False))
+        # the compiler launcher is only supported by the Makefile and Ninja generators
+        compiler_launcher = None
+        if not IS_WINDOWS and not getattr(options, 'use_xcode', False):
+            compiler_launcher = get_compiler_launcher(
+                getattr(options, 'compiler_cache', None))
+        ce.add('compiler_launcher', compiler_launcher)
         return ce
 
     def on_build(self, context):
@@ -131,6 +172,7 @@ class CmakeBuildType(BuildType):
             'build_tests': context.build_tests,
             'install_space': context.install_space,
             'symlink_install': context.symlink_install,
+            'compiler_launcher': context.compiler_launcher,
         }
         if cmake_config != cached_cmake_config:
             should_run_configure = True
@@ -139,30 +181,100 @@ class CmakeBuildType(BuildType):
         set_cached_config(context.build_space, 'cmake_args',
                           cmake_config)
         # Figure out if there is a setup file to source
-        prefix = self._get_command_prefix('build', context)
+        prefix, env = self._get_command_prefix_and_env('build', context)
         # Calculate any extra cmake args which are not common between cmake build types
         extra_cmake_args = []
         if should_run_configure:
+            extra_cmake_args += get_compiler_launcher_cmake_args(
+                context.compiler_launcher,
+                (cached_cmake_config or {}).get('compiler_launcher'))
             extra_cmake_args += context.cmake_args
         if context.use_ninja:
             extra_cmake_args += ['-G', 'Ninja']
         # Yield the cmake common on_build
         for step in self._common_cmake_on_build(
-            should_run_configure, context, prefix, extra_cmake_args
+            should_run_configure, context, prefix, extra_cmake_args,
+            env=get_compiler_cache_env(context, env)
         ):
             yield step
 
-    def _make_or_ninja_build(self, context, prefix):
+    def _make_or_ninja_build(self, context, prefix, env=None):
+        targets = self._get_build_targets(context)
         if context.use_ninja:
             if NINJA_EXECUTABLE is None:
                 raise VerbExecutionError("Could not find 'make' executable")
-            return BuildAction(prefix + [NINJA_EXECUTABLE] + context.make_flags)
+            return self._ninja_action(context, prefix, context.make_flags, targets, env=env)
         else:
             if MAKE_EXECUTABLE is None:
                 raise VerbExecutionError("Could not find 'make' executable")
-            return BuildAction(prefix + [MAKE_EXECUTABLE] + context.make_flags)
+            return BuildAction(
+                prefix + [MAKE_EXECUTABLE] + context.make_flags + targets, env=env)
+
+    def _get_cmake_targets(self, context):
+        # the targets selected with --cmake-target, an empty list for all targets
+        if IS_WINDOWS or self._using_xcode_generator(context):
+            return []
+        targets = []
+        for target in context.get('cmake_target') or []:
+            package_name, _, target = target.rpartition(':')
+            if package_name:
+                if package_name == context.package_manifest.name:
+                    targets.append(target)
+                continue
+            has_target = has_build_target(context.build_space, target)
+            if has_target:
+                targets.append(target)
+            elif has_target is None:
+                # only select workspace-wide targets known to exist in this package
+                print("-- [ament] Ignoring the CMake target '%s' since the targets of the "
+                      'package are unknown (requires CMake 3.14 or newer)' % target)
+        return targets
+
+    def _get_build_targets(self, context):
+        targets = self._get_cmake_targets(context)
+        if not targets:
+            return []
+        partial_build = get_partial_build(context.build_space, targets)
+        if partial_build is not None:
+            targets = partial_build[0]
+        print('-- [ament] Only building the CMake targets: %s' % ', '.join(targets))
+        return targets
+
+    def _partial_install(self, context, targets, prefix, env=None):
+        partial_build = get_partial_build(context.build_space, targets)
+        if partial_build is None:
+            print('-- [ament] Skipping the CMake install step since the install components '
+                  'of the selected targets are unknown (requires CMake 3.22 or newer)')
+            return
+        for component in partial_build[1]:
+            yield BuildAction(
+                prefix + [
+                    CMAKE_EXECUTABLE, '-DCOMPONENT=' + component, '-P', 'cmake_install.cmake'],
+                env=env)
+
+    def _ninja_action(self, context, prefix, args, targets, env=None):
+        path_prefix = get_ninja_output_path_prefix(context.build_space)
+        if path_prefix is None:
+            return BuildAction(prefix + [NINJA_EXECUTABLE] + args + targets, env=env)
+        # the build file of a package configured for the super-build only
+        # works from the build space base and doesn't declare default targets
+        cmd = prefix + [NINJA_EXECUTABLE, '-f', path_prefix + 'build.ninja'] + args
+        cmd += [path_prefix + target for target in targets or ['all']]
+        return BuildAction(cmd, cwd=os.path.dirname(context.build_space), env=env)
+
+    def _get_ninja_output_path_prefix_args(self, context):
+        if context.get('super_build'):
+            return [
+                '-DCMAKE_NINJA_OUTPUT_PATH_PREFIX=%s/' %
+                os.path.basename(context.build_space)]
+        if get_ninja_output_path_prefix(context.build_space):
+            return ['-UCMAKE_NINJA_OUTPUT_PATH_PREFIX']
+        return []
 
     def _using_xcode_generator(self, context):
+        file_api_data = get_file_api_data(context.build_space)
+        if file_api_data is not None:
+            return file_api_data['generator'] == 'Xcode'
         # Check CMake was invoked to generate a Xcode or Make project
         # The Xcode CMake generator will produce a file named
         # ALL_BUILD_cmakeRulesBuildPhase.makeRelease if the Xcode generator
@@ -171,13 +283,55 @@ class CmakeBuildType(BuildType):
             context.build_space, 'CMakeScripts', 'ALL_BUILD_cmakeRulesBuildPhase.makeRelease')
         return os.path.isfile(all_build_cmake_file_path)
 
-    def _common_cmake_on_build(self, should_run_configure, context, prefix, extra_cmake_args):
+    def _get_seed_cache_args(self, context, cmake_args, env):
+        # the probe must use the same arguments as the package, e.g. including
+        # the ament_cmake_args, except for the generator which is passed
+        # separately
+        probe_cmake_args = []
+        args = iter(cmake_args)
+        for arg in args:
+            if arg == '-G':
+                next(args, None)
+            elif not arg.startswith('-G'):
+                probe_cmake_args.append(arg)
+        # only the Makefile and Ninja generators are supported
+        if context.use_ninja:
+            generator_args = ['-G', 'Ninja']
+        elif IS_LINUX:
+            generator_args = []
+        elif IS_MACOSX and not context.use_xcode and \
+                not self._using_xcode_generator(context):
+            generator_args = ['-G', 'Unix Makefiles']
+        else:
+            return []
+        seed = get_seed(
+            os.path.dirname(context.build_space), probe_cmake_args, generator_args,
+            os.environ if env is None else env)
+        if seed is None:
+            return []
+        return apply_seed(seed, context.build_space)
+
+    def _record_cmake_inputs(self, context):
+        if not context.dry_run:
+            record_cmake_inputs(context.build_space)
+
+    def _common_cmake_on_build(
+        self, should_run_configure, context, prefix, extra_cmake_args, env=None
+    ):
+        if context.get('compiler_launcher') and not context.dry_run:
+            # only keep the compiler cache stats of the current build
+            reset_compiler_cache_stats(context.build_space, context.compiler_launcher, env=env)
+        if not context.dry_run:
+            # request the replies of the file API for the next configure
+            write_file_api_query(context.build_space)
         # Execute the configure step
         # (either cmake or the cmake_check_build_system make target)
         if should_run_configure:
             cmake_args = [context.source_space]
             cmake_args.extend(extra_cmake_args)
             cmake_args += ['-DCMAKE_INSTALL_PREFIX=' + context.install_space]
+            if context.use_ninja:
+                cmake_args += self._get_ninja_output_path_prefix_args(context)
             if IS_WINDOWS:
                 vsv = get_visual_studio_version()
                 if vsv is None:
@@ -201,22 +355,27 @@ class CmakeBuildType(BuildType):
                 raise VerbExecutionError(
                     "Could not find 'cmake' executable, try setting the "
                     'environment variable' + CMAKE_EXECUTABLE_ENV)
-            yield BuildAction(prefix + [CMAKE_EXECUTABLE] + cmake_args)
-        elif IS_LINUX:  # Check for reconfigure if available.
+            if context.get('cmake_seed_cache') and not context.dry_run and \
+                    not cmakecache_exists_at(context.build_space):
+                cmake_args[1:1] = self._get_seed_cache_args(context, extra_cmake_args, env)
+            yield BuildAction(prefix + [CMAKE_EXECUTABLE] + cmake_args, env=env)
+            yield BuildAction(self._record_cmake_inputs, type='function')
+        elif IS_LINUX and cmake_inputs_changed(context.build_space):
+            # Check for reconfigure if available.
             if MAKE_EXECUTABLE is None:
                 raise VerbExecutionError("Could not find 'make' executable")
             cmd = prefix + [MAKE_EXECUTABLE, 'cmake_check_build_system']
-            yield BuildAction(cmd)
+            yield BuildAction(cmd, env=env)
+            yield BuildAction(self._record_cmake_inputs, type='function')
         # Now execute the build step
         if IS_LINUX:
-            yield self._make_or_ninja_build(context, prefix)
+            yield self._make_or_ninja_build(context, prefix, env=env)
         elif IS_WINDOWS:
             if MSBUILD_EXECUTABLE is None:
                 raise VerbExecutionError("Could not find 'msbuild' executable")
             solution_file = solution_file_exists_at(
                 context.build_space, context.package_manifest.name)
             cmd = prefix + [MSBUILD_EXECUTABLE]
-            env = None
             # Convert make parallelism flags into msbuild flags
             msbuild_flags = [
                 x.replace('-j', '/m:') for x in context.make_flags if x.startswith('-j')
@@ -227,7 +386,7 @@ class CmakeBuildType(BuildType):
                 # then turn on /MP for the compiler (intra-project parallelism)
                 if any(x.startswith('/m') for x in msbuild_flags) and \
                    '/m:1' not in msbuild_flags:
-                    env = dict(os.environ)
+                    env = dict(os.environ if env is None else env)
                     if 'CL' in env:
                         # make sure env['CL'] doesn't include an /MP already
                         if not any(x.startswith('/MP') for x in env['CL'].split(' ')):
@@ -254,17 +413,20 @@ class CmakeBuildType(BuildType):
                 xcodebuild_flags += ['-configuration']
                 xcodebuild_flags += [self._get_configuration_from_cmake(context)]
                 cmd.extend(xcodebuild_flags)
-                yield BuildAction(cmd)
+                yield BuildAction(cmd, env=env)
             else:
-                yield self._make_or_ninja_build(context, prefix)
+                yield self._make_or_ninja_build(context, prefix, env=env)
         else:
             raise VerbExecutionError('Could not determine operating system')
+        # the generator is only resumed once the build step has finished
+        if context.get('compiler_launcher') and not context.dry_run:
+            record_compiler_cache_stats(context.build_space, context.compiler_launcher, env=env)
 
     def on_test(self, context):
         for step in self._common_cmake_on_test(context, 'cmake'):
             yield step
 
-    def _make_test(self, context, build_type, prefix):
+    def _make_test(self, context, build_type, prefix, env=None):
         if has_make_target(context.build_space, 'test') or context.dry_run:
             if MAKE_EXECUTABLE is None:
                 raise VerbExecutionError("Could not find 'make' executable")
@@ -285,7 +447,7 @@ class CmakeBuildType(BuildType):
                 # the valus is not quoted here
                 # since each item will be quoted by shlex.quote later if necessary
                 cmd.append('ARGS=%s' % ' '.join(args))
-            return BuildAction(cmd)
+            return BuildAction(cmd, env=env)
         else:
             self.warn("Could not run tests for package '{0}' because it has no "
                       "'test' target".format(context.package_manifest.name))
@@ -294,11 +456,11 @@ class CmakeBuildType(BuildType):
         assert context.build_tests
         # Figure out if there is a setup file to source
         # also pass the exec dependencies into the command prefix file
-        prefix = self._get_command_prefix(
+        prefix, env = self._get_command_prefix_and_env(
             'test', context,
             additional_dependencies=context.exec_dependency_paths_in_workspace)
         if IS_LINUX:
-            build_action = self._make_test(context, build_type, prefix)
+            build_action = self._make_test(context, build_type, prefix, env=env)
             if build_action:
                 yield build_action
         elif IS_WINDOWS:
@@ -320,7 +482,7 @@ class CmakeBuildType(BuildType):
                 context.ctest_args
             if context.retest_until_pass and context.test_iteration:
                 cmd += ['--rerun-failed']
-            yield BuildAction(cmd)
+            yield BuildAction(cmd, env=env)
         elif IS_MACOSX:
             if self._using_xcode_generator(context):
                 if XCODEBUILD_EXECUTABLE is None:
@@ -329,9 +491,9 @@ class CmakeBuildType(BuildType):
                 xcodebuild_args += ['-configuration']
                 xcodebuild_args += [self._get_configuration_from_cmake(context)]
                 xcodebuild_args += ['-target', 'RUN_TESTS']
-                yield BuildAction(prefix + [XCODEBUILD_EXECUTABLE] + xcodebuild_args)
+                yield BuildAction(prefix + [XCODEBUILD_EXECUTABLE] + xcodebuild_args, env=env)
             else:
-                build_action = self._make_test(context, build_type, prefix)
+                build_action = self._make_test(context, build_type, prefix, env=env)
                 if build_action:
                     yield build_action
         else:
@@ -349,7 +511,10 @@ class CmakeBuildType(BuildType):
             # get for CMake build type from the CMake cache
             line_prefix = 'CMAKE_BUILD_TYPE:'
             cmake_cache = os.path.join(context.build_space, 'CMakeCache.txt')
-            if os.path.exists(cmake_cache):
+            file_api_data = get_file_api_data(context.build_space)
+            if file_api_data is not None:
+                build_type = file_api_data['cache'].get('CMAKE_BUILD_TYPE')
+            elif os.path.exists(cmake_cache):
                 with open(cmake_cache, 'r') as h:
                     lines = h.read().splitlines()
                 for line in lines:
@@ -460,26 +625,31 @@ class CmakeBuildType(BuildType):
                 dst_subfolder=os.path.dirname(os.path.relpath(destination, context.build_space)),
                 skip_if_exists=True)
 
-    def _make_or_ninja_install(self, context, prefix):
+    def _make_or_ninja_install(self, context, prefix, env=None):
         if context.use_ninja:
             if NINJA_EXECUTABLE is None:
                 raise VerbExecutionError("Could not find 'ninja' executable")
-            return BuildAction(prefix + [NINJA_EXECUTABLE, 'install'])
+            return self._ninja_action(context, prefix, [], ['install'], env=env)
         else:
             if has_make_target(context.build_space, 'install') or context.dry_run:
                 if MAKE_EXECUTABLE is None:
                     raise VerbExecutionError("Could not find 'make' executable")
-                return BuildAction(prefix + [MAKE_EXECUTABLE, 'install'])
+                return BuildAction(prefix + [MAKE_EXECUTABLE, 'install'], env=env)
             else:
                 self.warn("Could not run installation for package '{0}' because it has no "
                           "'install' target".format(context.package_manifest.name))
 
     def _common_cmake_on_install(self, context):
         # Figure out if there is a setup file to source
-        prefix = self._get_command_prefix('install', context)
+        prefix, env = self._get_command_prefix_and_env('install', context)
 
-        if IS_LINUX:
-            build_action = self._make_or_ninja_install(context, prefix)
+        targets = self._get_cmake_targets(context)
+        if targets:
+            # only install the components needed by the selected targets
+            for build_action in self._partial_install(context, targets, prefix, env=env):
+                yield build_action
+        elif IS_LINUX:
+            build_action = self._make_or_ninja_install(context, prefix, env=env)
             if build_action:
                 yield build_action
         elif IS_WINDOWS:
@@ -492,7 +662,7 @@ class CmakeBuildType(BuildType):
                     prefix + [
                         MSBUILD_EXECUTABLE,
                         '/p:Configuration=' + self._get_configuration_from_cmake(context),
-                        install_project_file])
+                        install_project_file], env=env)
             else:
                 self.warn("Could not find Visual Studio project file 'INSTALL.vcxproj'")
         elif IS_MACOSX:
@@ -509,35 +679,50 @@ class CmakeBuildType(BuildType):
                         raise VerbExecutionError("Could not find 'xcodebuild' executable")
                     cmd = prefix + [XCODEBUILD_EXECUTABLE]
                     cmd += ['-target', 'install']
-                    yield BuildAction(cmd)
+                    yield BuildAction(cmd, env=env)
             else:
-                build_action = self._make_or_ninja_install(context, prefix)
+                build_action = self._make_or_ninja_install(context, prefix, env=env)
                 if build_action:
                     yield build_action
         else:
             raise VerbExecutionError('Could not determine operating system')
+        if context.get('install_mode') == 'link' and not context.symlink_install:
+            yield BuildAction(self._link_installed_files, type='function')
+
+    def _link_installed_files(self, context):
+        # CMake always copies the installed files
+        if context.dry_run:
+            return
+        install_manifest = os.path.join(context.build_space, 'install_manifest.txt')
+        if not os.path.isfile(install_manifest):
+            return
+        with open(install_manifest, 'r') as h:
+            installed_files = [line for line in h.read().splitlines() if line]
+        count = link_installed_files(context, installed_files)
+        if count:
+            print('-- [ament] Linked %d of %d installed files' % (count, len(installed_files)))
 
     def on_uninstall(self, context):
         # Call cmake common on_uninstall (defined in CmakeBuildType)
         for step in self._common_cmake_on_uninstall(context, 'cmake'):
             yield step
 
-    def _make_uninstall(self, context, build_type, prefix):
+    def _make_uninstall(self, context, build_type, prefix, env=None):
         if has_make_target(context.build_space, 'uninstall'):
             if MAKE_EXECUTABLE is None:
                 raise VerbExecutionError("Could not find 'make' executable")
             cmd = prefix + [MAKE_EXECUTABLE, 'uninstall']
-            return BuildAction(cmd)
+            return BuildAction(cmd, env=env)
         else:
             self.warn("Could not run uninstall for package '{0}' because it has no "
                       "'uninstall' target".format(context.package_manifest.name))
 
     def _common_cmake_on_uninstall(self, context, build_type):
         # Figure out if there is a setup file to source
-        prefix = self._get_command_prefix('uninstall', context)
+        prefix, env = self._get_command_prefix_and_env('uninstall', context)
 
         if IS_LINUX:
-            build_action = self._make_uninstall(context, build_type, prefix)
+            build_action = self._make_uninstall(context, build_type, prefix, env=env)
             if build_action:
                 yield build_action
         elif IS_WINDOWS:
@@ -545,7 +730,8 @@ class CmakeBuildType(BuildType):
                 raise VerbExecutionError("Could not find 'msbuild' executable")
             uninstall_project_file = project_file_exists_at(context.build_space, 'UNINSTALL')
             if uninstall_project_file is not None:
-                yield BuildAction(prefix + [MSBUILD_EXECUTABLE, uninstall_project_file])
+                yield BuildAction(
+                    prefix + [MSBUILD_EXECUTABLE, uninstall_project_file], env=env)
             else:
                 self.warn("Could not find Visual Studio project file 'UNINSTALL.vcxproj'")
         elif IS_MACOSX:
@@ -554,9 +740,9 @@ class CmakeBuildType(BuildType):
                     raise VerbExecutionError("Could not find 'xcodebuild' executable")
                 cmd = prefix + [XCODEBUILD_EXECUTABLE]
                 cmd += ['-target', 'uninstall']
-                yield BuildAction(cmd)
+                yield BuildAction(cmd, env=env)
             else:
-                build_action = self._make_uninstall(context, build_type, prefix)
+                build_action = self._make_uninstall(context, build_type, prefix, env=env)
                 if build_action:
                     yield build_action
         else:
@@ -571,3 +757,16 @@ class CmakeBuildType(BuildType):
             CmakeBuildType.build_type, name, context,
             additional_dependencies=additional_dependencies,
             additional_lines=additional_lines)
+
+    def _get_command_prefix_and_env(self, name, context, additional_dependencies=None):
+        additional_lines = None
+        if IS_WINDOWS:
+            additional_lines = ['set "CMAKE_PREFIX_PATH=%AMENT_PREFIX_PATH%;%CMAKE_PREFIX_PATH%"']
+        prefix, env = super(CmakeBuildType, self)._get_command_prefix_and_env(
+            CmakeBuildType.build_type, name, context,
+            additional_dependencies=additional_dependencies,
+            additional_lines=additional_lines)
+        if env is not None:
+            env['CMAKE_PREFIX_PATH'] = os.pathsep.join(
+                v for v in [env.get('AMENT_PREFIX_PATH'), env.get('CMAKE_PREFIX_PATH')] if v)
+        return prefix, env
@@ -15,6 +15,11 @@
 import os
 import re
 import subprocess
+from threading import Lock
+
+from ament_tools.build_types.cmake_file_api import has_build_target
+from ament_tools.build_types.common import get_cached_config
+from ament_tools.build_types.common import set_cached_config
 
 from osrf_pycommon.process_utils import which
 
@@ -42,15 +47,149 @@ MSBUILD_EXECUTABLE = which('msbuild')
 NINJA_EXECUTABLE = which('ninja')
 XCODEBUILD_EXECUTABLE = which('xcodebuild')
 
-__target_re = re.compile(r'^([a-zA-Z0-9][a-zA-Z0-9_\.]*):')
+__target_re = re.compile(rb'^([a-zA-Z0-9][a-zA-Z0-9_\.]*):')
+
+MAKE_TARGETS_CACHE = 'make_targets'
+
+_make_targets_cache = {}
+_make_targets_lock = Lock()
+
+
+def _discover_make_targets(path):
+    # stream the make database instead of buffering it since it can be huge
+    cmd = [MAKE_EXECUTABLE, '-pn']
+    process = subprocess.Popen(cmd, cwd=path, stdout=subprocess.PIPE)
+    targets = set()
+    for line in process.stdout:
+        match = __target_re.match(line)
+        if match:
+            targets.add(match.group(1).decode())
+    process.stdout.close()
+    rc = process.wait()
+    if rc:
+        raise subprocess.CalledProcessError(rc, cmd)
+    return targets
+
+
+def get_make_targets(path):
+    """
+    Get the targets of the Makefile in the given path.
+
+    The targets are cached in memory as well as in the given path and are only
+    determined again (using ``make -pn``) when the modification time or size
+    of the Makefile changes.
+    Therefore the result can be shared across invocations of different verbs.
+
+    :param str path: the path containing the Makefile
+    :returns: the set of target names, empty if there is no Makefile
+    """
+    try:
+        st = os.stat(os.path.join(path, 'Makefile'))
+    except FileNotFoundError:
+        return set()
+    key = [st.st_mtime_ns, st.st_size]
+    with _make_targets_lock:
+        cached = _make_targets_cache.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+    persisted = get_cached_config(path, MAKE_TARGETS_CACHE)
+    if persisted and persisted.get('makefile') == key:
+        targets = set(persisted['targets'])
+    else:
+        targets = _discover_make_targets(path)
+        set_cached_config(path, MAKE_TARGETS_CACHE, {
+            'makefile': key,
+            'targets': sorted(targets),
+        })
+    with _make_targets_lock:
+        _make_targets_cache[path] = (key, targets)
+    return targets
+
+
+CMAKE_INPUTS_CACHE = 'cmake_inputs'
+
+__makefile_depends_re = re.compile(r'set\(CMAKE_MAKEFILE_DEPENDS\s(.*?)\)', re.DOTALL)
+
+
+def _get_makefile_inputs(path):
+    # the files listed in CMakeFiles/Makefile.cmake which trigger a rerun
+    with open(os.path.join(path, 'CMakeFiles', 'Makefile.cmake'), 'r') as h:
+        match = __makefile_depends_re.search(h.read())
+    if not match:
+        return None
+    return re.findall(r'"([^"]*)"', match.group(1))
+
+
+def _get_ninja_inputs(path):
+    # the inputs of the edge regenerating build.ninja
+    with open(os.path.join(path, 'build.ninja'), 'r') as h:
+        content = h.read().replace('$\n', '')
+    for line in content.splitlines():
+        if line.startswith('build build.ninja') and 'RERUN_CMAKE' in line:
+            _, _, inputs = line.partition(' | ')
+            inputs = inputs.partition(' || ')[0]
+            return [
+                i.replace('\0', ' ').replace('$:', ':').replace('$$', '$')
+                for i in inputs.replace('$ ', '\0').split()]
+    return None
+
+
+def _get_cmake_inputs_state(path):
+    if os.path.exists(os.path.join(path, 'CMakeFiles', 'VerifyGlobs.cmake')):
+        # globs with CONFIGURE_DEPENDS need to be checked on every build
+        return None
+    if ninjabuild_exists_at(path):
+        generator_file = 'build.ninja'
+        get_inputs = _get_ninja_inputs
+    else:
+        generator_file = os.path.join('CMakeFiles', 'Makefile.cmake')
+        get_inputs = _get_makefile_inputs
+    try:
+        inputs = get_inputs(path)
+    except (OSError, UnicodeDecodeError):
+        return None
+    if inputs is None:
+        return None
+    state = {}
+    for input_path in [generator_file] + inputs:
+        try:
+            st = os.stat(os.path.join(path, input_path))
+        except OSError:
+            state[input_path] = None
+            continue
+        state[input_path] = [st.st_mtime_ns, st.st_size]
+    return state
+
+
+def record_cmake_inputs(path):
+    """
+    Record the state of the input files of the CMake generated build system.
+
+    The input files are determined from ``CMakeFiles/Makefile.cmake`` or
+    ``build.ninja`` and should be recorded after CMake has been invoked.
+    """
+    set_cached_config(path, CMAKE_INPUTS_CACHE, _get_cmake_inputs_state(path))
+
+
+def cmake_inputs_changed(path):
+    """
+    Check if any input file of the CMake generated build system has changed.
+
+    :returns: ``True`` if any input has changed since the inputs have been
+        recorded or if that can't be determined
+    """
+    recorded = get_cached_config(path, CMAKE_INPUTS_CACHE)
+    if recorded is None:
+        return True
+    return recorded != _get_cmake_inputs_state(path)
 
 
 def has_make_target(path, target):
-    global __target_re
-    output = subprocess.check_output([MAKE_EXECUTABLE, '-pn'], cwd=path)
-    lines = output.decode().splitlines()
-    targets = [m.group(1) for m in [__target_re.match(l) for l in lines] if m]
-    return target in targets
+    # prefer the replies of the CMake file API over querying make
+    has_target = has_build_target(path, target)
+    if has_target is not None:
+        return has_target
+    return target in get_make_targets(path)
 
 
 def cmakecache_exists_at(path):
@@ -68,6 +207,28 @@ def ninjabuild_exists_at(path):
     return os.path.isfile(ninjabuild)
 
 
+def get_ninja_output_path_prefix(path):
+    """
+    Get the prefix of all output paths in the build.ninja file of a build space.
+
+    The prefix is set for packages configured for the super-build.
+
+    :returns: the prefix ending with a slash or ``None``
+    """
+    try:
+        with open(os.path.join(path, 'CMakeCache.txt'), 'r') as h:
+            content = h.read()
+    except OSError:
+        return None
+    for line in content.splitlines():
+        if line.startswith('CMAKE_NINJA_OUTPUT_PATH_PREFIX:'):
+            value = line.partition('=')[2]
+            if not value:
+                return None
+            return value if value.endswith('/') else value + '/'
+    return None
+
+
 def solution_file_exists_at(path, package_name):
     solution_file = os.path.join(path, package_name + '.sln')
     if not os.path.isfile(solution_file):
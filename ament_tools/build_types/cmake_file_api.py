@@ -0,0 +1,235 @@
+# Copyright 2018 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Introspect CMake build trees using the CMake file API.
+
+A stateful query is written into the build space before CMake is invoked.
+CMake (3.14 and newer) then writes replies describing the code model and the
+cache on every configure.
+The replies are condensed into a structure which is cached per build space,
+in memory as well as on disk, and only read again after CMake wrote a new
+reply.
+For build trees without a reply (e.g. configured by an older CMake version)
+all functions return ``None`` and callers need to fall back to other
+means.
+"""
+
+import json
+import os
+from threading import Lock
+
+from ament_tools.build_types.common import get_cached_config
+from ament_tools.build_types.common import set_cached_config
+
+FILE_API_CLIENT = 'client-ament_tools'
+
+FILE_API_CACHE = 'cmake_file_api'
+
+FILE_API_QUERY = {
+    'requests': [
+        {'kind': 'codemodel', 'version': 2},
+        {'kind': 'cache', 'version': 2},
+    ],
+}
+
+_file_api_cache = {}
+_file_api_lock = Lock()
+
+
+def _get_api_path(build_space, *args):
+    return os.path.join(build_space, '.cmake', 'api', 'v1', *args)
+
+
+def write_file_api_query(build_space):
+    """Write the query for the replies used by ament_tools if necessary."""
+    path = _get_api_path(build_space, 'query', FILE_API_CLIENT, 'query.json')
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as h:
+        h.write(json.dumps(FILE_API_QUERY, sort_keys=True))
+
+
+def _get_latest_index(build_space):
+    try:
+        names = os.listdir(_get_api_path(build_space, 'reply'))
+    except OSError:
+        return None
+    # the latest index file has the largest name
+    indices = [n for n in names if n.startswith('index-') and n.endswith('.json')]
+    return max(indices) if indices else None
+
+
+def _read_reply(build_space, name):
+    with open(_get_api_path(build_space, 'reply', name), 'r') as h:
+        return json.loads(h.read())
+
+
+def _read_file_api(build_space, index_name):
+    index = _read_reply(build_space, index_name)
+    responses = index.get('reply', {}).get(FILE_API_CLIENT, {}) \
+        .get('query.json', {}).get('responses', [])
+    replies = {r['kind']: r['jsonFile'] for r in responses if 'jsonFile' in r}
+    if 'codemodel' not in replies or 'cache' not in replies:
+        return None
+
+    cache = _read_reply(build_space, replies['cache'])
+    codemodel = _read_reply(build_space, replies['codemodel'])
+    targets = {}
+    target_names = {}
+    has_install_rule = False
+    install_rules_known = True
+    installers = []
+    for configuration in codemodel['configurations']:
+        target_names.update({t['id']: t['name'] for t in configuration['targets']})
+        for target in configuration['targets']:
+            if target['name'] in targets:
+                continue
+            data = _read_reply(build_space, target['jsonFile'])
+            targets[target['name']] = {
+                'artifacts': [a['path'] for a in data.get('artifacts', [])],
+                'dependencies': sorted(
+                    target_names[d['id']] for d in data.get('dependencies', [])
+                    if d['id'] in target_names),
+                'install': [
+                    d['path'] for d in data.get('install', {}).get('destinations', [])],
+                'type': data['type'],
+            }
+            if data.get('install'):
+                has_install_rule = True
+        for directory in configuration['directories']:
+            if 'jsonFile' in directory:
+                # newer versions describe the install rules of each directory
+                directory_installers = _read_reply(build_space, directory['jsonFile']) \
+                    .get('installers', [])
+                if directory_installers:
+                    has_install_rule = True
+                if installers is not None:
+                    installers += [{
+                        'component': i['component'],
+                        'target': target_names.get(i.get('targetId')),
+                    } for i in directory_installers]
+                continue
+            installers = None
+            if directory.get('hasInstallRule'):
+                has_install_rule = True
+            elif 'hasInstallRule' not in directory:
+                # older versions don't provide the install rules of directories
+                install_rules_known = False
+
+    return {
+        'cache': {e['name']: e['value'] for e in cache['entries']},
+        'configurations': [c['name'] for c in codemodel['configurations']],
+        'generator': index['cmake']['generator']['name'],
+        'has_install_rule': has_install_rule if has_install_rule or install_rules_known else None,
+        'index': index_name,
+        'installers': installers,
+        'multi_config': index['cmake']['generator'].get('multiConfig', False),
+        'targets': targets,
+    }
+
+
+def get_file_api_data(build_space):
+    """
+    Get the information about a build tree from the replies of the file API.
+
+    :returns: a dictionary with the keys ``cache`` (mapping the cache entry
+        names to their values), ``configurations``, ``generator``,
+        ``has_install_rule`` (``None`` if unknown), ``installers`` (the
+        ``component`` and the ``target`` of each install rule, ``None`` if
+        unknown), ``multi_config`` and ``targets`` (mapping the target names
+        to their ``type``, the ``artifacts``, the ``dependencies`` and the
+        ``install`` destinations), or ``None`` if no reply is available
+    """
+    index_name = _get_latest_index(build_space)
+    if index_name is None:
+        return None
+    with _file_api_lock:
+        data = _file_api_cache.get(build_space)
+    if data and data['index'] == index_name:
+        return data
+    data = get_cached_config(build_space, FILE_API_CACHE)
+    # data cached by a previous version lacks the installers
+    if not data or data.get('index') != index_name or 'installers' not in data:
+        try:
+            data = _read_file_api(build_space, index_name)
+        except (KeyError, OSError, ValueError):
+            data = None
+        if data is None:
+            return None
+        set_cached_config(build_space, FILE_API_CACHE, data)
+    with _file_api_lock:
+        _file_api_cache[build_space] = data
+    return data
+
+
+def has_build_target(build_space, target):
+    """
+    Check if the build tree provides a target.
+
+    Besides the targets of the code model the builtin ``install`` and
+    ``test`` targets are considered.
+
+    :returns: a boolean or ``None`` if it can't be determined
+    """
+    data = get_file_api_data(build_space)
+    if data is None:
+        return None
+    if target == 'install':
+        return data['has_install_rule']
+    if target == 'test':
+        # the test target is generated together with the CTest file
+        return os.path.isfile(os.path.join(build_space, 'CTestTestfile.cmake'))
+    return target in data['targets']
+
+
+def get_partial_build(build_space, targets):
+    """
+    Get what needs to be built and installed for a subset of the targets.
+
+    Install components are installed as a whole, therefore the targets
+    installed by a component which contains any of the built targets are
+    being built too.
+    Components which don't install any target are always installed.
+
+    :param list targets: the names of the selected targets
+    :returns: a tuple of the targets to build and the components to install,
+        or ``None`` if the install rules are unknown
+    """
+    data = get_file_api_data(build_space)
+    if data is None or data['installers'] is None:
+        return None
+    components = {}
+    for installer in data['installers']:
+        components.setdefault(installer['component'], set())
+        if installer['target']:
+            components[installer['component']].add(installer['target'])
+
+    build_targets = set()
+    pending = list(targets)
+    while pending:
+        target = pending.pop()
+        if target in build_targets:
+            continue
+        build_targets.add(target)
+        pending += data['targets'].get(target, {}).get('dependencies', [])
+        for component_targets in components.values():
+            if target in component_targets:
+                pending += component_targets
+
+    install_components = [
+        c for c, component_targets in components.items()
+        if not component_targets or component_targets & build_targets]
+    return sorted(build_targets), sorted(install_components)
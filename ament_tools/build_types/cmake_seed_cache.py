@@ -0,0 +1,213 @@
+# Copyright 2018 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Seed the first configure of CMake packages with the results of a probe.
+
+A small probe project is configured once per workspace and toolchain.
+Its results are then used by every package which is configured for the
+first time:
+
+* the configured platform and compiler files in ``CMakeFiles/<version>``
+  which allow CMake to skip the compiler identification and checks
+* an initial cache file passed with ``-C`` containing the found tools and
+  the results of common checks
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+from threading import Lock
+import uuid
+
+from ament_tools.build_types.cmake_common import CMAKE_EXECUTABLE
+
+# the name of the directory in the build space base containing the seeds
+SEED_CACHE_DIRECTORY = 'cmake_seed_cache'
+
+# the environment variables affecting the toolchain found by CMake
+SEED_ENVIRONMENT_VARIABLES = ['CC', 'CFLAGS', 'CXX', 'CXXFLAGS', 'LDFLAGS']
+
+# the default compilers CMake looks for if CC / CXX are not set
+_DEFAULT_COMPILERS = {'CC': 'cc', 'CXX': 'c++'}
+
+PROBE_CMAKELISTS = """\
+cmake_minimum_required(VERSION 3.5)
+project(ament_tools_seed_probe C CXX)
+find_package(Threads)
+"""
+
+# the cache entries which only depend on the toolchain
+_seeded_entries_re = re.compile(
+    r'^(CMAKE_(ADDR2LINE|AR|CXX_COMPILER|CXX_COMPILER_AR|CXX_COMPILER_RANLIB|'
+    r'C_COMPILER|C_COMPILER_AR|C_COMPILER_RANLIB|DLLTOOL|HAVE_LIBC_PTHREAD|LINKER|'
+    r'MAKE_PROGRAM|NM|OBJCOPY|OBJDUMP|PLATFORM_INFO_INITIALIZED|RANLIB|READELF|'
+    r'STRIP|UNAME)|_CMAKE_LINKER_PUSHPOP_STATE_SUPPORTED)'
+    r':([A-Z]+)=(.*)$')
+
+# the compilers whose stats invalidate the seed when they change
+_COMPILER_ENTRIES = ['CMAKE_C_COMPILER', 'CMAKE_CXX_COMPILER']
+
+_seed_locks = {}
+_seed_locks_lock = Lock()
+
+
+def _get_file_key(path):
+    try:
+        st = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def get_seed_key(cmake_args, generator_args, env):
+    """
+    Get the key of a seed.
+
+    :param list cmake_args: the CMake arguments of the packages
+    :param list generator_args: the arguments selecting the generator
+    :param dict env: the environment CMake is being invoked in
+    :returns: the hex digest of the key
+    """
+    # the compilers found in the PATH instead of the PATH itself since it
+    # differs between packages e.g. in isolated install spaces
+    compilers = {
+        name: shutil.which(env.get(name) or default, path=env.get('PATH'))
+        for name, default in _DEFAULT_COMPILERS.items()}
+    content = json.dumps({
+        'cmake': [CMAKE_EXECUTABLE, _get_file_key(CMAKE_EXECUTABLE)],
+        'cmake_args': cmake_args,
+        'compilers': compilers,
+        'env': {k: env.get(k) for k in SEED_ENVIRONMENT_VARIABLES},
+        'generator_args': generator_args,
+    }, sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def _is_valid(seed):
+    return all(
+        _get_file_key(path) == key for path, key in seed['compilers'].items())
+
+
+def _create_seed(path, cmake_args, generator_args, env):
+    tmp_path = '%s.%s.tmp' % (path, uuid.uuid4().hex)
+    try:
+        source_path = os.path.join(tmp_path, 'source')
+        build_path = os.path.join(tmp_path, 'build')
+        os.makedirs(source_path)
+        os.makedirs(build_path)
+        with open(os.path.join(source_path, 'CMakeLists.txt'), 'w') as h:
+            h.write(PROBE_CMAKELISTS)
+        subprocess.check_output(
+            [CMAKE_EXECUTABLE, source_path] + generator_args + cmake_args,
+            cwd=build_path, env=env, stderr=subprocess.STDOUT)
+
+        entries = {}
+        with open(os.path.join(build_path, 'CMakeCache.txt'), 'r') as h:
+            for line in h.read().splitlines():
+                match = _seeded_entries_re.match(line)
+                if match:
+                    entries[match.group(1)] = (match.group(3), match.group(4))
+        if any(e not in entries for e in _COMPILER_ENTRIES):
+            return None
+        lines = [
+            'set(%s "%s" CACHE %s "")' % (
+                name, value.replace('\\', '\\\\').replace('"', '\\"'), type_)
+            for name, (type_, value) in sorted(entries.items())]
+        with open(os.path.join(tmp_path, 'initial_cache.cmake'), 'w') as h:
+            h.write('\n'.join(lines) + '\n')
+
+        # the configured files are stored in a directory named after the version
+        configured_files = None
+        cmake_files_path = os.path.join(build_path, 'CMakeFiles')
+        for name in os.listdir(cmake_files_path):
+            if os.path.isfile(os.path.join(cmake_files_path, name, 'CMakeSystem.cmake')):
+                configured_files = name
+        if configured_files is None:
+            return None
+        shutil.copytree(
+            os.path.join(cmake_files_path, configured_files),
+            os.path.join(tmp_path, 'configured_files', configured_files),
+            ignore=shutil.ignore_patterns('CompilerId*'))
+
+        seed = {
+            'compilers': {
+                entries[e][1]: _get_file_key(entries[e][1]) for e in _COMPILER_ENTRIES},
+            'configured_files': configured_files,
+        }
+        with open(os.path.join(tmp_path, 'seed.json'), 'w') as h:
+            h.write(json.dumps(seed, sort_keys=True))
+        shutil.rmtree(source_path)
+        shutil.rmtree(build_path)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.rename(tmp_path, path)
+        return seed
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def get_seed(build_space_base, cmake_args, generator_args, env):
+    """
+    Get the seed for a toolchain, run the probe project if necessary.
+
+    :param str build_space_base: the build space containing all packages
+    :returns: the path of the seed or ``None`` if the probe failed
+    """
+    key = get_seed_key(cmake_args, generator_args, env)
+    path = os.path.join(build_space_base, SEED_CACHE_DIRECTORY, key)
+    with _seed_locks_lock:
+        lock = _seed_locks.setdefault(key, Lock())
+    # packages configured in parallel wait for the same probe
+    with lock:
+        try:
+            with open(os.path.join(path, 'seed.json'), 'r') as h:
+                seed = json.loads(h.read())
+        except (OSError, ValueError):
+            seed = None
+        if seed is None or not _is_valid(seed):
+            print('-- [ament] Configuring the CMake seed probe project')
+            try:
+                seed = _create_seed(path, cmake_args, generator_args, env)
+            except (OSError, subprocess.CalledProcessError) as e:
+                print('-- [ament] Failed to configure the CMake seed probe project: %s' % e)
+                seed = None
+            if seed is None:
+                return None
+    return path
+
+
+def apply_seed(path, build_space):
+    """
+    Apply a seed to the build space of a package which is not configured yet.
+
+    :param str path: the path of the seed
+    :param str build_space: the build space of the package
+    :returns: the CMake arguments to use the initial cache file
+    """
+    with open(os.path.join(path, 'seed.json'), 'r') as h:
+        seed = json.loads(h.read())
+    source_path = os.path.join(path, 'configured_files', seed['configured_files'])
+    destination_path = os.path.join(build_space, 'CMakeFiles', seed['configured_files'])
+    for dirpath, dirnames, filenames in os.walk(source_path):
+        rel_path = os.path.relpath(dirpath, source_path)
+        os.makedirs(os.path.join(destination_path, rel_path), exist_ok=True)
+        for filename in filenames:
+            shutil.copyfile(
+                os.path.join(dirpath, filename),
+                os.path.join(destination_path, rel_path, filename))
+    return ['-C', os.path.join(path, 'initial_cache.cmake')]
@@ -18,6 +18,7 @@ import os
 from ament_package.templates import configure_file
 from ament_package.templates import get_package_level_template_names
 from ament_package.templates import get_package_level_template_path
+from ament_tools.helper import write_file_if_changed
 
 
 def expand_package_level_setup_files(context, environment_hooks, environment_hooks_path):
@@ -67,8 +68,7 @@ def expand_package_level_setup_files(context, environment_hooks, environment_hoo
             name[:-3])
         os.makedirs(os.path.dirname(destination_path), exist_ok=True)
         destinations.append(destination_path)
-        with open(destination_path, 'w') as h:
-            h.write(content)
+        write_file_if_changed(destination_path, content)
 
     return destinations
 
@@ -0,0 +1,215 @@
+# Copyright 2018 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Use a compiler cache like ccache or sccache for CMake based packages."""
+
+import json
+import os
+import subprocess
+
+from ament_tools.build_types.cmake_common import which_executable
+
+from ament_tools.verbs import VerbExecutionError
+
+CCACHE_EXECUTABLE_ENV = 'CCACHE_COMMAND'
+SCCACHE_EXECUTABLE_ENV = 'SCCACHE_COMMAND'
+
+CCACHE_EXECUTABLE = which_executable(CCACHE_EXECUTABLE_ENV, ['ccache'])
+SCCACHE_EXECUTABLE = which_executable(SCCACHE_EXECUTABLE_ENV, ['sccache'])
+
+COMPILER_CACHES = ['none', 'auto', 'ccache', 'sccache']
+
+COMPILER_LAUNCHER_LANGUAGES = ['C', 'CXX']
+
+# the name of the directory in the build space base shared by all packages
+COMPILER_CACHE_DIRECTORY = 'compiler_cache'
+
+# the log file in the build space of each package where ccache records the
+# result of each compilation
+COMPILER_CACHE_STATS_LOG = 'ccache_stats.log'
+
+# the file in the build space of each package where the statistics of the
+# sccache server are stored after the build
+SCCACHE_STATS_FILE = 'sccache_stats.json'
+
+
+def get_compiler_launcher(compiler_cache):
+    """
+    Get the compiler cache executable to use as the compiler launcher.
+
+    :param str compiler_cache: one of ``COMPILER_CACHES``, ``auto`` selects
+        the first available compiler cache
+    :returns: the path of the executable or ``None``
+    :raises VerbExecutionError: if the requested compiler cache is not found
+    """
+    if not compiler_cache or compiler_cache == 'none':
+        return None
+    executables = {
+        'ccache': CCACHE_EXECUTABLE,
+        'sccache': SCCACHE_EXECUTABLE,
+    }
+    if compiler_cache == 'auto':
+        return executables['ccache'] or executables['sccache']
+    if executables[compiler_cache] is None:
+        raise VerbExecutionError(
+            "Could not find '%s' executable, try setting the environment variable %s" %
+            (compiler_cache, CCACHE_EXECUTABLE_ENV if compiler_cache == 'ccache'
+             else SCCACHE_EXECUTABLE_ENV))
+    return executables[compiler_cache]
+
+
+def _is_sccache(launcher):
+    return os.path.basename(launcher).startswith('sccache')
+
+
+def get_compiler_launcher_cmake_args(launcher, previous_launcher=None):
+    """
+    Get the CMake arguments to set the compiler launcher.
+
+    If no launcher should be used but a previous configuration used one the
+    CMake cache variables are being reset.
+    """
+    if not launcher and not previous_launcher:
+        return []
+    return [
+        '-DCMAKE_%s_COMPILER_LAUNCHER=%s' % (lang, launcher or '')
+        for lang in COMPILER_LAUNCHER_LANGUAGES]
+
+
+def get_compiler_cache_env(context, env=None):
+    """
+    Get the environment for commands invoking the compiler launcher.
+
+    The cache directory is shared by all packages in the build space unless
+    it has been set explicitly in the environment.
+
+    :param dict env: the environment to extend, ``None`` for ``os.environ``
+    :returns: the extended environment or ``env`` if no compiler launcher is
+        used
+    """
+    launcher = context.get('compiler_launcher')
+    if not launcher:
+        return env
+    env = dict(os.environ if env is None else env)
+    cache_dir = os.path.join(os.path.dirname(context.build_space), COMPILER_CACHE_DIRECTORY)
+    if _is_sccache(launcher):
+        env.setdefault('SCCACHE_DIR', cache_dir)
+    else:
+        env.setdefault('CCACHE_DIR', cache_dir)
+        env['CCACHE_STATSLOG'] = os.path.join(context.build_space, COMPILER_CACHE_STATS_LOG)
+    return env
+
+
+def reset_compiler_cache_stats(build_space, launcher, env=None):
+    """
+    Remove the compiler cache stats of the previous build of a package.
+
+    Since the sccache server only keeps global statistics they are zeroed.
+    """
+    for name in [COMPILER_CACHE_STATS_LOG, SCCACHE_STATS_FILE]:
+        path = os.path.join(build_space, name)
+        if os.path.exists(path):
+            os.remove(path)
+    if _is_sccache(launcher):
+        subprocess.call(
+            [launcher, '--zero-stats'], env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def record_compiler_cache_stats(build_space, launcher, env=None):
+    """
+    Store the statistics of the sccache server in the build space.
+
+    ccache records the statistics of each compilation itself.
+    """
+    if not _is_sccache(launcher):
+        return
+    try:
+        output = subprocess.check_output(
+            [launcher, '--show-stats', '--stats-format=json'], env=env,
+            stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return
+    with open(os.path.join(build_space, SCCACHE_STATS_FILE), 'wb') as h:
+        h.write(output)
+
+
+def _sum_sccache_counts(value):
+    # older versions of sccache report a plain number
+    if isinstance(value, dict):
+        return sum(value.get('counts', {}).values())
+    return value or 0
+
+
+def read_compiler_cache_stats(build_space):
+    """
+    Read the number of cache hits and misses of the last build of a package.
+
+    :returns: a tuple of hits and misses or ``None`` if no stats are available
+    """
+    path = os.path.join(build_space, SCCACHE_STATS_FILE)
+    if os.path.isfile(path):
+        try:
+            with open(path, 'r') as h:
+                stats = json.load(h)['stats']
+        except (KeyError, TypeError, ValueError):
+            return None
+        return (
+            _sum_sccache_counts(stats.get('cache_hits')),
+            _sum_sccache_counts(stats.get('cache_misses')))
+
+    path = os.path.join(build_space, COMPILER_CACHE_STATS_LOG)
+    if not os.path.isfile(path):
+        return None
+    hits = 0
+    misses = 0
+    with open(path, 'r') as h:
+        for line in h.read().splitlines():
+            line = line.strip()
+            if line.startswith('#'):
+                continue
+            if line in ['direct_cache_hit', 'preprocessed_cache_hit']:
+                hits += 1
+            elif line == 'cache_miss':
+                misses += 1
+    return hits, misses
+
+
+def print_compiler_cache_summary(build_space_base, package_names, concurrent=False):
+    stats = {}
+    available = False
+    shared_stats = False
+    for package_name in package_names:
+        build_space = os.path.join(build_space_base, package_name)
+        package_stats = read_compiler_cache_stats(build_space)
+        if package_stats is None:
+            continue
+        available = True
+        if sum(package_stats):
+            stats[package_name] = package_stats
+            shared_stats |= os.path.isfile(os.path.join(build_space, SCCACHE_STATS_FILE))
+    if not available:
+        print('')
+        print('Compiler cache summary: no per-package statistics available')
+        return
+    if not stats:
+        return
+    print('')
+    print('Compiler cache summary:')
+    if shared_stats and concurrent:
+        print('(the sccache statistics include packages which were built concurrently)')
+    max_name_len = str(max(len(n) for n in stats.keys()))
+    for package_name, (hits, misses) in stats.items():
+        print(('{0:<' + max_name_len + '}  {1:>5} hits  {2:>5} misses  ({3:.0f}%)').format(
+            package_name, hits, misses, 100.0 * hits / (hits + misses)))
@@ -0,0 +1,117 @@
+# Copyright 2018 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Byte-compile Python files with a pool of processes.
+
+The module is invoked as a script by the interpreter the files are installed
+for since the cache tag and the format of the compiled files depend on it.
+Therefore it must only use the standard library.
+Files whose compiled file matches the modification time and the size of the
+source are skipped.
+"""
+
+import concurrent.futures
+import importlib.util
+import os
+import py_compile
+import sys
+
+# the file in the build space listing the files to compile
+BYTE_COMPILE_LIST = 'byte_compile.txt'
+
+
+def get_byte_compile_command(python_interpreter, list_path, manifest_path=None):
+    """
+    Get the command byte-compiling the files listed in a file.
+
+    :param str python_interpreter: the interpreter the files are compiled for
+    :param str list_path: the file listing the absolute paths of the Python
+        files, one per line
+    :param str manifest_path: the install manifest to which the compiled
+        files are being added if they aren't listed yet
+    :returns: the command as a list
+    """
+    cmd = [python_interpreter, os.path.abspath(__file__), list_path]
+    if manifest_path is not None:
+        cmd.append(manifest_path)
+    return cmd
+
+
+def is_current(path):
+    """Check if the compiled file of a source file is up-to-date."""
+    try:
+        st = os.stat(path)
+        with open(importlib.util.cache_from_source(path), 'rb') as h:
+            header = h.read(16)
+    except OSError:
+        return False
+    # only timestamp based files are considered, see PEP 552
+    return header == importlib.util.MAGIC_NUMBER + b'\0\0\0\0' + \
+        (int(st.st_mtime) & 0xFFFFFFFF).to_bytes(4, 'little') + \
+        (st.st_size & 0xFFFFFFFF).to_bytes(4, 'little')
+
+
+def _compile_file(path):
+    try:
+        py_compile.compile(path, doraise=True)
+    except py_compile.PyCompileError as e:
+        return e.msg
+    return None
+
+
+def byte_compile(paths, manifest_path=None):
+    """
+    Byte-compile the outdated files.
+
+    Files which fail to compile (e.g. due to syntax errors) are reported but
+    don't cause a failure, same as the byte-compilation of setuptools.
+
+    :param list paths: the absolute paths of the Python files
+    :param str manifest_path: the install manifest to which the compiled
+        files are being added if they aren't listed yet
+    :returns: the number of compiled files
+    """
+    outdated = [p for p in paths if not is_current(p)]
+    if len(outdated) > 1:
+        workers = os.cpu_count() or 1
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            errors = list(executor.map(
+                _compile_file, outdated, chunksize=len(outdated) // (workers * 4) + 1))
+    else:
+        errors = [_compile_file(p) for p in outdated]
+    for error in errors:
+        if error:
+            print(error, file=sys.stderr)
+
+    if manifest_path is not None:
+        with open(manifest_path, 'r') as h:
+            recorded = set(h.read().splitlines())
+        compiled = [importlib.util.cache_from_source(p) for p in paths]
+        compiled = [c for c in compiled if c not in recorded and os.path.exists(c)]
+        if compiled:
+            with open(manifest_path, 'a') as h:
+                h.write(''.join('%s\n' % c for c in compiled))
+    return len(outdated)
+
+
+def main(list_path, manifest_path=None):
+    with open(list_path, 'r') as h:
+        paths = [line for line in h.read().splitlines() if line]
+    count = byte_compile(paths, manifest_path=manifest_path)
+    print('Byte-compiled %d of %d files' % (count, len(paths)))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
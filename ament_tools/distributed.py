@@ -0,0 +1,340 @@
+# Copyright 2018 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Distribute the processing of packages across multiple hosts.
+
+The coordinator (the ``build`` verb) connects to a set of workers (each
+running the ``worker`` verb) over TCP.
+All hosts are expected to share the source, build and install spaces under
+the same paths, e.g. using a network filesystem.
+
+Messages are JSON objects, one per line:
+
+* worker -> coordinator: ``hello`` (with the number of job ``slots``),
+  ``log`` (a ``line`` of output of a job), ``result`` (the ``rc`` of a job)
+  and ``heartbeat``
+* coordinator -> worker: ``job`` (with the ``options`` to process a package)
+  and ``stop`` (to terminate all running jobs, e.g. after a job failed)
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+from threading import Condition
+from threading import Event
+from threading import Lock
+from threading import Thread
+
+DEFAULT_PORT = 8765
+HEARTBEAT_INTERVAL = 5.0
+HEARTBEAT_TIMEOUT = 30.0
+# the time a job has to terminate its commands before being killed
+TERMINATE_TIMEOUT = 10.0
+
+
+def send_message(sock, lock, message):
+    data = (json.dumps(message) + '\n').encode()
+    with lock:
+        sock.sendall(data)
+
+
+def receive_message(rfile):
+    line = rfile.readline()
+    if not line:
+        return None
+    return json.loads(line.decode())
+
+
+def parse_address(address):
+    """
+    Parse a worker address of the form ``host[:port]``.
+
+    :param str address: the address
+    :returns: tuple of host and port
+    :raises: ValueError if the port is not a number
+    """
+    host, _, port = address.rpartition(':')
+    if not host:
+        return port, DEFAULT_PORT
+    return host, int(port)
+
+
+def get_plain_options(opts):
+    """Get the options which can be passed to a worker."""
+    options = {}
+    for key, value in vars(opts).items():
+        try:
+            json.dumps(value)
+        except TypeError:
+            continue
+        options[key] = value
+    return options
+
+
+def get_job_command():
+    ament_tools_path = os.path.dirname(os.path.dirname(__file__))
+    code_lines = [
+        'import sys',
+        'sys.path.insert(0, %r)' % ament_tools_path,
+        'from ament_tools.distributed import run_job',
+        'sys.exit(run_job())']
+    return [sys.executable, '-c', ';'.join(code_lines)]
+
+
+def run_job():
+    """
+    Process a package with the options passed on stdin.
+
+    When receiving ``SIGTERM`` the commands of the job are being terminated.
+    """
+    from ament_tools.verbs.build_pkg.cli import main as build_pkg_main
+    opts = argparse.Namespace(**json.loads(sys.stdin.read()))
+    try:
+        return build_pkg_main(opts)
+    finally:
+        sys.stdout.flush()
+
+
+class _WorkerRequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        self._lock = Lock()
+        self._processes = set()
+        send_message(self.request, self._lock, {
+            'type': 'hello', 'slots': self.server.slots})
+        stopped = Event()
+        heartbeat = Thread(target=self._send_heartbeats, args=(stopped, ))
+        heartbeat.daemon = True
+        heartbeat.start()
+        try:
+            while True:
+                message = receive_message(self.rfile)
+                if message is None:
+                    break
+                if message.get('type') == 'job':
+                    thread = Thread(target=self._run_job, args=(message, ))
+                    thread.daemon = True
+                    thread.start()
+                elif message.get('type') == 'stop':
+                    thread = Thread(target=self._terminate_jobs)
+                    thread.daemon = True
+                    thread.start()
+        except (OSError, ValueError):
+            pass
+        finally:
+            stopped.set()
+            # the coordinator is gone, nobody is waiting for running jobs
+            self._terminate_jobs()
+
+    def _terminate_jobs(self):
+        # the jobs terminate the process groups of their commands on SIGTERM
+        processes = list(self._processes)
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=self.server.terminate_timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    def _send_heartbeats(self, stopped):
+        while not stopped.wait(self.server.heartbeat_interval):
+            try:
+                send_message(self.request, self._lock, {'type': 'heartbeat'})
+            except OSError:
+                break
+
+    def _run_job(self, message):
+        options = message['options']
+        cwd = options.get('directory', os.getcwd())
+        env = dict(os.environ)
+        env['PWD'] = cwd
+        print("Running job '%s' for '%s'" % (message['id'], options.get('path')))
+        try:
+            process = subprocess.Popen(
+                self.server.job_command, cwd=cwd, env=env,
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            self._processes.add(process)
+            process.stdin.write(json.dumps(options).encode())
+            process.stdin.close()
+            for line in process.stdout:
+                send_message(self.request, self._lock, {
+                    'type': 'log', 'id': message['id'],
+                    'line': line.decode(errors='replace').rstrip('\n')})
+            rc = process.wait()
+            self._processes.discard(process)
+            send_message(self.request, self._lock, {
+                'type': 'result', 'id': message['id'], 'rc': rc})
+        except OSError as e:
+            print("Job '%s' failed: %s" % (message['id'], e), file=sys.stderr)
+
+
+class WorkerServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """TCP server processing jobs sent by a coordinator."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(
+        self, address, slots, job_command=None, heartbeat_interval=HEARTBEAT_INTERVAL,
+        terminate_timeout=TERMINATE_TIMEOUT
+    ):
+        socketserver.TCPServer.__init__(self, address, _WorkerRequestHandler)
+        self.slots = slots
+        self.job_command = job_command or get_job_command()
+        self.heartbeat_interval = heartbeat_interval
+        self.terminate_timeout = terminate_timeout
+
+
+class _WorkerConnection:
+
+    def __init__(self, address, timeout):
+        self.address = address
+        self.sock = socket.create_connection(address, timeout=timeout)
+        self.rfile = self.sock.makefile('rb')
+        self.lock = Lock()
+        self.alive = True
+        self.running = set()
+        hello = receive_message(self.rfile)
+        if not hello or hello.get('type') != 'hello':
+            raise OSError("Unexpected handshake from worker '%s:%d'" % address)
+        self.slots = int(hello['slots'])
+
+    def close(self):
+        self.alive = False
+        try:
+            # unblock the thread receiving the messages of the worker
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class Coordinator:
+    """
+    Dispatch jobs to a set of workers and collect their results.
+
+    The :py:meth:`run_job` method has the same signature as the per package
+    callbacks of the ``build`` verb and blocks until a worker has finished
+    processing the package.
+    Therefore it can be used from multiple threads to process independent
+    packages concurrently.
+    If a worker stops responding its jobs are rescheduled on other workers.
+    """
+
+    def __init__(self, addresses, heartbeat_timeout=HEARTBEAT_TIMEOUT):
+        self._condition = Condition()
+        self._results = {}
+        self._next_job_id = 0
+        self._workers = []
+        for address in addresses:
+            worker = _WorkerConnection(parse_address(address), heartbeat_timeout)
+            print("Connected to worker '%s:%d' with %d slots" %
+                  (worker.address + (worker.slots, )))
+            self._workers.append(worker)
+            thread = Thread(target=self._receive_messages, args=(worker, ))
+            thread.daemon = True
+            thread.start()
+
+    @property
+    def slots(self):
+        return sum(w.slots for w in self._workers if w.alive)
+
+    def close(self):
+        with self._condition:
+            for worker in self._workers:
+                worker.close()
+            self._condition.notify_all()
+
+    def stop(self):
+        """Request all workers to terminate their running jobs."""
+        for worker in self._workers:
+            if not worker.alive:
+                continue
+            try:
+                send_message(worker.sock, worker.lock, {'type': 'stop'})
+            except OSError:
+                pass
+
+    def _receive_messages(self, worker):
+        try:
+            while True:
+                message = receive_message(worker.rfile)
+                if message is None:
+                    break
+                if message.get('type') == 'log':
+                    print(message['line'])
+                    sys.stdout.flush()
+                elif message.get('type') == 'result':
+                    with self._condition:
+                        self._results[message['id']] = message['rc']
+                        self._condition.notify_all()
+        except (OSError, ValueError):
+            # includes socket timeouts due to missing heartbeats
+            pass
+        with self._condition:
+            if worker.alive:
+                print("Lost connection to worker '%s:%d'" % worker.address,
+                      file=sys.stderr)
+            worker.close()
+            self._condition.notify_all()
+
+    def _acquire_worker(self):
+        # must be called while holding the condition
+        while True:
+            alive_workers = [w for w in self._workers if w.alive]
+            if not alive_workers:
+                return None
+            for worker in alive_workers:
+                if len(worker.running) < worker.slots:
+                    return worker
+            self._condition.wait()
+
+    def run_job(self, opts):
+        options = get_plain_options(opts)
+        while True:
+            with self._condition:
+                worker = self._acquire_worker()
+                if worker is None:
+                    print("No worker left to process '%s'" % opts.path, file=sys.stderr)
+                    return 1
+                job_id = self._next_job_id
+                self._next_job_id += 1
+                worker.running.add(job_id)
+            try:
+                send_message(worker.sock, worker.lock, {
+                    'type': 'job', 'id': job_id, 'options': options})
+            except OSError:
+                with self._condition:
+                    worker.running.discard(job_id)
+                    worker.close()
+                    self._condition.notify_all()
+                continue
+            with self._condition:
+                while job_id not in self._results and worker.alive:
+                    self._condition.wait()
+                worker.running.discard(job_id)
+                self._condition.notify_all()
+                if job_id in self._results:
+                    return self._results.pop(job_id)
+            print("Rescheduling '%s' since worker '%s:%d' is gone" %
+                  ((opts.path, ) + worker.address), file=sys.stderr)
@@ -0,0 +1,223 @@
+# Copyright 2018 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Capture the environment contributed by the setup files of packages.
+
+Instead of sourcing the ``local_setup.sh`` file of every dependency before
+each command the changes each file applies to the environment are captured
+once and stored as a snapshot.
+The snapshots of all dependencies are then merged in topological order to
+create the environment for the commands of a package.
+
+A snapshot maps the names of the changed environment variables to a tuple of
+the operation (``prepend``, ``append``, ``set`` or ``unset``) and the value.
+Values of path-like variables are being merged without duplicates the same
+way as the ``ament_prepend_unique_value`` shell function does.
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import sys
+from threading import Lock
+
+# the directory in the build space base containing the snapshots
+SNAPSHOT_DIRECTORY = '.environment_snapshots'
+
+# variables which are changed by the shell itself
+IGNORED_VARIABLES = ['OLDPWD', 'PWD', 'SHLVL', '_']
+
+# separates the output of the setup file from the captured environment
+_SEPARATOR = '__AMENT_TOOLS_ENVIRONMENT__'
+
+# the Python interpreter might coerce the C locale by setting LC_CTYPE,
+# therefore the shell passes the original value along
+_CAPTURE_SCRIPT = \
+    '. "$1" && ' \
+    'AMENT_TOOLS_LC_CTYPE="${LC_CTYPE-}" AMENT_TOOLS_LC_CTYPE_SET="${LC_CTYPE+1}" ' \
+    'exec "$2" -c "$3"'
+_CAPTURE_CODE = '; '.join([
+    'import json, os, sys',
+    'env = dict(os.environ)',
+    "lc_ctype = env.pop('AMENT_TOOLS_LC_CTYPE')",
+    "env.pop('LC_CTYPE', None)",
+    "env.update({'LC_CTYPE': lc_ctype} if env.pop('AMENT_TOOLS_LC_CTYPE_SET') else {})",
+    "sys.stdout.write('%s' + json.dumps(env))" % _SEPARATOR,
+])
+
+_lock = Lock()
+_snapshots = {}
+
+
+def _get_base_environment_key(base_env):
+    # the setup files behave differently depending on the environment they are
+    # sourced in, e.g. AMENT_PREFIX_PATH or PATH, only store a digest though
+    # since the environment might contain secrets
+    content = json.dumps(
+        {k: v for k, v in base_env.items() if k not in IGNORED_VARIABLES}, sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def _get_snapshot_key(share_path, base_env):
+    # the setup file of the package as well as its environment hooks
+    paths = [os.path.join(share_path, 'local_setup.sh')]
+    for subfolder in ['environment', 'hook']:
+        path = os.path.join(share_path, subfolder)
+        if os.path.isdir(path):
+            paths += [os.path.join(path, name) for name in sorted(os.listdir(path))]
+    key = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            key.append([path, None])
+            continue
+        key.append([path, st.st_mtime_ns, st.st_size])
+    key.append(_get_base_environment_key(base_env))
+    return key
+
+
+def _is_path_list(value):
+    return all(os.path.isabs(v) for v in value.split(os.pathsep) if v)
+
+
+def _remove_prefix(value, prefix):
+    # remove all paths within the prefix from a path-like value
+    return os.pathsep.join(
+        v for v in value.split(os.pathsep)
+        if v and v != prefix and not v.startswith(prefix + os.sep))
+
+
+def capture_environment_snapshot(local_setup, base_env=None):
+    """
+    Capture the changes a setup file applies to the environment.
+
+    Paths within the prefix of the setup file are removed from the base
+    environment first, otherwise the setup file wouldn't add them again if
+    the prefix has already been sourced.
+
+    :param str local_setup: the path of the ``local_setup.sh`` file
+    :param dict base_env: the environment to source the file in, defaults to
+        ``os.environ``
+    :returns: the snapshot
+    :rtype: dict
+    :raises subprocess.CalledProcessError: if sourcing the setup file fails
+    """
+    if base_env is None:
+        base_env = os.environ
+    prefix = os.path.dirname(os.path.dirname(os.path.dirname(local_setup)))
+    env = {k: _remove_prefix(v, prefix) if _is_path_list(v) else v for k, v in base_env.items()}
+    output = subprocess.check_output(
+        ['/bin/sh', '-c', _CAPTURE_SCRIPT, 'sh', local_setup, sys.executable, _CAPTURE_CODE],
+        env=env, cwd=os.path.dirname(local_setup))
+    after = json.loads(output.decode().rsplit(_SEPARATOR, 1)[1])
+
+    snapshot = {}
+    for name in sorted(set(env.keys()) | set(after.keys())):
+        if name in IGNORED_VARIABLES:
+            continue
+        old = env.get(name)
+        new = after.get(name)
+        if old == new:
+            continue
+        if new is None:
+            snapshot[name] = ('unset', None)
+        elif _is_path_list(new) and (not old or new.endswith(os.pathsep + old)):
+            snapshot[name] = ('prepend', new[:-len(old) - 1] if old else new)
+        elif old and _is_path_list(new) and new.startswith(old + os.pathsep):
+            snapshot[name] = ('append', new[len(old) + 1:])
+        else:
+            snapshot[name] = ('set', new)
+    return snapshot
+
+
+def get_environment_snapshot(build_space_base, share_path):
+    """
+    Get the snapshot of a package, capture it if necessary.
+
+    The snapshot is stored in the build space base and captured again when
+    the setup file or the environment hooks of the package or the environment
+    it is captured in change.
+
+    :param str build_space_base: the build space containing all packages
+    :param str share_path: the share folder of the package in the install space
+    :returns: the snapshot
+    """
+    name = os.path.basename(share_path)
+    key = _get_snapshot_key(share_path, os.environ)
+    path = os.path.join(build_space_base, SNAPSHOT_DIRECTORY, '%s.json' % name)
+    with _lock:
+        data = _snapshots.get(path)
+        if data is None and os.path.isfile(path):
+            try:
+                with open(path, 'r') as h:
+                    data = json.loads(h.read())
+            except ValueError:
+                data = None
+        if data is None or data.get('key') != key:
+            local_setup = os.path.join(share_path, 'local_setup.sh')
+            snapshot = capture_environment_snapshot(local_setup) \
+                if os.path.isfile(local_setup) else {}
+            data = {'key': key, 'snapshot': snapshot}
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = '%s.%d.tmp' % (path, os.getpid())
+            with open(tmp_path, 'w') as h:
+                h.write(json.dumps(data, sort_keys=True))
+            os.replace(tmp_path, path)
+        _snapshots[path] = data
+    return data['snapshot']
+
+
+def apply_environment_snapshot(env, snapshot):
+    """Apply a snapshot to an environment dictionary in place."""
+    for name, (operation, value) in snapshot.items():
+        if operation == 'unset':
+            env.pop(name, None)
+        elif operation == 'set':
+            env[name] = value
+        else:
+            values = [v for v in value.split(os.pathsep) if v]
+            existing = [
+                v for v in env.get(name, '').split(os.pathsep)
+                if v and v not in values]
+            if operation == 'prepend':
+                values = values + existing
+            else:
+                values = existing + values
+            env[name] = os.pathsep.join(values)
+
+
+def get_dependency_environment(build_space_base, dependencies, base_env=None):
+    """
+    Get the environment with the setup files of all dependencies applied.
+
+    :param str build_space_base: the build space containing all packages
+    :param list dependencies: the share folders of the dependencies in
+        topological order
+    :param dict base_env: the environment to extend, defaults to
+        ``os.environ``
+    :returns: a new environment dictionary
+    """
+    env = dict(os.environ if base_env is None else base_env)
+    for share_path in dependencies:
+        apply_environment_snapshot(
+            env, get_environment_snapshot(build_space_base, share_path))
+    return env
+
+
+def prepend_path(env, name, value):
+    """Prepend a path to a path-like variable in an environment dictionary."""
+    env[name] = os.pathsep.join([value] + [v for v in env.get(name, '').split(os.pathsep) if v])
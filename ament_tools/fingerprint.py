@@ -0,0 +1,171 @@
+# Copyright 2018 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compute fingerprints of the inputs of a package."""
+
+import hashlib
+import json
+import os
+
+IGNORED_DIRECTORY_NAMES = ['.git', '.hg', '.svn', '__pycache__']
+
+
+def hash_file(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def compute_source_files(source_space, previous_files=None, ignored_paths=None):
+    """
+    Compute the content hashes of all files in a source space.
+
+    The content of a file is only hashed if its modification time or size
+    differ from the information in ``previous_files``, otherwise the
+    previous hash is reused.
+
+    :param str source_space: the path of the source space
+    :param dict previous_files: the result of a previous invocation
+    :param list ignored_paths: absolute paths which are skipped, e.g. a build
+        space within the source space
+    :returns: a dictionary mapping relative file paths to a list containing
+        the modification time (in ns), the size and the content hash
+    """
+    previous_files = previous_files or {}
+    ignored_paths = [os.path.abspath(p) for p in (ignored_paths or [])]
+    files = {}
+    for dirpath, dirnames, filenames in os.walk(source_space):
+        dirnames[:] = sorted(
+            d for d in dirnames
+            if d not in IGNORED_DIRECTORY_NAMES and
+            os.path.join(dirpath, d) not in ignored_paths)
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            try:
+                st = os.stat(path)
+            except OSError:
+                # e.g. a dangling symlink
+                continue
+            rel_path = os.path.relpath(path, source_space)
+            previous = previous_files.get(rel_path)
+            if previous and previous[0] == st.st_mtime_ns and previous[1] == st.st_size:
+                files[rel_path] = previous
+                continue
+            files[rel_path] = [st.st_mtime_ns, st.st_size, hash_file(path)]
+    return files
+
+
+def compute_tree_stamp(path, ignored_paths=None):
+    """
+    Compute a cheap stamp of the files in a directory tree.
+
+    Only the stats of the files are considered, directories are ignored
+    since their modification time also changes when temporary files are
+    being created and removed.
+
+    :param str path: the root of the tree
+    :param list ignored_paths: absolute paths of files and directories which
+        are skipped
+    :returns: a list containing the newest modification time (in ns) and the
+        number of files
+    """
+    ignored_paths = [os.path.abspath(p) for p in (ignored_paths or [])]
+    newest = 0
+    count = 0
+    for dirpath, dirnames, filenames in os.walk(path):
+        dirnames[:] = [
+            d for d in dirnames
+            if d not in IGNORED_DIRECTORY_NAMES and
+            os.path.join(dirpath, d) not in ignored_paths]
+        for filename in filenames:
+            file_path = os.path.join(dirpath, filename)
+            if file_path in ignored_paths:
+                continue
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                continue
+            newest = max(newest, st.st_mtime_ns)
+            count += 1
+    return [newest, count]
+
+
+def compute_source_fingerprint(files):
+    """Compute a fingerprint from the result of :py:func:`compute_source_files`."""
+    h = hashlib.sha256()
+    for rel_path in sorted(files.keys()):
+        h.update(('%s\0%s\0' % (rel_path, files[rel_path][2])).encode())
+    return h.hexdigest()
+
+
+def compute_package_fingerprint(source_fingerprint, options, dependency_fingerprints):
+    """
+    Compute the fingerprint of all inputs of a package.
+
+    :param str source_fingerprint: the fingerprint of the source space
+    :param dict options: the options used to process the package
+    :param dict dependency_fingerprints: the fingerprints of the dependencies
+    :returns: the hex digest of the fingerprint
+    :rtype: str
+    """
+    content = json.dumps({
+        'source': source_fingerprint,
+        'options': options,
+        'dependencies': dependency_fingerprints,
+    }, sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def explain_changes(previous, current, max_files=10):
+    """
+    Describe why the inputs of a package differ from a previous state.
+
+    :param dict previous: the previous record containing ``files``,
+        ``options`` and ``dependencies``, or ``None``
+    :param dict current: the current record
+    :param int max_files: the maximum number of changed files to list
+    :returns: a list of human readable reasons
+    """
+    if not previous:
+        return ['no previous successful build']
+    reasons = []
+    previous_files = previous.get('files', {})
+    current_files = current['files']
+    changed = sorted(
+        p for p in current_files.keys()
+        if p not in previous_files or previous_files[p][2] != current_files[p][2])
+    removed = sorted(set(previous_files.keys()) - set(current_files.keys()))
+    for label, paths in (('changed', changed), ('removed', removed)):
+        if not paths:
+            continue
+        listed = ', '.join(paths[:max_files])
+        if len(paths) > max_files:
+            listed += ', ... (%d more)' % (len(paths) - max_files)
+        reasons.append('%s files: %s' % (label, listed))
+    previous_options = previous.get('options', {})
+    current_options = current['options']
+    changed_options = sorted(
+        k for k in set(previous_options.keys()) | set(current_options.keys())
+        if previous_options.get(k) != current_options.get(k))
+    if changed_options:
+        reasons.append('changed options: %s' % ', '.join(changed_options))
+    previous_dependencies = previous.get('dependencies', {})
+    changed_dependencies = sorted(
+        k for k, v in current['dependencies'].items()
+        if previous_dependencies.get(k) != v)
+    if changed_dependencies:
+        reasons.append('changed dependencies: %s' % ', '.join(changed_dependencies))
+    return reasons
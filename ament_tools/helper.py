@@ -14,12 +14,16 @@
 
 import argparse
 import filecmp
+import json
 from multiprocessing import cpu_count
 import os
 import re
 import shlex
 import shutil
 import stat
+import sys
+from threading import get_ident
+from threading import Lock
 
 from ament_tools.package_types import package_exists_at
 
@@ -40,6 +44,44 @@ def argparse_existing_package(path):
     return path
 
 
+PROCESS_PHASES = ['build', 'install', 'test']
+
+IONICE_CLASSES = {
+    'best-effort': '2',
+    'idle': '3',
+}
+
+
+def _split_phase_argument(argument):
+    phase, sep, value = argument.partition('=')
+    if not sep or phase not in PROCESS_PHASES:
+        raise argparse.ArgumentTypeError(
+            "Argument '%s' must have the form 'PHASE=VALUE' where PHASE is one of: %s" %
+            (argument, ', '.join(PROCESS_PHASES)))
+    return phase, value
+
+
+def argparse_nice_level(argument):
+    phase, value = _split_phase_argument(argument)
+    try:
+        level = int(value)
+    except ValueError:
+        level = None
+    if level is None or not -20 <= level <= 19:
+        raise argparse.ArgumentTypeError(
+            "Nice level '%s' must be an integer between -20 and 19" % value)
+    return phase, level
+
+
+def argparse_ionice_class(argument):
+    phase, value = _split_phase_argument(argument)
+    if value not in IONICE_CLASSES:
+        raise argparse.ArgumentTypeError(
+            "IO scheduling class '%s' must be one of: %s" %
+            (value, ', '.join(sorted(IONICE_CLASSES.keys()))))
+    return phase, value
+
+
 def determine_path_argument(cwd, base_path, argument, default):
     if argument is None:
         # if no argument is passed the default is relative to the base_path
@@ -230,6 +272,160 @@ def compute_deploy_destination(context, filename, dst_subfolder=''):
     return os.path.join(context.install_space, dst_subfolder, filename)
 
 
+# the methods to deploy files into the install space
+INSTALL_MODES = ['copy', 'link']
+
+EXECUTABLE_BITS = stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH
+
+# the file in the install space recording the files deployed by ament_tools
+DEPLOY_MANIFEST_FILENAME = '.deploy_manifest.json'
+
+_deploy_manifests = {}
+_deploy_manifests_lock = Lock()
+_created_directories = set()
+
+
+def _get_stat_key(st):
+    return [st.st_mtime_ns, st.st_size, st.st_ino, st.st_mode]
+
+
+class _DeployManifest:
+    """
+    The deployed files of an install space.
+
+    For every destination the stats of the source as well as the destination
+    at the time of the deployment are recorded.
+    If both are unchanged the file doesn't need to be deployed again.
+    """
+
+    def __init__(self, install_space):
+        self.path = os.path.join(install_space, DEPLOY_MANIFEST_FILENAME)
+        self.lock = Lock()
+        self.entries = {}
+        self.changed = {}
+        try:
+            with open(self.path, 'r') as h:
+                self.entries = json.loads(h.read())
+        except (OSError, ValueError):
+            pass
+
+    def is_up_to_date(self, source_path, source_st, destination_path, destination_st):
+        with self.lock:
+            entry = self.entries.get(destination_path)
+        return entry == [
+            source_path, _get_stat_key(source_st), _get_stat_key(destination_st)]
+
+    def update(self, source_path, destination_path):
+        try:
+            entry = [
+                source_path, _get_stat_key(os.stat(source_path)),
+                _get_stat_key(os.lstat(destination_path))]
+        except OSError:
+            entry = None
+        with self.lock:
+            self.entries[destination_path] = entry
+            self.changed[destination_path] = entry
+
+    def flush(self):
+        with self.lock:
+            if not self.changed:
+                return
+            # merge with entries written concurrently by other processes
+            try:
+                with open(self.path, 'r') as h:
+                    entries = json.loads(h.read())
+            except (OSError, ValueError):
+                entries = {}
+            entries.update(self.changed)
+            entries = {k: v for k, v in entries.items() if v is not None}
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = '%s.%d.tmp' % (self.path, os.getpid())
+            with open(tmp_path, 'w') as h:
+                h.write(json.dumps(entries, sort_keys=True))
+            os.replace(tmp_path, self.path)
+            self.changed = {}
+
+
+def _get_deploy_manifest(install_space):
+    install_space = os.path.abspath(install_space)
+    with _deploy_manifests_lock:
+        if install_space not in _deploy_manifests:
+            _deploy_manifests[install_space] = _DeployManifest(install_space)
+        return _deploy_manifests[install_space]
+
+
+def flush_deploy_manifest(install_space):
+    """Write the recorded deployments of an install space to disk."""
+    _get_deploy_manifest(install_space).flush()
+
+
+def break_deployed_hardlinks(context):
+    """
+    Remove the hardlinks deployed from the source and build space of a package.
+
+    Hardlinks share their content with the source, therefore they need to be
+    removed before e.g. an install step overwrites them in place.
+    The removed files are deployed again afterwards.
+    """
+    manifest = _get_deploy_manifest(context.install_space)
+    prefixes = tuple(
+        os.path.join(os.path.abspath(p), '') for p in
+        [context.source_space, context.build_space])
+    with manifest.lock:
+        entries = list(manifest.entries.items())
+    for destination_path, entry in entries:
+        if entry is None or not entry[0].startswith(prefixes):
+            continue
+        try:
+            st = os.lstat(destination_path)
+        except OSError:
+            continue
+        if stat.S_ISREG(st.st_mode) and st.st_nlink > 1:
+            os.remove(destination_path)
+            manifest.update(entry[0], destination_path)
+
+
+def _makedirs(path):
+    # avoid checking the same directories again for every deployed file
+    if path in _created_directories:
+        return
+    os.makedirs(path, exist_ok=True)
+    _created_directories.add(path)
+
+
+def copy_file_content(source_path, destination_path):
+    """
+    Copy the content of a file without reading it into Python.
+
+    The copy is performed in the kernel using ``copy_file_range`` or
+    ``sendfile`` where available.
+    """
+    with open(source_path, 'rb') as src, open(destination_path, 'wb') as dst:
+        size = os.fstat(src.fileno()).st_size
+        for name in ['copy_file_range', 'sendfile']:
+            function = getattr(os, name, None)
+            if function is None:
+                continue
+            offset = 0
+            try:
+                while offset < size:
+                    if name == 'copy_file_range':
+                        copied = function(src.fileno(), dst.fileno(), size - offset)
+                    else:
+                        copied = function(dst.fileno(), src.fileno(), offset, size - offset)
+                    if not copied:
+                        break
+                    offset += copied
+            except OSError:
+                if offset:
+                    raise
+                continue
+            if offset == size:
+                return
+            raise OSError("Failed to copy '%s' to '%s'" % (source_path, destination_path))
+        shutil.copyfileobj(src, dst)
+
+
 def deploy_file(
     context,
     source_base_path,
@@ -243,6 +439,25 @@ def deploy_file(
 
     # create destination folder if necessary
     destination_path = compute_deploy_destination(context, filename, dst_subfolder)
+
+    # skip files which haven't changed since they have been deployed
+    manifest = None
+    if not context.symlink_install:
+        manifest = _get_deploy_manifest(context.install_space)
+        try:
+            source_st = os.stat(source_path)
+            destination_st = os.lstat(destination_path)
+        except OSError:
+            pass
+        else:
+            if manifest.is_up_to_date(
+                source_path, source_st, destination_path, destination_st
+            ) and (not executable or destination_st.st_mode & stat.S_IXUSR):
+                deployed_files = context.get('deployed_files')
+                if deployed_files is not None:
+                    deployed_files.append(destination_path)
+                return
+
     # If the file exists and we should skip if we didn't install it.
     if (
         (os.path.exists(destination_path) or os.path.islink(destination_path)) and
@@ -259,7 +474,11 @@ def deploy_file(
                 print('-- [ament] Skipping (would overwrite):', destination_path)
                 return
     print('-- [ament] Deploying:', destination_path)
-    os.makedirs(os.path.dirname(destination_path), exist_ok=True)
+    _makedirs(os.path.dirname(destination_path))
+    # keep track of the deployed files if requested, e.g. by the artifact cache
+    deployed_files = context.get('deployed_files')
+    if deployed_files is not None:
+        deployed_files.append(destination_path)
 
     # remove existing file / symlink if it is not already what is intended
     if os.path.exists(destination_path):
@@ -276,8 +495,14 @@ def deploy_file(
                     pass
 
     if not os.path.exists(destination_path):
-        if not context.symlink_install:
-            shutil.copyfile(source_path, destination_path)
+        if not context.symlink_install and context.get('install_mode') == 'link':
+            # changing the mode of a hardlink would also affect the source
+            clone_file(
+                source_path, destination_path,
+                allow_hardlink=not executable or
+                os.stat(source_path).st_mode & EXECUTABLE_BITS == EXECUTABLE_BITS)
+        elif not context.symlink_install:
+            copy_file_content(source_path, destination_path)
         else:
             # while the destination might not exist it can still be a symlink
             if os.path.islink(destination_path):
@@ -291,10 +516,154 @@ def deploy_file(
     # set executable bit if necessary
     if executable and not context.symlink_install:
         mode = os.stat(destination_path).st_mode
-        new_mode = mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH
+        new_mode = mode | EXECUTABLE_BITS
         if new_mode != mode:
             os.chmod(destination_path, new_mode)
 
+    if manifest is not None:
+        manifest.update(source_path, destination_path)
+
+
+# ioctl request to share the extents of a file on copy-on-write file systems
+FICLONE = 0x40049409
+
+
+def clone_file(source_path, destination_path, allow_hardlink=True):
+    """
+    Clone a file as cheaply as possible.
+
+    First a reflink is attempted (on file systems supporting it), then a
+    hardlink and finally the content is being copied.
+    The destination must not exist.
+
+    :param bool allow_hardlink: if ``False`` the destination never shares the
+        inode of the source
+    :returns: the method used, one of ``reflink``, ``hardlink`` or ``copy``
+    :rtype: str
+    """
+    if sys.platform.startswith('linux'):
+        import fcntl
+        with open(source_path, 'rb') as src, open(destination_path, 'wb') as dst:
+            try:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                reflinked = True
+            except OSError:
+                reflinked = False
+        if reflinked:
+            shutil.copymode(source_path, destination_path)
+            return 'reflink'
+        os.remove(destination_path)
+    if allow_hardlink:
+        try:
+            os.link(source_path, destination_path)
+            return 'hardlink'
+        except OSError:
+            pass
+    shutil.copy2(source_path, destination_path)
+    return 'copy'
+
+
+def link_installed_files(context, installed_files):
+    """
+    Replace installed files with clones of identical files of the package.
+
+    Install steps like the one of CMake always copy files.
+    Every installed file whose content matches a file with the same name in
+    the source or build space of the package is replaced with a clone of
+    that file (see :py:func:`clone_file`).
+    The clones are recorded in the deploy manifest, therefore hardlinks are
+    removed by :py:func:`break_deployed_hardlinks` before the next install
+    step could overwrite them in place.
+
+    :param list installed_files: the absolute paths of the installed files
+    :returns: the number of replaced files
+    """
+    candidates = {}
+    for path in installed_files:
+        try:
+            st = os.lstat(path)
+        except OSError:
+            continue
+        if stat.S_ISREG(st.st_mode) and st.st_nlink == 1:
+            candidates.setdefault(os.path.basename(path), []).append(path)
+    if not candidates:
+        return 0
+
+    # index the files of the package which might have been installed
+    sources = {}
+    for base_path in [context.source_space, context.build_space]:
+        for dirpath, dirnames, filenames in os.walk(base_path):
+            dirnames[:] = [
+                d for d in dirnames
+                if os.path.join(dirpath, d) != os.path.abspath(context.install_space)]
+            for filename in filenames:
+                if filename in candidates:
+                    sources.setdefault(filename, []).append(os.path.join(dirpath, filename))
+
+    manifest = _get_deploy_manifest(context.install_space)
+    count = 0
+    for filename, paths in candidates.items():
+        for path in paths:
+            st = os.stat(path)
+            for source_path in sources.get(filename, []):
+                source_st = os.stat(source_path)
+                if source_st.st_size != st.st_size or \
+                        not filecmp.cmp(source_path, path, shallow=False):
+                    continue
+                tmp_path = '%s.%d.%d.tmp' % (path, os.getpid(), get_ident())
+                try:
+                    # changing the mode of a hardlink would also affect the source
+                    method = clone_file(
+                        source_path, tmp_path,
+                        allow_hardlink=stat.S_IMODE(source_st.st_mode) ==
+                        stat.S_IMODE(st.st_mode))
+                    if method != 'hardlink':
+                        os.chmod(tmp_path, stat.S_IMODE(st.st_mode))
+                        # keep the timestamps the install step compares
+                        os.utime(tmp_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+                    os.replace(tmp_path, path)
+                except BaseException:
+                    if os.path.lexists(tmp_path):
+                        os.remove(tmp_path)
+                    raise
+                manifest.update(source_path, path)
+                count += 1
+                break
+    return count
+
+
+def write_file_if_changed(path, content):
+    """
+    Write a file unless it already has the same content.
+
+    Keeping unchanged files untouched preserves their modification time and
+    avoids redoing work which depends on it.
+    The file is replaced atomically and keeps the mode of the existing file.
+
+    :returns: ``True`` if the file has been written
+    """
+    try:
+        with open(path, 'r') as h:
+            if h.read() == content:
+                return False
+    except (OSError, UnicodeDecodeError):
+        pass
+    tmp_path = '%s.%d.%d.tmp' % (path, os.getpid(), get_ident())
+    try:
+        with open(tmp_path, 'w') as h:
+            h.write(content)
+        try:
+            # keep the mode of the existing file, e.g. the executable bit
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(path).st_mode))
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return True
+
 
 def quote_shell_command(cmd):
     if os.name != 'nt':
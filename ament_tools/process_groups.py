@@ -0,0 +1,115 @@
+# Copyright 2018 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Track the process groups of running commands per job.
+
+Every command is started in its own process group (on POSIX systems) so that
+all of its descendants, e.g. the compilers spawned by ``make``, can be
+terminated together when the build is being aborted.
+The commands stay in the session of ament, but since their process groups
+don't receive the signals sent to ament, e.g. when the terminal is closed,
+:py:func:`install_signal_handlers` forwards them.
+"""
+
+import os
+import signal
+import sys
+import time
+from threading import Condition
+from threading import current_thread
+from threading import main_thread
+
+TERMINATE_TIMEOUT = 5.0
+
+_condition = Condition()
+_process_groups = {}
+
+
+def register_process_group(job_name, pgid):
+    with _condition:
+        _process_groups.setdefault(job_name, set()).add(pgid)
+
+
+def unregister_process_group(job_name, pgid):
+    with _condition:
+        pgids = _process_groups.get(job_name, set())
+        pgids.discard(pgid)
+        if not pgids:
+            _process_groups.pop(job_name, None)
+        _condition.notify_all()
+
+
+def get_process_groups(job_names=None):
+    with _condition:
+        return {
+            pgid
+            for job_name, pgids in _process_groups.items()
+            if job_names is None or job_name in job_names
+            for pgid in pgids}
+
+
+def _signal_process_groups(pgids, signum):
+    for pgid in pgids:
+        try:
+            os.killpg(pgid, signum)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+def terminate_process_groups(job_names=None, timeout=TERMINATE_TIMEOUT):
+    """
+    Terminate the process groups of running commands.
+
+    First ``SIGTERM`` is being sent to all process groups.
+    Process groups which haven't been unregistered after the timeout, meaning
+    their commands haven't finished, are being killed with ``SIGKILL``.
+
+    :param list job_names: only terminate the process groups of these jobs,
+        if ``None`` all registered process groups are terminated
+    :param float timeout: the time to wait before killing the process groups
+    """
+    pgids = get_process_groups(job_names)
+    if not pgids:
+        return
+    _signal_process_groups(pgids, signal.SIGTERM)
+    deadline = time.monotonic() + timeout
+    with _condition:
+        while True:
+            remaining = pgids & get_process_groups(job_names)
+            wait_time = deadline - time.monotonic()
+            if not remaining or wait_time <= 0:
+                break
+            _condition.wait(wait_time)
+    _signal_process_groups(remaining, signal.SIGKILL)
+
+
+def _handle_signal(signum, frame):
+    terminate_process_groups()
+    sys.exit(128 + signum)
+
+
+def install_signal_handlers():
+    """
+    Terminate the registered process groups on ``SIGTERM`` and ``SIGHUP``.
+
+    After the process groups have been terminated the process exits with
+    ``128 + signum``.
+    Signal handlers can only be installed from the main thread, when being
+    called from any other thread this function does nothing.
+    """
+    if os.name == 'nt' or current_thread() is not main_thread():
+        return
+    for signum in (signal.SIGTERM, signal.SIGHUP):
+        signal.signal(signum, _handle_signal)
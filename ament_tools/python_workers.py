@@ -0,0 +1,302 @@
+# Copyright 2018 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Run Python commands in pre-warmed worker interpreters.
+
+Starting an interpreter and importing setuptools takes a significant part of
+the time needed to process a small Python package.
+A worker is a long-lived interpreter which has setuptools imported already.
+It receives jobs (the working directory, the environment changes and the
+arguments) over a pipe and forks for each of them, therefore the global state
+of a job doesn't leak into the next one.
+Each forked process runs in a new process group and writes to the inherited
+standard output and error like a separately started command.
+
+A worker only handles one job at a time, the pool starts additional workers
+for concurrent jobs.
+Since the environment affects the interpreter start-up as well as the
+imported modules the workers are separated by the interpreter and all
+environment variables starting with ``PYTHON`` or ``SETUPTOOLS_`` except the
+``PYTHONPATH`` which is applied per job.
+Workers are only available on platforms supporting ``fork`` and exit
+together with this process.
+"""
+
+import json
+import os
+import subprocess
+from threading import Lock
+
+# the modules which are imported before forking
+PREWARMED_MODULES = [
+    'setuptools',
+    'setuptools.command.build_py',
+    'setuptools.command.egg_info',
+    'setuptools.command.install',
+]
+
+# the modules which must not be shadowed by the PYTHONPATH of a job
+_PREWARMED_TOP_LEVEL_NAMES = ['_distutils_hack', 'distutils', 'pkg_resources', 'setuptools']
+
+# the code of a worker, it must work with any Python 3 interpreter
+# and therefore doesn't use anything from ament_tools
+_WORKER_CODE = '''
+import json
+import os
+import runpy
+import sys
+import traceback
+
+def run_job(job, base_path):
+    os.setpgrp()
+    if job['stdout'] is not None:
+        fd = os.open(job['stdout'], os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        os.dup2(fd, 1)
+        os.close(fd)
+    fd = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(fd, 0)
+    os.close(fd)
+    os.chdir(job['cwd'])
+    for name in job['unset']:
+        os.environ.pop(name, None)
+    os.environ.update(job['set'])
+    python_path = [
+        os.path.abspath(p) for p in os.environ.get('PYTHONPATH', '').split(os.pathsep) if p]
+    argv = job['argv']
+    try:
+        if argv[0] == '-c':
+            sys.argv = ['-c'] + argv[2:]
+            sys.path[:] = [''] + python_path + base_path
+            exec(compile(argv[1], '<string>', 'exec'), {'__name__': '__main__'})
+        else:
+            sys.argv = list(argv)
+            sys.path[:] = [os.path.dirname(os.path.abspath(argv[0]))] + \\
+                python_path + base_path
+            runpy.run_path(argv[0], run_name='__main__')
+        rc = 0
+    except SystemExit as e:
+        if e.code is None:
+            rc = 0
+        elif isinstance(e.code, int):
+            rc = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            rc = 1
+    except BaseException:
+        traceback.print_exc()
+        rc = 1
+    sys.stdout.flush()
+    sys.stderr.flush()
+    return rc
+
+def main(job_fd, result_fd, modules):
+    jobs = os.fdopen(job_fd, 'r')
+    results = os.fdopen(result_fd, 'w')
+    try:
+        for module in modules:
+            __import__(module)
+    except ImportError as e:
+        results.write(json.dumps({'error': str(e)}) + '\\n')
+        return
+    results.write(json.dumps({'ready': True}) + '\\n')
+    results.flush()
+    base_path = [p for p in sys.path if p]
+    for line in jobs:
+        job = json.loads(line)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            os.close(job_fd)
+            os.close(result_fd)
+            os._exit(run_job(job, base_path))
+        results.write(json.dumps({'pid': pid}) + '\\n')
+        results.flush()
+        _, status = os.waitpid(pid, 0)
+        if os.WIFSIGNALED(status):
+            rc = -os.WTERMSIG(status)
+        else:
+            rc = os.WEXITSTATUS(status)
+        results.write(json.dumps({'returncode': rc}) + '\\n')
+        results.flush()
+
+main(int(sys.argv[1]), int(sys.argv[2]), sys.argv[3:])
+'''
+
+
+class PythonWorkerError(RuntimeError):
+    pass
+
+
+class PythonWorker(object):
+    """A pre-warmed interpreter forking for each job."""
+
+    def __init__(self, python_interpreter, env):
+        self.env = env
+        job_r, job_w = os.pipe()
+        result_r, result_w = os.pipe()
+        try:
+            # a separate process group isn't affected by signals sent to the
+            # foreground process group of the terminal
+            self.process = subprocess.Popen(
+                [python_interpreter, '-c', _WORKER_CODE, str(job_r), str(result_w)] +
+                PREWARMED_MODULES,
+                env=env, stdin=subprocess.DEVNULL, pass_fds=(job_r, result_w),
+                preexec_fn=os.setpgrp)
+        except OSError:
+            for fd in (job_r, job_w, result_r, result_w):
+                os.close(fd)
+            raise
+        os.close(job_r)
+        os.close(result_w)
+        self._jobs = os.fdopen(job_w, 'w')
+        self._results = os.fdopen(result_r, 'r')
+        reply = self._read_reply()
+        if 'ready' not in reply:
+            self.close()
+            raise PythonWorkerError(reply.get('error', 'Unexpected reply'))
+
+    def _read_reply(self):
+        line = self._results.readline()
+        if not line:
+            raise PythonWorkerError('The worker terminated unexpectedly')
+        return json.loads(line)
+
+    def run(self, argv, cwd, env, stdout=None, on_start=None):
+        """
+        Run a job and wait for it to finish.
+
+        :param list argv: the arguments passed to the interpreter, either a
+            script followed by its arguments or ``-c`` followed by the code
+        :param str cwd: the working directory
+        :param dict env: the environment of the job
+        :param str stdout: the path of a file to redirect the standard output
+            to, if ``None`` it is inherited
+        :param on_start: a function called with the process id of the job
+            (which is also its process group id) once it has been started
+        :returns: the return code
+        :raises PythonWorkerError: if the worker died before starting the job
+        """
+        job = {
+            'argv': argv,
+            'cwd': cwd,
+            'set': {k: v for k, v in env.items() if self.env.get(k) != v},
+            'stdout': stdout,
+            'unset': [k for k in self.env.keys() if k not in env],
+        }
+        try:
+            self._jobs.write(json.dumps(job) + '\n')
+            self._jobs.flush()
+        except OSError:
+            raise PythonWorkerError('The worker terminated unexpectedly')
+        pid = self._read_reply()['pid']
+        if on_start:
+            on_start(pid)
+        try:
+            reply = self._read_reply()
+        except PythonWorkerError:
+            # the job might have been started already and can't be retried
+            return 1
+        return reply['returncode']
+
+    def close(self):
+        # the worker exits when its job pipe is closed,
+        # which also happens when this process exits
+        try:
+            self._jobs.close()
+        except OSError:
+            pass
+        self._results.close()
+        self.process.wait()
+
+
+_idle_workers = {}
+_unavailable = set()
+_lock = Lock()
+
+
+def _get_worker_key(python_interpreter, env):
+    return (python_interpreter, ) + tuple(sorted(
+        (k, v) for k, v in env.items()
+        if (k.startswith('PYTHON') and k != 'PYTHONPATH') or k.startswith('SETUPTOOLS_')))
+
+
+def _shadows_prewarmed_modules(env):
+    for path in env.get('PYTHONPATH', '').split(os.pathsep):
+        if not path:
+            continue
+        for name in _PREWARMED_TOP_LEVEL_NAMES:
+            if os.path.exists(os.path.join(path, name)) or \
+                    os.path.exists(os.path.join(path, name + '.py')):
+                return True
+    return False
+
+
+def is_python_worker_command(cmd):
+    """
+    Check if a command can be run by a worker.
+
+    :param list cmd: the command, an interpreter followed by either a
+        ``setup.py`` file and its arguments or ``-c`` and the code
+    """
+    if not hasattr(os, 'fork'):
+        return False
+    if len(cmd) < 2 or '&&' in cmd:
+        return False
+    if os.path.basename(cmd[1]) == 'setup.py':
+        return True
+    return cmd[1] == '-c' and len(cmd) >= 3
+
+
+def run_in_python_worker(cmd, cwd, env=None, stdout=None, on_start=None):
+    """
+    Run a command in a pre-warmed worker if that is safe.
+
+    :param list cmd: the command, see :py:func:`is_python_worker_command`
+    :param str cwd: the working directory
+    :param dict env: the environment, defaults to ``os.environ``
+    :param str stdout: the path of a file to redirect the standard output to
+    :param on_start: a function called with the process group id of the job
+    :returns: the return code or ``None`` if the command can't be run by a
+        worker and needs to be invoked as usual
+    """
+    if not is_python_worker_command(cmd):
+        return None
+    if env is None:
+        env = dict(os.environ)
+    if _shadows_prewarmed_modules(env):
+        return None
+    key = _get_worker_key(cmd[0], env)
+    with _lock:
+        if key in _unavailable:
+            return None
+        workers = _idle_workers.get(key)
+        worker = workers.pop() if workers else None
+    if worker is None:
+        try:
+            worker = PythonWorker(
+                cmd[0], {k: v for k, v in env.items() if k != 'PYTHONPATH'})
+        except (OSError, PythonWorkerError):
+            with _lock:
+                _unavailable.add(key)
+            return None
+    try:
+        rc = worker.run(cmd[1:], cwd, env, stdout=stdout, on_start=on_start)
+    except PythonWorkerError:
+        worker.close()
+        return None
+    with _lock:
+        _idle_workers.setdefault(key, []).append(worker)
+    return rc
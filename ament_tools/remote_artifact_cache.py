@@ -0,0 +1,228 @@
+# Copyright 2018 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Share the artifact cache between hosts over HTTP.
+
+The protocol consists of two requests:
+
+* ``GET /artifacts/<key>`` responds with the gzip compressed tarball of the
+  artifact or with the status 404 if the key is unknown.
+* ``PUT /artifacts/<key>`` uploads a tarball, the server responds with the
+  status 201 if the artifact has been added or 200 if it already existed.
+
+The body of both requests is accompanied by the ``X-Content-SHA256`` header
+containing the hex digest of the body which is being verified by the
+receiver.
+Since the key is derived from all inputs of a package existing artifacts are
+never overwritten.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+import hashlib
+from http.server import BaseHTTPRequestHandler
+from http.server import HTTPServer
+import io
+import os
+import re
+from socketserver import ThreadingMixIn
+from threading import Lock
+import urllib.error
+import urllib.request
+import uuid
+
+CONTENT_HASH_HEADER = 'X-Content-SHA256'
+
+DEFAULT_PORT = 8766
+
+MAX_CONCURRENT_UPLOADS = 4
+
+REQUEST_TIMEOUT = 60
+
+_key_re = re.compile('^/artifacts/([0-9a-f]{64})$')
+
+
+def hash_content(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class RemoteArtifactCache:
+    """
+    A read-through / write-back layer on top of a local artifact cache.
+
+    Missing artifacts are downloaded into the local cache, new artifacts are
+    uploaded in the background.
+    Uploads are performed concurrently, :py:meth:`wait_for_uploads` blocks
+    until all pending uploads have finished.
+    Failing requests are reported but otherwise treated like cache misses.
+    """
+
+    def __init__(self, url, max_uploads=MAX_CONCURRENT_UPLOADS):
+        self.url = url.rstrip('/')
+        self._executor = ThreadPoolExecutor(max_workers=max_uploads)
+        self._lock = Lock()
+        self._uploads = []
+
+    def _get_url(self, key):
+        return '%s/artifacts/%s' % (self.url, key)
+
+    def fetch(self, key, local_cache):
+        """
+        Download an artifact into the local cache.
+
+        :returns: ``True`` if the artifact has been added to the local cache
+        """
+        try:
+            with urllib.request.urlopen(self._get_url(key), timeout=REQUEST_TIMEOUT) as r:
+                data = r.read()
+                expected_hash = r.headers.get(CONTENT_HASH_HEADER)
+        except urllib.error.HTTPError as e:
+            if e.code != 404:
+                print("-- [ament] Failed to fetch artifact '%s': %s" % (key, e))
+            return False
+        except (OSError, urllib.error.URLError) as e:
+            print("-- [ament] Failed to fetch artifact '%s': %s" % (key, e))
+            return False
+        if expected_hash != hash_content(data):
+            print("-- [ament] Ignoring artifact '%s' with a wrong content hash" % key)
+            return False
+        try:
+            return local_cache.import_entry(key, io.BytesIO(data))
+        except (OSError, ValueError) as e:
+            print("-- [ament] Ignoring invalid artifact '%s': %s" % (key, e))
+            return False
+
+    def upload(self, key, local_cache):
+        """Upload an artifact from the local cache in the background."""
+        future = self._executor.submit(self._upload, key, local_cache)
+        with self._lock:
+            self._uploads.append(future)
+        return future
+
+    def _upload(self, key, local_cache):
+        buf = io.BytesIO()
+        if not local_cache.export_entry(key, buf):
+            return False
+        data = buf.getvalue()
+        request = urllib.request.Request(
+            self._get_url(key), data=data, method='PUT', headers={
+                'Content-Type': 'application/gzip',
+                CONTENT_HASH_HEADER: hash_content(data),
+            })
+        try:
+            with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT):
+                pass
+        except (OSError, urllib.error.URLError) as e:
+            print("-- [ament] Failed to upload artifact '%s': %s" % (key, e))
+            return False
+        return True
+
+    def wait_for_uploads(self):
+        """
+        Wait until all pending uploads have finished.
+
+        :returns: the number of failed uploads
+        """
+        with self._lock:
+            uploads = self._uploads
+            self._uploads = []
+        wait(uploads)
+        return len([f for f in uploads if f.exception() or not f.result()])
+
+
+_remote_caches = {}
+_remote_caches_lock = Lock()
+
+
+def get_remote_artifact_cache(url):
+    """Get the remote cache for a URL, shared by all packages of a build."""
+    with _remote_caches_lock:
+        if url not in _remote_caches:
+            _remote_caches[url] = RemoteArtifactCache(url)
+        return _remote_caches[url]
+
+
+def wait_for_uploads():
+    """
+    Wait for the pending uploads of all remote caches.
+
+    :returns: the number of failed uploads
+    """
+    with _remote_caches_lock:
+        remote_caches = list(_remote_caches.values())
+    return sum(c.wait_for_uploads() for c in remote_caches)
+
+
+class _ArtifactRequestHandler(BaseHTTPRequestHandler):
+
+    def _get_path(self):
+        match = _key_re.match(self.path)
+        if not match:
+            return None
+        key = match.group(1)
+        return os.path.join(self.server.path, key[:2], key + '.tar.gz')
+
+    def _send(self, code, data=b''):
+        self.send_response(code)
+        self.send_header('Content-Length', str(len(data)))
+        if data:
+            self.send_header('Content-Type', 'application/gzip')
+            self.send_header(CONTENT_HASH_HEADER, hash_content(data))
+        self.end_headers()
+        if data:
+            self.wfile.write(data)
+
+    def do_GET(self):
+        path = self._get_path()
+        if path is None:
+            return self._send(400)
+        try:
+            with open(path, 'rb') as h:
+                data = h.read()
+        except FileNotFoundError:
+            return self._send(404)
+        self._send(200, data)
+
+    def do_PUT(self):
+        path = self._get_path()
+        if path is None:
+            return self._send(400)
+        length = int(self.headers.get('Content-Length', 0))
+        data = self.rfile.read(length)
+        if self.headers.get(CONTENT_HASH_HEADER) != hash_content(data):
+            return self._send(400)
+        if os.path.exists(path):
+            return self._send(200)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = '%s.%s.tmp' % (path, uuid.uuid4().hex)
+        with open(tmp_path, 'wb') as h:
+            h.write(data)
+        os.replace(tmp_path, path)
+        self._send(201)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class ArtifactServer(ThreadingMixIn, HTTPServer):
+    """A reference server storing the artifacts in a local directory."""
+
+    daemon_threads = True
+
+    def __init__(self, address, path, quiet=False):
+        self.path = os.path.abspath(path)
+        self.quiet = quiet
+        super().__init__(address, _ArtifactRequestHandler)
@@ -14,6 +14,8 @@
 
 import ast
 import distutils.core
+import hashlib
+import json
 import os
 try:
     import setuptools
@@ -23,12 +25,43 @@ import subprocess
 import sys
 from threading import Lock
 
+from ament_tools.build_type import get_command_environment
 from ament_tools.build_type import get_command_prefix
+from ament_tools.environment_snapshots import IGNORED_VARIABLES
 from ament_tools.helper import quote_shell_command
+from ament_tools.python_workers import run_in_python_worker
+
+# the name of the file in the build space caching the captured arguments
+SETUP_ARGUMENTS_CACHE = 'setup_arguments.cache'
 
 setup_lock = None
 
 
+def _get_setup_arguments_key(source_space, env, build_dependencies):
+    h = hashlib.sha256()
+    h.update(sys.executable.encode())
+    for filename in ['setup.py', 'setup.cfg']:
+        h.update(b'\0' + filename.encode() + b'\0')
+        try:
+            with open(os.path.join(source_space, filename), 'rb') as f:
+                h.update(f.read())
+        except FileNotFoundError:
+            pass
+    if env is None:
+        # the environment is only known after sourcing the dependencies
+        env = dict(os.environ)
+        for dependency in build_dependencies:
+            path = os.path.join(dependency, 'local_setup.bat')
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            env[path] = '%d %d' % (st.st_mtime_ns, st.st_size)
+    env = {k: v for k, v in env.items() if k not in IGNORED_VARIABLES}
+    h.update(json.dumps(env, sort_keys=True).encode())
+    return h.hexdigest()
+
+
 def get_setup_arguments_with_context(build_type, context):
     """
     Capture the arguments of the setup() function in the setup.py file.
@@ -37,14 +70,30 @@ def get_setup_arguments_with_context(build_type, context):
     a separate Python interpreter is being used which can have an extended
     PYTHONPATH etc.
 
+    The captured arguments are cached in the build space and reused as long
+    as the setup.py and setup.cfg files as well as the environment of the
+    dependencies are unchanged.
+
     :param build_type: the build type
     :param context: the context
     :type context: :py:class:`ament_tools.context.Context`
     :returns: a dictionary containing the arguments of the setup() function
     """
-    prefix = get_command_prefix(
-        '%s__setup' % build_type, context.build_space,
-        context.build_dependencies)
+    env = None
+    if os.name != 'nt':
+        env = get_command_environment(context.build_space, context.build_dependencies)
+    key = _get_setup_arguments_key(
+        context.source_space, env, context.build_dependencies)
+    cache_path = os.path.join(context.build_space, SETUP_ARGUMENTS_CACHE)
+    try:
+        with open(cache_path, 'r') as h:
+            cached = json.loads(h.read())
+    except (OSError, ValueError):
+        cached = None
+    if cached and cached.get('key') == key:
+        # the repr is stored since the arguments contain e.g. tuples
+        return ast.literal_eval(cached['arguments'])
+
     ament_tools_path = os.path.dirname(os.path.dirname(__file__))
     setuppy = os.path.join(context.source_space, 'setup.py')
     if os.name == 'nt':
@@ -57,13 +106,47 @@ def get_setup_arguments_with_context(build_type, context):
         "print(repr(get_setup_arguments('%s')))" % setuppy]
 
     # invoke get_setup_arguments() in a separate interpreter
-    cmd = prefix + [sys.executable, '-c', ';'.join(code_lines)]
-    cmd = quote_shell_command(cmd)
-    result = subprocess.run(
-        cmd, stdout=subprocess.PIPE, shell=True, check=True)
-    output = result.stdout.decode()
-
-    return ast.literal_eval(output)
+    cmd = [sys.executable, '-c', ';'.join(code_lines)]
+    if os.name == 'nt':
+        prefix = get_command_prefix(
+            '%s__setup' % build_type, context.build_space,
+            context.build_dependencies)
+        cmd = quote_shell_command(prefix + cmd)
+        result = subprocess.run(
+            cmd, stdout=subprocess.PIPE, shell=True, check=True)
+        output = result.stdout.decode()
+    else:
+        output = None
+        if context.get('python_workers'):
+            output = _get_output_from_python_worker(cmd, context.build_space, env)
+        if output is None:
+            result = subprocess.run(cmd, stdout=subprocess.PIPE, env=env, check=True)
+            output = result.stdout.decode()
+    args = ast.literal_eval(output)
+
+    os.makedirs(context.build_space, exist_ok=True)
+    tmp_path = '%s.%d.tmp' % (cache_path, os.getpid())
+    with open(tmp_path, 'w') as h:
+        h.write(json.dumps({'arguments': output.strip(), 'key': key}, sort_keys=True))
+    os.replace(tmp_path, cache_path)
+    return args
+
+
+def _get_output_from_python_worker(cmd, build_space, env):
+    # the output of the job is redirected into a file
+    os.makedirs(build_space, exist_ok=True)
+    output_path = os.path.join(build_space, SETUP_ARGUMENTS_CACHE + '.out')
+    try:
+        rc = run_in_python_worker(cmd, build_space, env=env, stdout=output_path)
+        if rc is None:
+            return None
+        if rc:
+            raise subprocess.CalledProcessError(rc, cmd)
+        with open(output_path, 'r') as h:
+            return h.read()
+    finally:
+        if os.path.exists(output_path):
+            os.remove(output_path)
 
 
 def get_setup_arguments(setup_py_path):
@@ -0,0 +1,244 @@
+# Copyright 2018 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Build the CMake packages of a workspace with a single Ninja invocation.
+
+Each CMake package is configured with the Ninja generator and the output
+path prefix ``<name>/`` which makes its ``build.ninja`` file usable from the
+build space base.
+A top-level build file includes a rewritten copy of each of these files as a
+``subninja`` and adds an install edge per package:
+
+* the edges of a package are ordered after the install edges of its
+  dependencies
+* the files listed in the install manifest of a package are declared as
+  outputs of its install edge, therefore files of dependent packages are only
+  rebuilt if an installed file actually changed
+"""
+
+from collections import OrderedDict
+import os
+import re
+
+from ament_tools.helper import write_file_if_changed
+
+# the build types of packages which can be part of the super-build
+SUPER_BUILD_BUILD_TYPES = ['ament_cmake', 'cmake']
+
+# the top-level build file in the build space base
+SUPER_BUILD_FILE = 'super_build.ninja'
+
+# the directory in the build space base containing the generated files
+SUPER_BUILD_DIRECTORY = '.super_build'
+
+# the files listing the installed files of a package
+INSTALL_MANIFESTS = ['install_manifest.txt', 'symlink_install_manifest.txt']
+
+# the names of these phony targets are not prefixed by CMake
+_unprefixed_target_re = re.compile(r'(?<![^ :|])(cmake_object_order_depends_target_)')
+
+
+def partition_super_build_jobs(jobs, build_types):
+    """
+    Partition the jobs into the ones before, during and after the super-build.
+
+    Packages which don't depend on any package of the super-build are
+    processed before, CMake packages which only depend on those or other
+    CMake packages are part of the super-build and the remaining packages
+    are processed afterwards.
+
+    :param jobs: the jobs in topological order, each with the recursive
+        ``depends``
+    :type jobs: :py:class:`collections.OrderedDict`
+    :param dict build_types: the build type of each package
+    :returns: a tuple of three ordered dictionaries
+    """
+    pre_jobs = OrderedDict()
+    super_jobs = OrderedDict()
+    post_jobs = OrderedDict()
+    for name, job in jobs.items():
+        depends = [d for d in job['depends'] if d in jobs]
+        if build_types[name] in SUPER_BUILD_BUILD_TYPES:
+            if all(d in pre_jobs or d in super_jobs for d in depends):
+                super_jobs[name] = job
+                continue
+        elif not any(d in super_jobs or d in post_jobs for d in depends):
+            pre_jobs[name] = job
+            continue
+        post_jobs[name] = job
+    return pre_jobs, super_jobs, post_jobs
+
+
+def _escape(path):
+    return path.replace('$', '$$').replace(' ', '$ ').replace(':', '$:')
+
+
+def _get_logical_lines(content):
+    # join lines continued with a trailing (unescaped) dollar sign
+    lines = []
+    continued = False
+    for line in content.splitlines():
+        if continued:
+            lines[-1] += line.lstrip(' ')
+        else:
+            lines.append(line)
+        trailing = len(lines[-1]) - len(lines[-1].rstrip('$'))
+        continued = trailing % 2 == 1
+        if continued:
+            lines[-1] = lines[-1][:-1]
+    return lines
+
+
+def _split_build_line(line):
+    # split a build statement into the outputs and the remaining part
+    i = len('build ')
+    while i < len(line):
+        if line[i] == '$':
+            i += 2
+            continue
+        if line[i] == ':':
+            return line[len('build '):i], line[i + 1:]
+        i += 1
+    return line[len('build '):], ''
+
+
+def _add_order_only_dependencies(line, dependencies):
+    dependencies = ' '.join(dependencies)
+    if ' || ' in line:
+        return line.replace(' || ', ' || %s ' % dependencies, 1)
+    line, separator, validations = line.partition(' |@ ')
+    return line + ' || ' + dependencies + separator + validations
+
+
+def rewrite_package_build_file(content, name, order_only_dependencies):
+    """
+    Rewrite the build file of a package to be included in the super-build.
+
+    The edges rerunning CMake are removed since the packages are configured
+    before the super-build, the unprefixed names of CMake targets are
+    prefixed and every edge gets the order-only dependencies.
+
+    :param str content: the content of the ``build.ninja`` file
+    :param str name: the name of the package which is also the output path
+        prefix
+    :param list order_only_dependencies: the (escaped) paths to add
+    :returns: the rewritten content
+    """
+    prefix = name + '/'
+    content = _unprefixed_target_re.sub(lambda m: prefix + m.group(1), content)
+    lines = []
+    skip = False
+    for line in _get_logical_lines(content):
+        if line.startswith(' '):
+            # the variables of the previous statement
+            if not skip:
+                lines.append(line)
+            continue
+        skip = False
+        if line.startswith('build '):
+            outputs, remainder = _split_build_line(line)
+            rule = remainder.split()[0] if remainder.split() else None
+            if rule == 'RERUN_CMAKE' or (
+                rule == 'phony' and prefix + 'CMakeCache.txt' in outputs.split(' ')
+            ):
+                skip = True
+                continue
+            if order_only_dependencies:
+                line = _add_order_only_dependencies(line, order_only_dependencies)
+        lines.append(line)
+    return '\n'.join(lines) + '\n'
+
+
+def get_installed_files(build_space):
+    """Get the files listed in the install manifests of a build space."""
+    installed_files = []
+    for manifest in INSTALL_MANIFESTS:
+        path = os.path.join(build_space, manifest)
+        if not os.path.isfile(path):
+            continue
+        with open(path, 'r') as h:
+            installed_files += [line for line in h.read().splitlines() if line]
+    return installed_files
+
+
+def _get_stamp(name):
+    return '%s/%s.installed' % (SUPER_BUILD_DIRECTORY, name)
+
+
+def generate_super_build_file(build_space_base, depends, cmake_executable):
+    """
+    Generate the top-level build file and the rewritten package build files.
+
+    :param str build_space_base: the build space containing all packages
+    :param depends: the packages in topological order mapped to their
+        recursive dependencies which are part of the super-build
+    :type depends: :py:class:`collections.OrderedDict`
+    :param str cmake_executable: the CMake executable running the install
+        scripts
+    :returns: the path of the top-level build file
+    """
+    lines = [
+        '# generated by ament_tools, do not edit',
+        '',
+        'rule ament_install',
+        '  command = (cd $build_space && $cmake -P cmake_install.cmake) && $cmake -E touch $out',
+        '  description = Installing $package',
+        '  restat = 1',
+        '',
+        # a phony target without inputs is always out of date, files installed
+        # from the source space can't be tracked otherwise
+        'build %s/always: phony' % SUPER_BUILD_DIRECTORY,
+        '',
+    ]
+    declared_files = set()
+    for name, dependencies in depends.items():
+        build_space = os.path.join(build_space_base, name)
+        stamps = [_get_stamp(d) for d in dependencies]
+        content = rewrite_package_build_file(
+            _read_file(os.path.join(build_space, 'build.ninja')), name, stamps)
+        package_file = os.path.join(build_space_base, SUPER_BUILD_DIRECTORY, '%s.ninja' % name)
+        os.makedirs(os.path.dirname(package_file), exist_ok=True)
+        write_file_if_changed(package_file, content)
+
+        # files installed by multiple packages can't be outputs of multiple edges
+        installed_files = [
+            f for f in get_installed_files(build_space) if f not in declared_files]
+        declared_files.update(installed_files)
+        outputs = _get_stamp(name)
+        if installed_files:
+            outputs += ' | ' + ' '.join(_escape(f) for f in installed_files)
+        inputs = '%s/all %s/always' % (name, SUPER_BUILD_DIRECTORY)
+        if stamps:
+            inputs += ' || ' + ' '.join(stamps)
+        lines += [
+            'subninja %s/%s.ninja' % (SUPER_BUILD_DIRECTORY, name),
+            'build %s: ament_install %s' % (outputs, inputs),
+            '  build_space = %s' % _escape(build_space),
+            '  cmake = %s' % _escape(cmake_executable),
+            '  package = %s' % name,
+            '',
+        ]
+    lines += [
+        'build all: phony %s' % ' '.join(_get_stamp(name) for name in depends.keys()),
+        'default all',
+    ]
+    path = os.path.join(build_space_base, SUPER_BUILD_FILE)
+    write_file_if_changed(path, '\n'.join(lines) + '\n')
+    return path
+
+
+def _read_file(path):
+    with open(path, 'r') as h:
+        return h.read()
@@ -18,25 +18,50 @@ from concurrent.futures import FIRST_COMPLETED
 from concurrent.futures import ThreadPoolExecutor
 from concurrent.futures import wait
 import copy
+import filecmp
 from multiprocessing import cpu_count
 import os
 import shutil
+import subprocess
 import sys
 
 from ament_package.templates import configure_file
 from ament_package.templates import get_isolated_prefix_level_template_names
 from ament_package.templates import get_isolated_prefix_level_template_path
+from ament_tools.build_journal import BuildJournal
+from ament_tools.build_journal import compute_journal_fingerprint
+from ament_tools.build_journal import create_journaled_callback
+from ament_tools.build_journal import STATE_NOT_STARTED
 from ament_tools.build_type_discovery import yield_supported_build_types
+from ament_tools.build_types.cmake_common import CMAKE_EXECUTABLE
+from ament_tools.build_types.cmake_common import get_ninja_output_path_prefix
+from ament_tools.build_types.cmake_common import NINJA_EXECUTABLE
+from ament_tools.build_types.cmake_common import ninjabuild_exists_at
+from ament_tools.build_types.compiler_cache import get_compiler_cache_env
+from ament_tools.build_types.compiler_cache import get_compiler_launcher
+from ament_tools.build_types.compiler_cache import print_compiler_cache_summary
+from ament_tools.context import Context
+from ament_tools.distributed import Coordinator
+from ament_tools.environment_snapshots import get_dependency_environment
 from ament_tools.helper import argparse_existing_dir
 from ament_tools.helper import combine_make_flags
 from ament_tools.helper import determine_path_argument
 from ament_tools.helper import extract_argument_group
+from ament_tools.helper import write_file_if_changed
+from ament_tools.process_groups import install_signal_handlers
+from ament_tools.process_groups import terminate_process_groups
+from ament_tools.remote_artifact_cache import wait_for_uploads
+from ament_tools.super_build import generate_super_build_file
+from ament_tools.super_build import partition_super_build_jobs
+from ament_tools.super_build import SUPER_BUILD_BUILD_TYPES
+from ament_tools.super_build import SUPER_BUILD_DIRECTORY
 from ament_tools.topological_order import topological_order
 from ament_tools.topological_order import topological_order_packages
 from ament_tools.verbs import VerbExecutionError
 from ament_tools.verbs.build_pkg import main as build_pkg_main
 from ament_tools.verbs.build_pkg.cli import add_arguments \
     as build_pkg_add_arguments
+from ament_tools.verbs.build_pkg.cli import get_build_type
 
 from osrf_pycommon.cli_utils.verb_pattern import call_prepare_arguments
 
@@ -126,6 +151,27 @@ def prepare_arguments(parser, args):
         action='store_true',
         help='Enable building packages in parallel',
     )
+    parser.add_argument(
+        '--workers',
+        nargs='+', default=[], metavar='HOST[:PORT]',
+        help="Distribute the packages across workers started with 'ament worker' "
+             '(all hosts must share the workspace under the same path)',
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        default=False,
+        help='Skip packages which have been processed successfully before '
+             'with the same options and sources (based on the journal of the verb)',
+    )
+    parser.add_argument(
+        '--super-build',
+        action='store_true',
+        default=False,
+        help='Experimental: build the CMake packages with a single Ninja invocation '
+             'spanning all of them (requires --use-ninja, the first build '
+             'configures the packages one by one)',
+    )
 
     # Allow all available build_type's to provide additional arguments
     for build_type in yield_supported_build_types():
@@ -137,7 +183,8 @@ def prepare_arguments(parser, args):
     return parser
 
 
-def main(opts, per_package_main=build_pkg_main):
+def main(opts, per_package_main=build_pkg_main, verb='build'):
+    install_signal_handlers()
     # use PWD in order to work when being invoked in a symlinked location
     cwd = os.getenv('PWD', os.curdir)
     opts.directory = os.path.abspath(os.path.join(cwd, opts.directory))
@@ -161,6 +208,8 @@ def main(opts, per_package_main=build_pkg_main):
 
     pkg_names = [p.name for _, p, _ in packages]
     check_opts(opts, pkg_names)
+    if getattr(opts, 'super_build', False):
+        check_super_build_opts(opts, per_package_main)
     consolidate_package_selection(opts, pkg_names)
     print_topological_order(opts, pkg_names)
 
@@ -169,7 +218,7 @@ def main(opts, per_package_main=build_pkg_main):
               file=sys.stderr)
         return 0
 
-    return iterate_packages(opts, packages, per_package_main)
+    return iterate_packages(opts, packages, per_package_main, verb=verb)
 
 
 def check_opts(opts, package_names):
@@ -212,6 +261,21 @@ def check_opts(opts, package_names):
                 break
 
 
+def check_super_build_opts(opts, per_package_main):
+    if per_package_main is not build_pkg_main:
+        raise VerbExecutionError('The super-build is only supported when building')
+    if os.name == 'nt':
+        raise VerbExecutionError('The super-build is not supported on Windows')
+    if not getattr(opts, 'use_ninja', False):
+        raise VerbExecutionError('The super-build requires the --use-ninja option')
+    if getattr(opts, 'workers', None):
+        raise VerbExecutionError('The super-build can not be distributed across workers')
+    if getattr(opts, 'cmake_target', None):
+        raise VerbExecutionError('The super-build always builds all CMake targets')
+    if NINJA_EXECUTABLE is None:
+        raise VerbExecutionError("Could not find 'ninja' executable")
+
+
 def consolidate_package_selection(opts, package_names):
     # after this function opts.skip_packages will contain the information from:
     # start_with, end_with, only_packages
@@ -241,7 +305,7 @@ def print_topological_order(opts, package_names):
             print(' - %s' % pkg_name)
 
 
-def iterate_packages(opts, packages, per_package_callback):
+def iterate_packages(opts, packages, per_package_callback, verb='build'):
     install_space_base = opts.install_space
     package_dict = {path: package for path, package, _ in packages}
     workspace_package_names = [pkg.name for pkg in package_dict.values()]
@@ -296,11 +360,59 @@ def iterate_packages(opts, packages, per_package_callback):
         if package.name == opts.end_with:
             break
 
-    if not opts.parallel:
+    coordinator = None
+    if getattr(opts, 'workers', None):
+        if per_package_callback is not build_pkg_main:
+            raise VerbExecutionError(
+                'Distributing packages across workers is only supported when building')
+        try:
+            coordinator = Coordinator(opts.workers)
+        except OSError as e:
+            raise VerbExecutionError('Could not connect to the workers: %s' % e)
+        for job in jobs.values():
+            job['callback'] = coordinator.run_job
+
+    journal = BuildJournal(opts.build_space, verb=verb)
+    # the jobs are in topological order
+    fingerprints = {}
+    for package_name, job in jobs.items():
+        fingerprints[package_name] = compute_journal_fingerprint(
+            job['opts'], per_package_callback,
+            {name: fingerprints.get(name) for name in job['depends']})
+    if getattr(opts, 'resume', False):
+        skip_up_to_date_jobs(jobs, journal, fingerprints)
+    journal.set_states({
+        package_name: (STATE_NOT_STARTED, fingerprints[package_name])
+        for package_name in jobs.keys()})
+    for package_name, job in jobs.items():
+        job['callback'] = create_journaled_callback(
+            journal, package_name, fingerprints[package_name], job['callback'])
+
+    # processing the jobs removes them from the dictionary
+    package_names = list(jobs.keys())
+    if coordinator:
+        try:
+            rc = process_in_parallel(
+                jobs, max_workers=coordinator.slots, on_abort=coordinator.stop)
+        finally:
+            coordinator.close()
+    elif getattr(opts, 'super_build', False):
+        rc = process_super_build(opts, jobs)
+    elif not opts.parallel:
         rc = process_sequentially(jobs)
     else:
         rc = process_in_parallel(jobs)
 
+    if getattr(opts, 'compiler_cache', 'none') != 'none':
+        print_compiler_cache_summary(
+            opts.build_space, package_names,
+            concurrent=bool(coordinator or opts.parallel))
+
+    failed_uploads = wait_for_uploads()
+    if failed_uploads:
+        print('Failed to upload %d artifacts to the remote artifact cache' % failed_uploads,
+              file=sys.stderr)
+
     if not rc and opts.end_with:
         print("Stopped after package '{0}'".format(opts.end_with))
 
@@ -315,13 +427,14 @@ def iterate_packages(opts, packages, per_package_callback):
                 })
                 destination_path = os.path.join(
                     install_space_base, name[:-3])
-                with open(destination_path, 'w') as h:
-                    h.write(content)
+                write_file_if_changed(destination_path, content)
             else:
                 dst = os.path.join(install_space_base, name)
                 if os.path.exists(dst):
-                    if not opts.symlink_install or \
-                            not os.path.islink(dst) or \
+                    if not opts.symlink_install:
+                        if os.path.islink(dst) or not filecmp.cmp(template_path, dst):
+                            os.remove(dst)
+                    elif not os.path.islink(dst) or \
                             not os.path.samefile(template_path, dst):
                         os.remove(dst)
                 if not os.path.exists(dst):
@@ -333,6 +446,109 @@ def iterate_packages(opts, packages, per_package_callback):
     return rc
 
 
+def skip_up_to_date_jobs(jobs, journal, fingerprints):
+    # jobs are in topological order, a job can only be skipped
+    # if none of its dependencies is being processed again
+    for package_name in list(jobs.keys()):
+        job = jobs[package_name]
+        if set(job['depends']) & set(jobs.keys()):
+            continue
+        if journal.is_up_to_date(package_name, fingerprints[package_name]):
+            print('# Skipping (resume): %s' % package_name)
+            del jobs[package_name]
+
+
+def process_super_build(opts, jobs):
+    build_types = {
+        package_name: get_build_type(job['opts'].path) for package_name, job in jobs.items()}
+    pre_jobs, super_jobs, post_jobs = partition_super_build_jobs(jobs, build_types)
+
+    # the other packages are being processed before and after the super-build
+    rc = process_in_parallel(pre_jobs) if opts.parallel else process_sequentially(pre_jobs)
+    if rc:
+        return rc
+
+    if super_jobs:
+        not_configured = [
+            package_name for package_name in super_jobs.keys()
+            if not is_configured_for_super_build(os.path.join(opts.build_space, package_name))]
+        if not_configured:
+            print('# Super-build: processing the CMake packages one by one since some '
+                  'have not been configured for the super-build yet: %s' %
+                  ', '.join(not_configured))
+            # the build files of all packages are used from the same directory
+            # which Ninja doesn't support concurrently
+            rc = process_sequentially(super_jobs)
+        else:
+            rc = run_super_build(opts, super_jobs)
+        if rc:
+            return rc
+
+    if opts.parallel and not any(
+        build_types[package_name] in SUPER_BUILD_BUILD_TYPES for package_name in post_jobs
+    ):
+        return process_in_parallel(post_jobs)
+    return process_sequentially(post_jobs)
+
+
+def is_configured_for_super_build(build_space):
+    return ninjabuild_exists_at(build_space) and \
+        get_ninja_output_path_prefix(build_space) == os.path.basename(build_space) + '/'
+
+
+def _get_super_build_environment(opts, dependencies):
+    env = get_dependency_environment(opts.build_space, dependencies)
+    env['CMAKE_PREFIX_PATH'] = os.pathsep.join(
+        v for v in [env.get('AMENT_PREFIX_PATH'), env.get('CMAKE_PREFIX_PATH')] if v)
+    return env
+
+
+def run_super_build(opts, jobs):
+    # configure the packages in topological order,
+    # CMake is only invoked if any of its inputs changed
+    for package_name, job in jobs.items():
+        print("+++ Configuring '{0}' for the super-build".format(package_name))
+        env = _get_super_build_environment(opts, job['opts'].build_dependencies)
+        build_file = '%s/build.ninja' % package_name
+        rc = subprocess.call(
+            [NINJA_EXECUTABLE, '-f', build_file, build_file], cwd=opts.build_space, env=env)
+        if rc:
+            return rc
+
+    path = generate_super_build_file(
+        opts.build_space,
+        OrderedDict(
+            (package_name, [d for d in job['depends'] if d in jobs.keys()])
+            for package_name, job in jobs.items()),
+        CMAKE_EXECUTABLE)
+
+    dependencies = []
+    for job in jobs.values():
+        dependencies += [
+            d for d in job['opts'].build_dependencies if d not in dependencies]
+    env = _get_super_build_environment(opts, dependencies)
+    context = Context()
+    context.build_space = os.path.join(opts.build_space, SUPER_BUILD_DIRECTORY)
+    context.compiler_launcher = get_compiler_launcher(getattr(opts, 'compiler_cache', None))
+    env = get_compiler_cache_env(context, env)
+
+    print('+++ Building %d packages with a single Ninja invocation' % len(jobs))
+    rc = subprocess.call(
+        [NINJA_EXECUTABLE, '-f', path] + opts.make_flags, cwd=opts.build_space, env=env)
+    if rc:
+        return rc
+
+    # the packages have been installed by CMake,
+    # the per package install step deploys the remaining files
+    for package_name, job in jobs.items():
+        package_opts = copy.copy(job['opts'])
+        package_opts.skip_build = True
+        rc = job['callback'](package_opts)
+        if rc:
+            return rc
+    return 0
+
+
 def process_sequentially(jobs):
     rc = 0
     for package_name in jobs:
@@ -343,10 +559,11 @@ def process_sequentially(jobs):
     return rc
 
 
-def process_in_parallel(jobs):
+def process_in_parallel(jobs, max_workers=None, on_abort=None):
     for package_name, job in jobs.items():
         job['depends'] = [n for n in job['depends'] if n in jobs.keys()]
-    max_workers = cpu_count()
+    if max_workers is None:
+        max_workers = cpu_count()
     threadpool = ThreadPoolExecutor(max_workers=max_workers)
     futures = {}
     finished_jobs = {}
@@ -371,7 +588,18 @@ def process_in_parallel(jobs):
 
         # wait for futures
         assert futures
-        done_futures, _ = wait(futures.keys(), timeout=60, return_when=FIRST_COMPLETED)
+        try:
+            done_futures, _ = wait(futures.keys(), timeout=60, return_when=FIRST_COMPLETED)
+        except KeyboardInterrupt:
+            for future in futures:
+                future.cancel()
+            print('Terminating running jobs: %s' % ', '.join(sorted(futures.values())),
+                  file=sys.stderr)
+            terminate_process_groups()
+            if on_abort:
+                on_abort()
+            threadpool.shutdown()
+            raise
 
         if not done_futures:  # timeout
             print('[Waiting for: %s]' % ', '.join(sorted(futures.values())))
@@ -395,9 +623,16 @@ def process_in_parallel(jobs):
                 rc = result
 
         # if any job failed cancel pending futures
+        # and terminate the commands of the running ones
         if rc:
             for future in futures:
                 future.cancel()
+            if futures:
+                print('Terminating running jobs: %s' % ', '.join(sorted(futures.values())),
+                      file=sys.stderr)
+                terminate_process_groups(list(futures.values()))
+                if on_abort:
+                    on_abort()
             break
 
     threadpool.shutdown()
@@ -15,7 +15,9 @@
 import argparse
 import inspect
 import os
+import platform
 import shlex
+import signal
 import subprocess
 import sys
 
@@ -23,17 +25,53 @@ from ament_package.templates import configure_file
 from ament_package.templates import get_prefix_level_template_names
 from ament_package.templates import get_prefix_level_template_path
 
+from ament_tools.artifact_cache import ARTIFACT_KEY_CACHE
+from ament_tools.artifact_cache import ARTIFACT_LINKS_CACHE
+from ament_tools.artifact_cache import ArtifactCache
+from ament_tools.artifact_cache import compute_artifact_key
+from ament_tools.artifact_cache import DEFAULT_MAX_SIZE
+from ament_tools.artifact_cache import get_installed_files
+from ament_tools.artifact_cache import KEY_OPTIONS
+from ament_tools.build_journal import get_fingerprinted_options
 from ament_tools.build_type_discovery import get_class_for_build_type
 from ament_tools.build_type_discovery import MissingPluginError
+from ament_tools.build_types.compiler_cache import COMPILER_CACHE_STATS_LOG
+from ament_tools.build_types.compiler_cache import COMPILER_CACHES
+from ament_tools.build_types.compiler_cache import SCCACHE_STATS_FILE
+from ament_tools.build_types.common import get_cached_config
+from ament_tools.build_types.common import set_cached_config
 from ament_tools.context import Context
+from ament_tools.environment_snapshots import get_environment_snapshot
+from ament_tools.fingerprint import compute_package_fingerprint
+from ament_tools.fingerprint import compute_source_files
+from ament_tools.fingerprint import compute_source_fingerprint
+from ament_tools.fingerprint import compute_tree_stamp
+from ament_tools.fingerprint import explain_changes
+from ament_tools.helper import argparse_ionice_class
+from ament_tools.helper import argparse_nice_level
+from ament_tools.helper import break_deployed_hardlinks
 from ament_tools.helper import combine_make_flags
 from ament_tools.helper import deploy_file
 from ament_tools.helper import determine_path_argument
 from ament_tools.helper import extract_argument_group
+from ament_tools.helper import flush_deploy_manifest
+from ament_tools.helper import INSTALL_MODES
+from ament_tools.helper import IONICE_CLASSES
+from ament_tools.helper import write_file_if_changed
 from ament_tools.package_types import package_exists_at
 from ament_tools.package_types import parse_package
+from ament_tools.process_groups import install_signal_handlers
+from ament_tools.process_groups import register_process_group
+from ament_tools.process_groups import TERMINATE_TIMEOUT
+from ament_tools.process_groups import unregister_process_group
+from ament_tools.python_workers import run_in_python_worker
+from ament_tools.remote_artifact_cache import get_remote_artifact_cache
 
 from osrf_pycommon.cli_utils.verb_pattern import call_prepare_arguments
+from osrf_pycommon.process_utils import which
+
+IONICE_EXECUTABLE = which('ionice')
+NICE_EXECUTABLE = which('nice')
 
 
 def add_path_argument(parser):
@@ -178,6 +216,56 @@ def add_arguments(parser):
              'done before using symlinks and no new files have been added or '
              'when testing after a successful install)',
     )
+    parser.add_argument(
+        '--skip-unchanged',
+        action='store_true',
+        default=False,
+        help='Skip building and installing packages whose sources, options and '
+             'dependencies have not changed since their last successful build',
+    )
+    parser.add_argument(
+        '--explain-rebuild',
+        action='store_true',
+        default=False,
+        help='Print why the inputs of a package are considered to have changed',
+    )
+    parser.add_argument(
+        '--artifact-cache',
+        metavar='DIR',
+        help='Restore the installed files of packages from this cache directory '
+             'instead of building them if the sources, options, toolchain and '
+             'dependencies match a previous build, otherwise store them after '
+             'the install step (not used with --symlink-install)',
+    )
+    parser.add_argument(
+        '--artifact-cache-size',
+        type=int, default=DEFAULT_MAX_SIZE, metavar='MIB',
+        help='The maximum size of the artifact cache in MiB, the least recently '
+             'used entries are evicted (default %d)' % DEFAULT_MAX_SIZE,
+    )
+    parser.add_argument(
+        '--artifact-cache-url',
+        metavar='URL',
+        help='Fetch missing artifacts from and upload new artifacts to this '
+             "remote artifact cache (e.g. served by 'ament cache_server'), the "
+             "local artifact cache defaults to 'BUILD_SPACE/artifact_cache'",
+    )
+    parser.add_argument(
+        '--compiler-cache',
+        choices=COMPILER_CACHES, default='none',
+        help="Use a compiler cache as the compiler launcher of CMake packages, 'auto' "
+             'selects ccache or sccache if available (default: none)',
+    )
+    parser.add_argument(
+        '--install-mode',
+        choices=INSTALL_MODES, default='copy',
+        help="How ament_tools deploys files into the install space, 'link' uses "
+             'reflinks where the file system supports them, otherwise hardlinks '
+             'and finally copies (default: copy). With link the files installed by '
+             'CMake which are identical to files of the package are replaced the '
+             'same way. Hardlinked files share their content with the source and '
+             'must not be modified in place',
+    )
     parser.add_argument(
         '-s',
         '--symlink-install',
@@ -185,6 +273,19 @@ def add_arguments(parser):
         default=False,
         help='Use symlinks instead of copying files wherever possible',
     )
+    parser.add_argument(
+        '--nice',
+        action='append', default=[], type=argparse_nice_level, metavar='PHASE=LEVEL',
+        help="Run the commands of a phase ('build', 'install' or 'test') with the "
+             "given nice level, e.g. 'test=10' (can be passed multiple times)",
+    )
+    parser.add_argument(
+        '--ionice',
+        action='append', default=[], type=argparse_ionice_class, metavar='PHASE=CLASS',
+        help="Run the commands of a phase ('build', 'install' or 'test') with the "
+             "given IO scheduling class ('best-effort' or 'idle'), e.g. 'install=idle' "
+             '(can be passed multiple times)',
+    )
     parser.add_argument(
         '--python-interpreter',
         default=sys.executable,
@@ -239,7 +340,33 @@ def validate_package_path(path):
         raise ValueError("Path '{0}' does not contain a package".format(path))
 
 
-def run_command(build_action, context):
+def get_priority_command_prefix(context, phase):
+    """
+    Get the command prefix to run a command with the priority of a phase.
+
+    :param context: the context containing the ``nice_levels`` and
+        ``ionice_classes`` per phase
+    :param str phase: the phase, e.g. ``test``
+    :returns: list of arguments to prepend to the command
+    """
+    prefix = []
+    nice_level = context.get('nice_levels', {}).get(phase)
+    if nice_level is not None:
+        if NICE_EXECUTABLE is None:
+            print("Could not find 'nice' executable, ignoring nice level", file=sys.stderr)
+        else:
+            prefix += [NICE_EXECUTABLE, '-n', str(nice_level)]
+    ionice_class = context.get('ionice_classes', {}).get(phase)
+    if ionice_class is not None:
+        if IONICE_EXECUTABLE is None:
+            print("Could not find 'ionice' executable, ignoring IO scheduling class",
+                  file=sys.stderr)
+        else:
+            prefix += [IONICE_EXECUTABLE, '-c', IONICE_CLASSES[ionice_class]]
+    return prefix
+
+
+def run_command(build_action, context, phase=None):
     cwd = build_action.cwd
     if cwd is None:
         cwd = context.build_space
@@ -249,8 +376,23 @@ def run_command(build_action, context):
     try:
         cmd = build_action.cmd
         if os.name != 'nt':
-            cmd = ' '.join([(shlex.quote(c) if c != '&&' else c) for c in cmd])
-        subprocess.check_call(cmd, shell=True, cwd=cwd, env=build_action.env)
+            priority_prefix = get_priority_command_prefix(context, phase)
+            if '&&' in cmd:
+                # a sequence of shell commands, e.g. sourcing a setup file first
+                cmd = ' '.join([(shlex.quote(c) if c != '&&' else c) for c in cmd])
+                if priority_prefix:
+                    cmd = ' '.join(
+                        [shlex.quote(c) for c in priority_prefix + ['/bin/sh', '-c', cmd]])
+            elif context.get('python_workers') and not priority_prefix and \
+                    _run_in_python_worker(
+                        cmd, cwd, build_action.env, context.package_manifest.name):
+                return
+            else:
+                # the environment is passed explicitly, no shell is necessary
+                cmd = priority_prefix + list(cmd)
+            _run_in_process_group(cmd, cwd, build_action.env, context.package_manifest.name)
+        else:
+            subprocess.check_call(cmd, shell=True, cwd=cwd, env=build_action.env)
     except subprocess.CalledProcessError as exc:
         print()
         cmd_msg = exc.cmd
@@ -262,12 +404,64 @@ def run_command(build_action, context):
         sys.exit(msg)
 
 
-def handle_build_action(build_action_ret, context):
+def _run_in_python_worker(cmd, cwd, env, job_name):
+    # the forked process of the worker is a process group like a started command
+    pgids = []
+
+    def on_start(pgid):
+        pgids.append(pgid)
+        register_process_group(job_name, pgid)
+
+    try:
+        rc = run_in_python_worker(cmd, cwd, env=env, on_start=on_start)
+    except KeyboardInterrupt:
+        for pgid in pgids:
+            try:
+                os.killpg(pgid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        raise
+    finally:
+        for pgid in pgids:
+            unregister_process_group(job_name, pgid)
+    if rc is None:
+        # the command needs to be invoked as usual
+        return False
+    if rc:
+        raise subprocess.CalledProcessError(rc, cmd)
+    return True
+
+
+def _run_in_process_group(cmd, cwd, env, job_name):
+    # start the command in a new process group which can be terminated
+    # as a whole when the build is being aborted
+    process = subprocess.Popen(
+        cmd, shell=isinstance(cmd, str), cwd=cwd, env=env, preexec_fn=os.setpgrp)
+    register_process_group(job_name, process.pid)
+    try:
+        try:
+            rc = process.wait()
+        except KeyboardInterrupt:
+            # the new process group doesn't receive the SIGINT from the terminal
+            os.killpg(process.pid, signal.SIGTERM)
+            try:
+                process.wait(timeout=TERMINATE_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                os.killpg(process.pid, signal.SIGKILL)
+                process.wait()
+            raise
+    finally:
+        unregister_process_group(job_name, process.pid)
+    if rc:
+        raise subprocess.CalledProcessError(rc, cmd)
+
+
+def handle_build_action(build_action_ret, context, phase=None):
     if not inspect.isgenerator(build_action_ret):
         return
     for build_action in build_action_ret:
         if build_action.type == 'command':
-            run_command(build_action, context)
+            run_command(build_action, context, phase=phase)
         elif build_action.type == 'function':
             build_action.cmd(context)
         else:
@@ -276,6 +470,7 @@ def handle_build_action(build_action_ret, context):
 
 
 def main(opts):
+    install_signal_handlers()
     context = get_context(opts)
     return run(opts, context)
 
@@ -296,8 +491,7 @@ def expand_prefix_level_setup_files(context):
             })
             destination_path = os.path.join(
                 context.build_space, name[:-3])
-            with open(destination_path, 'w') as h:
-                h.write(content)
+            write_file_if_changed(destination_path, content)
 
 
 def deploy_prefix_level_setup_files(context):
@@ -311,6 +505,204 @@ def deploy_prefix_level_setup_files(context):
                 context, os.path.dirname(template_path), os.path.basename(template_path))
 
 
+PACKAGE_FINGERPRINT_CACHE = 'package_fingerprint'
+
+
+INSTALL_STAMP_CACHE = 'install_stamp'
+
+# files and directories in the build space not produced by the build step
+INSTALL_STAMP_IGNORED_NAMES = [
+    '.ninja_deps',
+    '.ninja_log',
+    'AMENT_IGNORE',
+    COMPILER_CACHE_STATS_LOG,
+    SCCACHE_STATS_FILE,
+    'Testing',
+    'test_results',
+]
+
+
+def get_install_stamp(opts, context, installed_files):
+    """
+    Compute a stamp of the build outputs and the installed files of a package.
+
+    The stamp consists of the newest modification time and the number of
+    files in the build space as well as the source space (for files which are
+    installed directly from the source space), the stats of the installed
+    files and the CMake targets of a partial build.
+
+    :param list installed_files: the paths relative to the install space
+    :returns: the stamp
+    """
+    ignored_paths = [os.path.join(context.build_space, n) for n in INSTALL_STAMP_IGNORED_NAMES]
+    if os.path.isdir(context.build_space):
+        # the cached configurations written by ament_tools
+        ignored_paths += [
+            os.path.join(context.build_space, n) for n in os.listdir(context.build_space)
+            if n.endswith('.cache')]
+    installed = {}
+    for rel_path in installed_files:
+        try:
+            st = os.lstat(os.path.join(context.install_space, rel_path))
+        except OSError:
+            installed[rel_path] = None
+            continue
+        installed[rel_path] = [st.st_mtime_ns, st.st_size]
+    return {
+        'build': compute_tree_stamp(context.build_space, ignored_paths=ignored_paths),
+        # a partial build only installs some components
+        'cmake_target': getattr(opts, 'cmake_target', None) or [],
+        'install_mode': getattr(opts, 'install_mode', None),
+        'install_space': context.install_space,
+        'installed': installed,
+        'source': compute_tree_stamp(
+            context.source_space, ignored_paths=[opts.build_space, opts.install_space]),
+    }
+
+
+def is_install_current(opts, context):
+    """
+    Check if the install space still contains what the last install produced.
+
+    The installed files, the install space and the install mode are compared
+    with the stamp recorded after the last install.
+    Without a recorded stamp only the package marker file is checked.
+
+    :returns: ``True`` if the installed files are unchanged
+    """
+    install_stamp = get_cached_config(context.build_space, INSTALL_STAMP_CACHE)
+    if not install_stamp:
+        return os.path.isfile(os.path.join(
+            context.install_space, 'share', 'ament_index', 'resource_index', 'packages',
+            context.package_manifest.name))
+    current = get_install_stamp(opts, context, install_stamp['installed'].keys())
+    return all(
+        install_stamp.get(key) == current[key]
+        for key in ['install_mode', 'install_space', 'installed'])
+
+
+def get_package_inputs(opts, context):
+    """
+    Collect the inputs of a package and compute their fingerprint.
+
+    The inputs consist of the files in the source space, the options
+    affecting the build and the fingerprints of the dependencies within the
+    workspace.
+
+    :returns: tuple of the record from the last successful build (or
+        ``None``) and the current record
+    """
+    previous = get_cached_config(context.build_space, PACKAGE_FINGERPRINT_CACHE)
+    files = compute_source_files(
+        context.source_space,
+        previous_files=previous.get('files') if previous else None,
+        ignored_paths=[opts.build_space, opts.install_space])
+    options = get_fingerprinted_options(opts)
+    dependencies = {}
+    build_space_base = os.path.dirname(context.build_space)
+    for path in context.build_dependencies:
+        name = os.path.basename(path)
+        dependency_record = get_cached_config(
+            os.path.join(build_space_base, name), PACKAGE_FINGERPRINT_CACHE)
+        dependencies[name] = dependency_record['fingerprint'] \
+            if dependency_record else None
+    current = {
+        'files': files,
+        'options': options,
+        'dependencies': dependencies,
+        'fingerprint': compute_package_fingerprint(
+            compute_source_fingerprint(files), options, dependencies),
+    }
+    return previous, current
+
+
+# the tools whose identity is part of the key
+TOOLCHAIN_EXECUTABLES = ['cc', 'c++', 'cmake', 'ninja', 'make']
+
+_toolchain_identity = None
+
+
+def _get_executable_identity(path):
+    path = os.path.realpath(path)
+    st = os.stat(path)
+    return [path, st.st_mtime_ns, st.st_size]
+
+
+def get_toolchain_identity(python_interpreter=None):
+    """
+    Identify the tools used to build packages.
+
+    The identity consists of the platform and the resolved path, modification
+    time and size of the compilers, build tools and the Python interpreter.
+    """
+    global _toolchain_identity
+    if _toolchain_identity is None:
+        identity = {
+            'machine': platform.machine(),
+            'platform': sys.platform,
+        }
+        executables = dict(
+            (name, which(name)) for name in TOOLCHAIN_EXECUTABLES)
+        for name in ['CC', 'CXX']:
+            if os.environ.get(name):
+                executables[name] = which(os.environ[name])
+        for name, path in executables.items():
+            identity[name] = _get_executable_identity(path) if path else None
+        _toolchain_identity = identity
+    identity = dict(_toolchain_identity)
+    if python_interpreter:
+        identity['python'] = _get_executable_identity(python_interpreter)
+    return identity
+
+
+def get_artifact_key(opts, context, build_type, package_inputs):
+    """
+    Compute the key of the installed files of a package in the artifact cache.
+
+    :returns: the key or ``None`` if the key of any dependency within the
+        workspace is unknown
+    """
+    dependency_keys = {}
+    build_space_base = os.path.dirname(context.build_space)
+    for path in context.build_dependencies:
+        name = os.path.basename(path)
+        dependency_key = get_cached_config(
+            os.path.join(build_space_base, name), ARTIFACT_KEY_CACHE)
+        if not dependency_key:
+            return None
+        dependency_keys[name] = dependency_key['key']
+    options = dict((name, getattr(opts, name, None)) for name in KEY_OPTIONS)
+    return compute_artifact_key(
+        compute_source_fingerprint(package_inputs['files']), build_type, options,
+        get_toolchain_identity(context.python_interpreter), dependency_keys)
+
+
+def _update_install_stamp(opts, context):
+    installed_files = get_installed_files(context)
+    if installed_files is None:
+        # e.g. the build type doesn't generate an install manifest
+        path = os.path.join(context.build_space, INSTALL_STAMP_CACHE + '.cache')
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    set_cached_config(
+        context.build_space, INSTALL_STAMP_CACHE,
+        get_install_stamp(opts, context, installed_files))
+
+
+def _remove_artifact_links(context):
+    # remove files which share their inode with the artifact cache before
+    # they might be modified in place by a regular install
+    links = get_cached_config(context.build_space, ARTIFACT_LINKS_CACHE) or []
+    for rel_path in links:
+        path = os.path.join(context.install_space, rel_path)
+        if os.path.isfile(path) and not os.path.islink(path) and \
+                os.stat(path).st_nlink > 1:
+            os.remove(path)
+    if links:
+        set_cached_config(context.build_space, ARTIFACT_LINKS_CACHE, [])
+
+
 def run(opts, context):
     # Load up build type plugin class
     build_type = get_build_type(opts.path)
@@ -318,6 +710,75 @@ def run(opts, context):
 
     pkg_name = context.package_manifest.name
 
+    artifact_cache_url = getattr(opts, 'artifact_cache_url', None)
+    # the artifacts of partial builds must not be shared
+    use_artifact_cache = bool(getattr(opts, 'artifact_cache', None) or artifact_cache_url) and \
+        not opts.skip_build and not opts.skip_install and not context.symlink_install and \
+        not getattr(opts, 'cmake_target', None)
+
+    package_inputs = None
+    if not opts.skip_build and not opts.skip_install and (
+        getattr(opts, 'skip_unchanged', False) or getattr(opts, 'explain_rebuild', False) or
+        use_artifact_cache
+    ):
+        previous_inputs, package_inputs = get_package_inputs(opts, context)
+        if previous_inputs and \
+                previous_inputs.get('fingerprint') == package_inputs['fingerprint']:
+            if opts.skip_unchanged:
+                if is_install_current(opts, context):
+                    print("+++ Skipping '{0}' since its inputs have not changed"
+                          .format(pkg_name))
+                    return
+                if opts.explain_rebuild:
+                    print("+++ Rebuilding '{0}': the installed files have changed"
+                          .format(pkg_name))
+        elif opts.explain_rebuild:
+            for reason in explain_changes(previous_inputs, package_inputs):
+                print("+++ Rebuilding '{0}': {1}".format(pkg_name, reason))
+
+    artifact_cache = None
+    artifact_key = None
+    if use_artifact_cache:
+        artifact_key = get_artifact_key(opts, context, build_type, package_inputs)
+    elif not opts.skip_build and not opts.skip_install:
+        # a stale key must not be used by dependent packages
+        artifact_key_path = os.path.join(
+            context.build_space, ARTIFACT_KEY_CACHE + '.cache')
+        if os.path.exists(artifact_key_path):
+            os.remove(artifact_key_path)
+    if package_inputs is None and not opts.skip_install:
+        # the install space won't match a previous record anymore
+        fingerprint_path = os.path.join(
+            context.build_space, PACKAGE_FINGERPRINT_CACHE + '.cache')
+        if os.path.exists(fingerprint_path):
+            os.remove(fingerprint_path)
+    if artifact_key is not None:
+        artifact_cache = ArtifactCache(
+            opts.artifact_cache or os.path.join(opts.build_space, 'artifact_cache'),
+            opts.artifact_cache_size)
+        remote_artifact_cache = get_remote_artifact_cache(artifact_cache_url) \
+            if artifact_cache_url else None
+        hardlinks = artifact_cache.restore(artifact_key, context.install_space)
+        if hardlinks is None and remote_artifact_cache and \
+                remote_artifact_cache.fetch(artifact_key, artifact_cache):
+            print("+++ Fetched '{0}' from the remote artifact cache".format(pkg_name))
+            hardlinks = artifact_cache.restore(artifact_key, context.install_space)
+        if hardlinks is not None:
+            print("+++ Restored '{0}' from the artifact cache".format(pkg_name))
+            set_cached_config(context.build_space, ARTIFACT_LINKS_CACHE, hardlinks)
+            set_cached_config(
+                context.build_space, ARTIFACT_KEY_CACHE, {'key': artifact_key})
+            set_cached_config(
+                context.build_space, PACKAGE_FINGERPRINT_CACHE, package_inputs)
+            _update_install_stamp(opts, context)
+            return
+        context.deployed_files = []
+
+    if not opts.skip_install:
+        _remove_artifact_links(context)
+        # the install step must not write into hardlinked files in place
+        break_deployed_hardlinks(context)
+
     if not opts.skip_build:
         ignore_file = os.path.join(context.build_space, 'AMENT_IGNORE')
         if not os.path.exists(ignore_file) and not context.dry_run:
@@ -328,15 +789,52 @@ def run(opts, context):
         # Run the build command
         print("+++ Building '{0}'".format(pkg_name))
         on_build_ret = build_type_impl.on_build(context)
-        handle_build_action(on_build_ret, context)
+        handle_build_action(on_build_ret, context, phase='build')
         expand_prefix_level_setup_files(context)
 
     if not opts.skip_install:
-        # Run the install command
-        print("+++ Installing '{0}'".format(pkg_name))
-        on_install_ret = build_type_impl.on_install(context)
-        handle_build_action(on_install_ret, context)
+        # skip the install step if the build didn't change any outputs
+        install_stamp = None
+        if not opts.skip_build and artifact_key is None:
+            install_stamp = get_cached_config(context.build_space, INSTALL_STAMP_CACHE)
+        if install_stamp and install_stamp == get_install_stamp(
+            opts, context, install_stamp['installed'].keys()
+        ):
+            print("+++ Skipping install of '{0}' since the build produced no new outputs "
+                  'and the installed files are unchanged'.format(pkg_name))
+        else:
+            # a failing install must not leave a stamp of a previous install
+            install_stamp_path = os.path.join(
+                context.build_space, INSTALL_STAMP_CACHE + '.cache')
+            if os.path.exists(install_stamp_path):
+                os.remove(install_stamp_path)
+            # Run the install command
+            print("+++ Installing '{0}'".format(pkg_name))
+            if context.get('deployed_files') is None:
+                context.deployed_files = []
+            on_install_ret = build_type_impl.on_install(context)
+            handle_build_action(on_install_ret, context, phase='install')
+            if not opts.skip_build:
+                _update_install_stamp(opts, context)
         deploy_prefix_level_setup_files(context)
+        flush_deploy_manifest(context.install_space)
+        if os.name != 'nt':
+            # capture the environment contributed by the package for its dependents
+            get_environment_snapshot(
+                os.path.dirname(context.build_space),
+                os.path.join(context.install_space, 'share', pkg_name))
+
+    if artifact_key is not None:
+        installed_files = get_installed_files(context)
+        if installed_files is not None and \
+                artifact_cache.store(artifact_key, context.install_space, installed_files):
+            print("+++ Stored '{0}' in the artifact cache".format(pkg_name))
+            if remote_artifact_cache:
+                remote_artifact_cache.upload(artifact_key, artifact_cache)
+        set_cached_config(context.build_space, ARTIFACT_KEY_CACHE, {'key': artifact_key})
+
+    if package_inputs is not None:
+        set_cached_config(context.build_space, PACKAGE_FINGERPRINT_CACHE, package_inputs)
 
 
 def update_options(opts):
@@ -371,10 +869,13 @@ def create_context(opts):
     context.exec_dependency_paths_in_workspace = opts.exec_dependency_paths_in_workspace \
         if 'exec_dependency_paths_in_workspace' in opts else []
     context.symlink_install = opts.symlink_install
+    context.install_mode = getattr(opts, 'install_mode', 'copy')
     context.make_flags = opts.make_flags
     context.dry_run = False
     context.build_tests = opts.build_tests
     context.python_interpreter = opts.python_interpreter
+    context.nice_levels = dict(getattr(opts, 'nice', None) or [])
+    context.ionice_classes = dict(getattr(opts, 'ionice', None) or [])
     print('')
     print("Process package '{0}' with context:".format(pkg_name))
     print('-' * 80)
@@ -0,0 +1,59 @@
+# Copyright 2018 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from ament_tools.remote_artifact_cache import ArtifactServer
+from ament_tools.remote_artifact_cache import DEFAULT_PORT
+
+
+def prepare_arguments(parser):
+    parser.add_argument(
+        'path',
+        help='The directory to store the artifacts in',
+    )
+    parser.add_argument(
+        '--host',
+        default='127.0.0.1',
+        help="The address to listen on (default '127.0.0.1'), anyone who can "
+             'connect is able to read and add artifacts',
+    )
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=DEFAULT_PORT,
+        help='The port to listen on (default %d)' % DEFAULT_PORT,
+    )
+    return parser
+
+
+def main(options):
+    server = ArtifactServer((options.host, options.port), options.path)
+    print("Serving artifacts from '%s' on 'http://%s:%d'" %
+          ((server.path, ) + server.server_address[:2]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# meta information of the entry point
+entry_point_data = {
+    'verb': 'cache_server',
+    'description': 'Serve artifacts of a remote artifact cache over HTTP',
+    # Called for execution, given parsed arguments object
+    'main': main,
+    # Called first to setup argparse, given argparse parser
+    'prepare_arguments': prepare_arguments,
+}
@@ -57,7 +57,7 @@ def main(opts):
                 return rc
         return 0
 
-    build_main(opts, test_pkg_main_wrapper)
+    build_main(opts, test_pkg_main_wrapper, verb='test')
 
     if 'rc' in rc_storage:
         return rc_storage['rc']
@@ -80,7 +80,7 @@ def main(opts):
                   build_type, file=sys.stderr)
             return
         try:
-            handle_build_action(on_test_ret, context)
+            handle_build_action(on_test_ret, context, phase='test')
         except SystemExit as e:
             # check if tests should be rerun
             if opts.retest_until_pass > context.test_iteration:
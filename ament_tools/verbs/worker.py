@@ -0,0 +1,64 @@
+# Copyright 2018 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from multiprocessing import cpu_count
+
+from ament_tools.distributed import DEFAULT_PORT
+from ament_tools.distributed import WorkerServer
+
+
+def prepare_arguments(parser):
+    parser.add_argument(
+        '--host',
+        default='127.0.0.1',
+        help="The address to listen on (default '127.0.0.1'), anyone who can "
+             'connect is able to run builds on this host',
+    )
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=DEFAULT_PORT,
+        help='The port to listen on (default %d)' % DEFAULT_PORT,
+    )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=cpu_count(),
+        help='The number of packages to process concurrently '
+             '(default the number of CPU cores)',
+    )
+    return parser
+
+
+def main(options):
+    server = WorkerServer((options.host, options.port), options.jobs)
+    print("Waiting for jobs on '%s:%d' with %d slots" %
+          (server.server_address + (options.jobs, )))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# meta information of the entry point
+entry_point_data = {
+    'verb': 'worker',
+    'description': 'Process packages on behalf of a distributed build',
+    # Called for execution, given parsed arguments object
+    'main': main,
+    # Called first to setup argparse, given argparse parser
+    'prepare_arguments': prepare_arguments,
+}
@@ -0,0 +1,424 @@
+# Copyright 2018 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Install Python packages from wheels built through the PEP 517 hooks.
+
+The wheel is built by the build backend declared in the ``pyproject.toml``
+file of a package (defaulting to the legacy setuptools backend).
+No isolated build environment is being created, the backend and its build
+requirements need to be installed already.
+The hooks run in-process if the package is built for the current Python
+interpreter in the main thread, otherwise in a separate process.
+
+To keep the source space clean the wheel is built from a tree of symlinks in
+the build space.
+The wheel is unpacked into the install space, the scripts of the entry points
+are generated from the ``entry_points.txt`` file and the installed files are
+recorded in an install manifest.
+"""
+
+import base64
+import configparser
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import zipfile
+
+# the backend used for packages without a pyproject.toml file
+DEFAULT_BUILD_BACKEND = 'setuptools.build_meta:__legacy__'
+
+# the directories in the build space
+WHEEL_SOURCE_DIRECTORY = 'wheel_source'
+WHEEL_DIST_DIRECTORY = 'wheel_dist'
+
+# the names in the source space which aren't mirrored into the build tree
+IGNORED_SOURCE_NAMES = ['.git', '__pycache__']
+# the names which are only ignored at the top level of the source space
+IGNORED_TOP_LEVEL_SOURCE_NAMES = ['build', 'dist']
+
+# separates the output of the backend from the result of the hook
+_SEPARATOR = '__AMENT_TOOLS_HOOK_RESULT__'
+
+# the code running a hook, it must work with any Python 3 interpreter
+# and therefore doesn't use anything from ament_tools
+_HOOK_RUNNER = '''
+def run_hook(backend_name, backend_path, hook, args):
+    import importlib
+    import re
+    import sys
+    sys.path[:0] = backend_path
+    module_name, _, object_path = backend_name.partition(':')
+    backend = importlib.import_module(module_name)
+    for name in filter(None, object_path.split('.')):
+        backend = getattr(backend, name)
+    if hook == 'get_missing_requirements_for_build_wheel':
+        if not hasattr(backend, 'get_requires_for_build_wheel'):
+            return []
+        from importlib.metadata import distribution, PackageNotFoundError
+        missing = []
+        for requirement in backend.get_requires_for_build_wheel(*args):
+            name = re.match(r'[A-Za-z0-9._-]*', requirement).group(0)
+            try:
+                distribution(name)
+            except PackageNotFoundError:
+                missing.append(requirement)
+        return missing
+    return getattr(backend, hook)(*args)
+'''
+
+_hook_lock = threading.Lock()
+
+
+def get_build_backend(source_space):
+    """
+    Get the build backend of a package.
+
+    :returns: a tuple of the backend name and the list of absolute paths to
+        load it from
+    :raises RuntimeError: if the ``pyproject.toml`` file can't be parsed
+    """
+    path = os.path.join(source_space, 'pyproject.toml')
+    if not os.path.isfile(path):
+        return DEFAULT_BUILD_BACKEND, []
+    try:
+        import tomllib
+    except ImportError:
+        try:
+            import tomli as tomllib
+        except ImportError:
+            raise RuntimeError(
+                "Parsing '%s' requires Python 3.11 or the 'tomli' package" % path)
+    with open(path, 'rb') as h:
+        data = tomllib.load(h)
+    build_system = data.get('build-system', {})
+    return (
+        build_system.get('build-backend', DEFAULT_BUILD_BACKEND),
+        [os.path.join(source_space, p) for p in build_system.get('backend-path', [])])
+
+
+def _is_ignored_source_name(name, top_level):
+    if name in IGNORED_SOURCE_NAMES:
+        return True
+    return top_level and (
+        name in IGNORED_TOP_LEVEL_SOURCE_NAMES or name.endswith('.egg-info'))
+
+
+def _symlink(src, dst):
+    if os.path.islink(dst) and os.readlink(dst) == src:
+        return
+    if os.path.isdir(dst) and not os.path.islink(dst):
+        shutil.rmtree(dst)
+    elif os.path.lexists(dst):
+        os.remove(dst)
+    os.symlink(src, dst)
+
+
+def sync_source_tree(source_space, path):
+    """Mirror the source space with symlinks and remove stale entries."""
+    for dirpath, dirnames, filenames in os.walk(source_space):
+        top_level = dirpath == source_space
+        dirnames[:] = [
+            d for d in dirnames
+            if not _is_ignored_source_name(d, top_level) and
+            os.path.join(dirpath, d) != path]
+        rel_path = os.path.relpath(dirpath, source_space)
+        dst_dir = os.path.normpath(os.path.join(path, rel_path))
+        if os.path.islink(dst_dir):
+            # the directory in the source space isn't a symlink anymore
+            os.remove(dst_dir)
+        os.makedirs(dst_dir, exist_ok=True)
+        for filename in filenames:
+            _symlink(os.path.join(dirpath, filename), os.path.join(dst_dir, filename))
+        # os.walk doesn't descend into symlinked directories, mirror them as a whole
+        for dirname in list(dirnames):
+            src = os.path.join(dirpath, dirname)
+            if os.path.islink(src):
+                dirnames.remove(dirname)
+                _symlink(src, os.path.join(dst_dir, dirname))
+
+    # remove the symlinks of deleted files and directories
+    for dirpath, dirnames, filenames in os.walk(path):
+        for filename in filenames:
+            dst = os.path.join(dirpath, filename)
+            if os.path.islink(dst) and not os.path.exists(dst):
+                os.remove(dst)
+
+
+def _call_hook_in_process(backend, hook, args, cwd, python_path):
+    namespace = {}
+    exec(_HOOK_RUNNER, namespace)
+    # the hooks expect the project as the working directory
+    # and might modify global state which is restored afterwards
+    with _hook_lock:
+        old_cwd = os.getcwd()
+        old_path = list(sys.path)
+        old_argv = list(sys.argv)
+        old_modules = set(sys.modules.keys())
+        try:
+            os.chdir(cwd)
+            sys.path[:0] = [cwd] + python_path
+            return namespace['run_hook'](backend[0], backend[1], hook, args)
+        finally:
+            os.chdir(old_cwd)
+            sys.path[:] = old_path
+            sys.argv[:] = old_argv
+            # the modules of the package itself must not be reused
+            for name in set(sys.modules.keys()) - old_modules:
+                filename = getattr(sys.modules[name], '__file__', None) or ''
+                if os.path.abspath(filename).startswith(cwd + os.sep):
+                    del sys.modules[name]
+            # distutils caches the created directories which are removed
+            # before the next build
+            for name in ['distutils.dir_util', 'setuptools._distutils.dir_util']:
+                if hasattr(sys.modules.get(name), '_path_created'):
+                    sys.modules[name]._path_created.clear()
+
+
+def _call_hook_in_subprocess(python_interpreter, backend, hook, args, cwd, env):
+    code = _HOOK_RUNNER + '\n'.join([
+        'import json, sys',
+        'result = run_hook(*json.loads(sys.argv[1]))',
+        "sys.stdout.write('%s' + json.dumps(result))" % _SEPARATOR,
+    ])
+    output = subprocess.check_output(
+        [python_interpreter, '-c', code, json.dumps([backend[0], backend[1], hook, args])],
+        cwd=cwd, env=env)
+    output = output.decode()
+    backend_output, _, result = output.rpartition(_SEPARATOR)
+    if backend_output:
+        print(backend_output, end='' if backend_output.endswith('\n') else '\n')
+    return json.loads(result)
+
+
+def build_wheel(source_space, build_space, python_interpreter, env=None):
+    """
+    Build the wheel of a package through the PEP 517 hooks of its backend.
+
+    :param str source_space: the directory containing the ``setup.py`` or
+        ``pyproject.toml`` file
+    :param str build_space: the build space of the package
+    :param str python_interpreter: the Python interpreter to build the wheel
+        for
+    :param dict env: the environment for the hooks, defaults to ``os.environ``
+    :returns: the path of the wheel
+    :raises RuntimeError: if the build requirements aren't installed or the
+        backend fails
+    """
+    backend = get_build_backend(source_space)
+    source_path = os.path.join(build_space, WHEEL_SOURCE_DIRECTORY)
+    sync_source_tree(source_space, source_path)
+    # the build directory of setuptools would still contain deleted modules
+    if os.path.isdir(os.path.join(source_path, 'build')):
+        shutil.rmtree(os.path.join(source_path, 'build'))
+    dist_path = os.path.join(build_space, WHEEL_DIST_DIRECTORY)
+    if os.path.isdir(dist_path):
+        shutil.rmtree(dist_path)
+    os.makedirs(dist_path)
+
+    if env is None:
+        env = os.environ
+    if os.path.realpath(python_interpreter) == os.path.realpath(sys.executable) and \
+            threading.current_thread() is threading.main_thread():
+        python_path = [p for p in env.get('PYTHONPATH', '').split(os.pathsep) if p]
+
+        def call_hook(hook, args):
+            return _call_hook_in_process(backend, hook, args, source_path, python_path)
+    else:
+        def call_hook(hook, args):
+            return _call_hook_in_subprocess(
+                python_interpreter, backend, hook, args, source_path, env)
+
+    try:
+        missing = call_hook('get_missing_requirements_for_build_wheel', [{}])
+        if missing:
+            raise RuntimeError(
+                "The build requirements of the backend '%s' are not installed: %s" %
+                (backend[0], ', '.join(missing)))
+        wheel_name = call_hook('build_wheel', [dist_path, {}, None])
+    except (subprocess.CalledProcessError, ImportError, SystemExit) as e:
+        raise RuntimeError(
+            "Failed to build a wheel with the backend '%s': %s" % (backend[0], e))
+    return os.path.join(dist_path, wheel_name)
+
+
+def _write_file_if_changed(path, content, mode):
+    # keep the modification time of unchanged files
+    try:
+        with open(path, 'rb') as h:
+            if h.read() == content:
+                if os.stat(path).st_mode & 0o777 != mode:
+                    os.chmod(path, mode)
+                return
+    except OSError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = '%s.%d.%d.tmp' % (path, os.getpid(), threading.get_ident())
+    with open(tmp_path, 'wb') as h:
+        h.write(content)
+    os.chmod(tmp_path, mode)
+    os.replace(tmp_path, path)
+
+
+def _get_record_hash(content):
+    digest = hashlib.sha256(content).digest()
+    return 'sha256=' + base64.urlsafe_b64encode(digest).decode().rstrip('=')
+
+
+def get_entry_point_scripts(entry_points, python_interpreter):
+    """
+    Generate the scripts of the console and gui entry points.
+
+    :param str entry_points: the content of the ``entry_points.txt`` file
+    :param str python_interpreter: the interpreter used in the shebang line
+    :returns: a dictionary mapping the script names to their content
+    """
+    parser = configparser.ConfigParser(delimiters=('=',), interpolation=None)
+    parser.optionxform = str
+    parser.read_string(entry_points)
+    scripts = {}
+    for section in ['console_scripts', 'gui_scripts']:
+        if not parser.has_section(section):
+            continue
+        for name, value in parser.items(section):
+            match = re.match(r'^\s*([\w.]+)\s*:\s*([\w.]+)', value)
+            if not match:
+                continue
+            module_name, attributes = match.groups()
+            scripts[name] = '\n'.join([
+                '#!' + python_interpreter,
+                '# generated by ament_tools from the entry point: %s = %s' % (name, value),
+                'import re',
+                'import sys',
+                '',
+                'from %s import %s' % (module_name, attributes.split('.')[0]),
+                '',
+                "if __name__ == '__main__':",
+                "    sys.argv[0] = re.sub(r'(-script\\.pyw|\\.exe)?$', '', sys.argv[0])",
+                '    sys.exit(%s())' % attributes,
+                '',
+            ])
+    return scripts
+
+
+def install_wheel(wheel_path, install_space, python_lib, python_interpreter, manifest_path):
+    """
+    Install a wheel into the install space.
+
+    Unchanged files are not being rewritten and files of a previous
+    installation which are not part of the wheel anymore are removed.
+
+    :param str wheel_path: the path of the wheel
+    :param str install_space: the install prefix
+    :param str python_lib: the Python library directory relative to the
+        install prefix
+    :param str python_interpreter: the interpreter used in the shebang lines
+        of the scripts
+    :param str manifest_path: the install manifest listing the absolute paths
+        of the installed files, the previous manifest is read from there too
+    :returns: the list of installed files
+    """
+    lib_path = os.path.join(install_space, python_lib)
+    files = {}
+    with zipfile.ZipFile(wheel_path) as wheel:
+        names = [n for n in wheel.namelist() if not n.endswith('/')]
+        dist_info = [
+            n.split('/')[0] for n in names
+            if n.count('/') == 1 and n.endswith('.dist-info/WHEEL')][0]
+        data_dir = dist_info[:-len('.dist-info')] + '.data'
+        dist_name = dist_info.split('-')[0]
+        for name in names:
+            if name in ['%s/RECORD' % dist_info, '%s/RECORD.jws' % dist_info]:
+                continue
+            content = wheel.read(name)
+            mode = (wheel.getinfo(name).external_attr >> 16) & 0o777 or 0o644
+            if name.startswith(data_dir + '/'):
+                scheme, _, rel_path = name[len(data_dir) + 1:].partition('/')
+                if scheme in ['purelib', 'platlib']:
+                    path = os.path.join(lib_path, rel_path)
+                elif scheme == 'scripts':
+                    path = os.path.join(install_space, 'bin', rel_path)
+                    if content.startswith(b'#!python'):
+                        content = b'#!' + python_interpreter.encode() + content[len('#!python'):]
+                    mode = 0o755
+                elif scheme == 'headers':
+                    path = os.path.join(install_space, 'include', dist_name, rel_path)
+                else:
+                    path = os.path.join(install_space, rel_path)
+            else:
+                path = os.path.join(lib_path, name)
+            files[path] = (content, mode)
+
+        entry_points = '%s/entry_points.txt' % dist_info
+        if entry_points in names:
+            scripts = get_entry_point_scripts(
+                wheel.read(entry_points).decode(), python_interpreter)
+            for name, content in scripts.items():
+                files[os.path.join(install_space, 'bin', name)] = (content.encode(), 0o755)
+
+    files[os.path.join(lib_path, dist_info, 'INSTALLER')] = (b'ament_tools\n', 0o644)
+    record_path = os.path.join(lib_path, dist_info, 'RECORD')
+    record = [
+        '%s,%s,%d' % (os.path.relpath(path, lib_path), _get_record_hash(content), len(content))
+        for path, (content, _) in sorted(files.items())]
+    record.append('%s,,' % os.path.relpath(record_path, lib_path))
+    files[record_path] = (('\n'.join(record) + '\n').encode(), 0o644)
+
+    for path, (content, mode) in files.items():
+        _write_file_if_changed(path, content, mode)
+
+    # remove the files of the previous installation
+    compiled_files = []
+    if os.path.isfile(manifest_path):
+        with open(manifest_path, 'r') as h:
+            previous_files = [line.rstrip('\n') for line in h.readlines()]
+        for path in previous_files:
+            if path in files or not path.startswith(install_space + os.sep) or \
+                    not os.path.isfile(path):
+                continue
+            # keep the compiled files of sources which are still installed
+            if _get_source_of_compiled_file(path) in files:
+                compiled_files.append(path)
+                continue
+            os.remove(path)
+            _remove_empty_directories(install_space, os.path.dirname(path))
+
+    installed_files = sorted(list(files.keys()) + compiled_files)
+    tmp_path = '%s.%d.tmp' % (manifest_path, os.getpid())
+    with open(tmp_path, 'w') as h:
+        h.write(''.join('%s\n' % path for path in installed_files))
+    os.replace(tmp_path, manifest_path)
+    return installed_files
+
+
+def _get_source_of_compiled_file(path):
+    # the compiled files are named <module>.<cache tag>[.opt-<level>].pyc
+    directory, filename = os.path.split(path)
+    if os.path.basename(directory) != '__pycache__' or not filename.endswith('.pyc'):
+        return None
+    return os.path.join(os.path.dirname(directory), filename.split('.')[0] + '.py')
+
+
+def _remove_empty_directories(install_space, path):
+    while path.startswith(install_space + os.sep):
+        try:
+            os.rmdir(path)
+        except OSError:
+            return
+        path = os.path.dirname(path)
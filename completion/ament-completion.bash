@@ -22,13 +22,13 @@ _ament()
   prev=${COMP_WORDS[COMP_CWORD-1]}
 
   if [[ ${COMP_CWORD} -eq 1  ]] ; then
-    COMPREPLY=($(compgen -W "build build_pkg list_dependencies list_packages package_name package_version test test_pkg test_results uninstall uninstall_pkg" -- ${cur}))
+    COMPREPLY=($(compgen -W "build build_pkg cache_server list_dependencies list_packages package_name package_version test test_pkg test_results uninstall uninstall_pkg worker" -- ${cur}))
   elif [[ "$cur" == "-DCMAKE_BUILD_TYPE="* ]]; then
     # autocomplete CMake argument CMAKE_BUILD_TYPE with its options
     COMPREPLY=( $( compgen -P "-DCMAKE_BUILD_TYPE=" -W "Debug MinSizeRel None Release RelWithDebInfo" -- "${cur:19}" ) )
   else
     if [[ "${COMP_WORDS[@]}" == *" build_pkg "* || "${COMP_WORDS[@]}" == *" test_pkg "* ]] ; then
-      COMPREPLY=($(compgen -W "--ament-cmake-args --build-space --build-tests --cmake-args --ctest-args --force-ament-cmake-configure --force-cmake-configure --install-space --make-flags --skip-build --skip-install --symlink-install" -- ${cur}))
+      COMPREPLY=($(compgen -W "--ament-cmake-args --artifact-cache --artifact-cache-size --artifact-cache-url --build-space --build-tests --cmake-args --cmake-seed-cache --cmake-target --compiler-cache --ctest-args --force-ament-cmake-configure --force-cmake-configure --install-mode --install-space --make-flags --parallel-byte-compile --python-install-engine --python-workers --skip-build --skip-install --symlink-install" -- ${cur}))
     elif [[ "${COMP_WORDS[@]}" == *" build "* || "${COMP_WORDS[@]}" == *" test "* ]] ; then
       if [[ "--start-with" == *${prev}* && ${cur} != -* ]] ; then
         COMPREPLY=($(compgen -W "$(ament list_packages --names-only)" -- ${cur}))
@@ -39,7 +39,7 @@ _ament()
       elif [[ "--cmake-args" == *${prev}* && ${cur} != -* ]] ; then
         COMPREPLY=($(compgen -W "-DCMAKE_BUILD_TYPE=" -- ${cur}))
       else
-        COMPREPLY=($(compgen -W "--ament-cmake-args --build-space --build-tests -C --cmake-args --end-with --force-ament-cmake-configure --force-cmake-configure --make-flags --install-space --isolated --only-packages --parallel --skip-build --skip-install --start-with --symlink-install" -- ${cur}))
+        COMPREPLY=($(compgen -W "--ament-cmake-args --artifact-cache --artifact-cache-size --artifact-cache-url --build-space --build-tests -C --cmake-args --cmake-seed-cache --cmake-target --compiler-cache --end-with --force-ament-cmake-configure --force-cmake-configure --make-flags --install-mode --install-space --isolated --only-packages --parallel --parallel-byte-compile --python-install-engine --python-workers --resume --skip-build --skip-install --start-with --super-build --symlink-install --workers" -- ${cur}))
       fi
     elif [[ "${COMP_WORDS[@]}" == *" list_dependencies "* ]] ; then
       if [[ "--basepath" == *${prev} && ${cur} != -* ]] ; then
@@ -66,6 +66,10 @@ _ament()
       COMPREPLY=($(compgen -W "$(ament list_packages --paths-only)" -- ${cur}))
     elif [[ "${COMP_WORDS[@]}" == *" test_results "* ]] ; then
       COMPREPLY=($(compgen -W "--verbose" -d -o nospace -- ${cur}))
+    elif [[ "${COMP_WORDS[@]}" == *" cache_server "* ]] ; then
+      COMPREPLY=($(compgen -W "--host --port" -d -o nospace -- ${cur}))
+    elif [[ "${COMP_WORDS[@]}" == *" worker "* ]] ; then
+      COMPREPLY=($(compgen -W "--host --jobs --port" -- ${cur}))
     fi
   fi
 
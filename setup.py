@@ -47,6 +47,7 @@ and provides tooling to build these federated packages together.""",
         'ament.verbs': [
             'build = ament_tools.verbs.build:entry_point_data',
             'build_pkg = ament_tools.verbs.build_pkg:entry_point_data',
+            'cache_server = ament_tools.verbs.cache_server:entry_point_data',
             'list_dependencies = ament_tools.verbs.list_dependencies:entry_point_data',
             'list_packages = ament_tools.verbs.list_packages:entry_point_data',
             'package_name = ament_tools.verbs.package_name:entry_point_data',
@@ -56,6 +57,7 @@ and provides tooling to build these federated packages together.""",
             'test_results = ament_tools.verbs.test_results:entry_point_data',
             'uninstall = ament_tools.verbs.uninstall:entry_point_data',
             'uninstall_pkg = ament_tools.verbs.uninstall_pkg:entry_point_data',
+            'worker = ament_tools.verbs.worker:entry_point_data',
         ],
         'ament.build_types': [
             'ament_cmake = ament_tools.build_types.ament_cmake:AmentCmakeBuildType',
@@ -0,0 +1,89 @@
+# Copyright 2018 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import json
+import os
+import tempfile
+
+import pytest
+
+from ament_tools.artifact_cache import ArtifactCache
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as h:
+        h.write(content)
+
+
+def test_store_and_restore():
+    with tempfile.TemporaryDirectory() as basepath:
+        install_space = os.path.join(basepath, 'install')
+        _write(os.path.join(install_space, 'lib', 'libfoo.so.1'), 'foo')
+        os.symlink('libfoo.so.1', os.path.join(install_space, 'lib', 'libfoo.so'))
+        files = [os.path.join('lib', 'libfoo.so'), os.path.join('lib', 'libfoo.so.1')]
+
+        cache = ArtifactCache(os.path.join(basepath, 'cache'))
+        assert cache.restore('a' * 64, install_space) is None
+        assert cache.store('a' * 64, install_space, files)
+        assert not cache.store('a' * 64, install_space, files)
+
+        other_install_space = os.path.join(basepath, 'other')
+        assert cache.restore('a' * 64, other_install_space) is not None
+        with open(os.path.join(other_install_space, 'lib', 'libfoo.so.1'), 'r') as h:
+            assert h.read() == 'foo'
+        assert os.readlink(os.path.join(other_install_space, 'lib', 'libfoo.so')) == \
+            'libfoo.so.1'
+
+
+def test_evict():
+    with tempfile.TemporaryDirectory() as basepath:
+        install_space = os.path.join(basepath, 'install')
+        _write(os.path.join(install_space, 'data'), 'x' * 1024)
+
+        cache = ArtifactCache(os.path.join(basepath, 'cache'), max_size=0)
+        cache.store('a' * 64, install_space, ['data'])
+        assert cache.has('a' * 64)
+        # storing another entry evicts the least recently used one
+        cache.store('b' * 64, install_space, ['data'])
+        assert not cache.has('a' * 64)
+        assert cache.has('b' * 64)
+
+
+def test_reject_paths_outside_of_install_space():
+    with tempfile.TemporaryDirectory() as basepath:
+        install_space = os.path.join(basepath, 'install')
+        _write(os.path.join(install_space, 'data'), 'data')
+        cache = ArtifactCache(os.path.join(basepath, 'cache'))
+        cache.store('a' * 64, install_space, ['data'])
+
+        # tamper with the manifest of the entry
+        entry_path = cache._get_entry_path('a' * 64)
+        with open(os.path.join(entry_path, 'manifest.json'), 'r') as h:
+            manifest = json.loads(h.read())
+        manifest['files'] = [os.path.join('..', 'outside')]
+        with open(os.path.join(entry_path, 'manifest.json'), 'w') as h:
+            h.write(json.dumps(manifest))
+
+        fileobj = io.BytesIO()
+        assert cache.export_entry('a' * 64, fileobj)
+        fileobj.seek(0)
+        other_cache = ArtifactCache(os.path.join(basepath, 'other_cache'))
+        with pytest.raises(ValueError):
+            other_cache.import_entry('a' * 64, fileobj)
+        assert not other_cache.has('a' * 64)
+
+        assert cache.restore('a' * 64, os.path.join(basepath, 'other')) is None
+        assert not os.path.exists(os.path.join(basepath, 'outside'))
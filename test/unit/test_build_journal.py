@@ -0,0 +1,85 @@
+# Copyright 2018 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import os
+import tempfile
+
+from ament_tools import build_journal
+
+
+def test_compute_options_fingerprint():
+    compute = build_journal.compute_options_fingerprint
+    opts = argparse.Namespace(cmake_args=['-DFOO=1'], symlink_install=False)
+    fingerprint = compute(opts)
+    # selection options and non plain values are ignored
+    opts.start_with = 'pkg'
+    opts.main = compute
+    assert compute(opts) == fingerprint
+    opts.cmake_args = ['-DFOO=2']
+    assert compute(opts) != fingerprint
+    # the callback is part of the fingerprint
+    assert compute(opts, compute) != compute(opts)
+
+
+def test_build_journal():
+    with tempfile.TemporaryDirectory() as build_space:
+        journal = build_journal.BuildJournal(build_space)
+        assert journal.get_state('foo') == build_journal.STATE_NOT_STARTED
+        journal.set_states({
+            'foo': (build_journal.STATE_NOT_STARTED, 'a'),
+            'bar': (build_journal.STATE_NOT_STARTED, 'b'),
+        })
+
+        def succeed(opts):
+            return 0
+
+        def fail(opts):
+            return 1
+
+        build_journal.create_journaled_callback(journal, 'foo', 'a', succeed)(None)
+        build_journal.create_journaled_callback(journal, 'bar', 'b', fail)(None)
+
+        # the journal is persisted
+        journal = build_journal.BuildJournal(build_space)
+        assert journal.get_state('foo') == build_journal.STATE_SUCCEEDED
+        assert journal.get_state('bar') == build_journal.STATE_FAILED
+        assert journal.is_up_to_date('foo', 'a')
+        assert not journal.is_up_to_date('foo', 'changed')
+        assert not journal.is_up_to_date('bar', 'b')
+
+        # each verb has a separate journal
+        journal = build_journal.BuildJournal(build_space, verb='test')
+        assert journal.get_state('foo') == build_journal.STATE_NOT_STARTED
+
+
+def test_compute_journal_fingerprint():
+    compute = build_journal.compute_journal_fingerprint
+    with tempfile.TemporaryDirectory() as basepath:
+        opts = argparse.Namespace(
+            path=basepath, build_space=os.path.join(basepath, 'build'),
+            install_space=os.path.join(basepath, 'install'), cmake_args=[])
+        with open(os.path.join(basepath, 'package.xml'), 'w') as h:
+            h.write('')
+        fingerprint = compute(opts)
+        assert compute(opts) == fingerprint
+        assert compute(opts, dependency_fingerprints={'dep': 'a'}) != fingerprint
+        # files in the build space don't affect the fingerprint
+        os.makedirs(opts.build_space)
+        with open(os.path.join(opts.build_space, 'output'), 'w') as h:
+            h.write('')
+        assert compute(opts) == fingerprint
+        with open(os.path.join(basepath, 'source.cpp'), 'w') as h:
+            h.write('')
+        assert compute(opts) != fingerprint
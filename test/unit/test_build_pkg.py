@@ -0,0 +1,68 @@
+# Copyright 2018 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import os
+import shutil
+import tempfile
+
+from ament_tools.context import Context
+from ament_tools.verbs.build_pkg import cli
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as h:
+        h.write(content)
+
+
+def test_is_install_current():
+    with tempfile.TemporaryDirectory() as basepath:
+        opts = argparse.Namespace(
+            build_space=os.path.join(basepath, 'build'),
+            install_space=os.path.join(basepath, 'install'),
+            install_mode='copy')
+        context = Context()
+        context.source_space = os.path.join(basepath, 'src', 'foo')
+        context.build_space = os.path.join(opts.build_space, 'foo')
+        context.install_space = opts.install_space
+        context.package_manifest = argparse.Namespace(name='foo')
+        context.deployed_files = []
+        _write(os.path.join(context.source_space, 'CMakeLists.txt'), '')
+        installed = [
+            os.path.join(context.install_space, 'lib', 'libfoo.so'),
+            os.path.join(
+                context.install_space, 'share', 'ament_index', 'resource_index', 'packages',
+                'foo'),
+        ]
+        for path in installed:
+            _write(path, '')
+        _write(
+            os.path.join(context.build_space, 'install_manifest.txt'),
+            ''.join('%s\n' % p for p in installed))
+
+        # without a recorded stamp only the package marker is checked
+        assert cli.is_install_current(opts, context)
+
+        cli._update_install_stamp(opts, context)
+        assert cli.is_install_current(opts, context)
+
+        # a different install mode requires installing again
+        opts.install_mode = 'link'
+        assert not cli.is_install_current(opts, context)
+        opts.install_mode = 'copy'
+
+        # a removed install space requires a rebuild
+        shutil.rmtree(context.install_space)
+        assert not cli.is_install_current(opts, context)
@@ -0,0 +1,60 @@
+# Copyright 2018 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import importlib.util
+import os
+import tempfile
+
+from ament_tools.byte_compile import byte_compile
+
+
+def test_byte_compile():
+    with tempfile.TemporaryDirectory() as basepath:
+        paths = []
+        for name in ['a', 'b', 'c']:
+            path = os.path.join(basepath, name + '.py')
+            with open(path, 'w') as h:
+                h.write('VALUE = %r\n' % name)
+            paths.append(path)
+        manifest = os.path.join(basepath, 'install.log')
+        with open(manifest, 'w') as h:
+            h.write(''.join('%s\n' % p for p in paths))
+
+        assert byte_compile(paths, manifest_path=manifest) == 3
+        compiled = [importlib.util.cache_from_source(p) for p in paths]
+        assert all(os.path.exists(c) for c in compiled)
+        with open(manifest, 'r') as h:
+            assert h.read().splitlines() == paths + compiled
+
+        # only outdated files are compiled again
+        with open(paths[1], 'w') as h:
+            h.write('VALUE = "changed"\n')
+        assert byte_compile(paths, manifest_path=manifest) == 1
+        with open(manifest, 'r') as h:
+            assert h.read().splitlines() == paths + compiled
+
+
+def test_byte_compile_symlinks():
+    with tempfile.TemporaryDirectory() as basepath:
+        source = os.path.join(basepath, 'src', 'source.py')
+        os.makedirs(os.path.dirname(source))
+        with open(source, 'w') as h:
+            h.write('VALUE = 1\n')
+        link = os.path.join(basepath, 'link.py')
+        os.symlink(source, link)
+
+        # symlinked files are compiled to where the interpreter looks on import
+        assert byte_compile([link]) == 1
+        assert os.path.exists(importlib.util.cache_from_source(link))
+        assert byte_compile([link]) == 0
@@ -0,0 +1,88 @@
+# Copyright 2018 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+
+from ament_tools.build_types.cmake import CmakeBuildType
+from ament_tools.context import Context
+
+from .test_cmake_file_api import TARGETS
+from .test_cmake_file_api import write_file_api_reply
+
+
+class _PackageManifest:
+
+    def __init__(self, name):
+        self.name = name
+
+
+def _get_context(build_space, package_name, cmake_target):
+    context = Context()
+    context.build_space = build_space
+    context.package_manifest = _PackageManifest(package_name)
+    context.cmake_target = cmake_target
+    return context
+
+
+def test_get_cmake_targets():
+    build_type = CmakeBuildType()
+    with tempfile.TemporaryDirectory() as basepath:
+        build_space_a = os.path.join(basepath, 'pkg_a')
+        write_file_api_reply(build_space_a)
+        # only the first package defines the workspace-wide target gen
+        build_space_b = os.path.join(basepath, 'pkg_b')
+        write_file_api_reply(
+            build_space_b, targets={k: v for k, v in TARGETS.items() if k != 'gen'})
+        # the targets of the last package are unknown
+        build_space_c = os.path.join(basepath, 'pkg_c')
+        os.makedirs(build_space_c)
+
+        cmake_target = ['pkg_a:foo', 'pkg_c:foo', 'gen', 'missing']
+        assert build_type._get_cmake_targets(
+            _get_context(build_space_a, 'pkg_a', cmake_target)) == ['foo', 'gen']
+        assert build_type._get_cmake_targets(
+            _get_context(build_space_b, 'pkg_b', cmake_target)) == []
+        # targets with a package name are used even if the targets are unknown
+        assert build_type._get_cmake_targets(
+            _get_context(build_space_c, 'pkg_c', cmake_target)) == ['foo']
+        assert build_type._get_cmake_targets(
+            _get_context(build_space_c, 'pkg_c', ['gen'])) == []
+        # package names may contain colons, target names may not
+        assert build_type._get_cmake_targets(
+            _get_context(build_space_a, 'pkg:a', ['pkg:a:bar'])) == ['bar']
+        assert build_type._get_cmake_targets(
+            _get_context(build_space_a, 'pkg_a', [])) == []
+
+
+def test_partial_build():
+    build_type = CmakeBuildType()
+    with tempfile.TemporaryDirectory() as build_space:
+        write_file_api_reply(build_space)
+        context = _get_context(build_space, 'pkg', ['pkg:foo'])
+        assert build_type._get_build_targets(context) == ['foo', 'foo_tool']
+        actions = list(build_type._partial_install(context, ['foo'], [], env={}))
+        assert [a.cmd[1] for a in actions] == ['-DCOMPONENT=Headers', '-DCOMPONENT=Runtime']
+        assert all(a.cmd[2:] == ['-P', 'cmake_install.cmake'] for a in actions)
+
+        context = _get_context(build_space, 'pkg', ['gen'])
+        assert build_type._get_build_targets(context) == ['gen']
+        actions = list(build_type._partial_install(context, ['gen'], [], env={}))
+        assert [a.cmd[1] for a in actions] == ['-DCOMPONENT=Headers']
+
+    with tempfile.TemporaryDirectory() as build_space:
+        # without the install components nothing is installed
+        context = _get_context(build_space, 'pkg', ['pkg:foo'])
+        assert build_type._get_build_targets(context) == ['foo']
+        assert list(build_type._partial_install(context, ['foo'], [], env={})) == []
@@ -0,0 +1,204 @@
+# Copyright 2018 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import tempfile
+
+from ament_tools.build_types import cmake_file_api
+from ament_tools.build_types.cmake_file_api import FILE_API_CACHE
+from ament_tools.build_types.cmake_file_api import FILE_API_CLIENT
+from ament_tools.build_types.cmake_file_api import get_file_api_data
+from ament_tools.build_types.cmake_file_api import get_partial_build
+from ament_tools.build_types.cmake_file_api import has_build_target
+from ament_tools.build_types.common import get_cached_config
+
+# the targets of the canned code model: name -> (type, dependencies, component)
+TARGETS = {
+    'foo': ('SHARED_LIBRARY', [], 'Runtime'),
+    'foo_tool': ('EXECUTABLE', ['foo'], 'Runtime'),
+    'bar': ('STATIC_LIBRARY', [], 'Development'),
+    'gen': ('UTILITY', [], None),
+}
+
+
+def _write_json(build_space, name, data):
+    path = os.path.join(build_space, '.cmake', 'api', 'v1', 'reply', name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as h:
+        h.write(json.dumps(data))
+
+
+def write_file_api_reply(
+    build_space, targets=TARGETS, index_name='index-2018-01-01T00-00-00-0000.json',
+    configurations=('Release', ), generator='Ninja', multi_config=False
+):
+    """
+    Write a reply of the file API as CMake would after a configure.
+
+    Each target with a component is installed as part of that component and
+    the ``Headers`` component doesn't install any target.
+    """
+    target_ids = {name: name + '::@6890427a1f51a3e7e1df' for name in targets.keys()}
+    installers = [{'component': 'Headers', 'type': 'file'}]
+    for name, (target_type, dependencies, component) in sorted(targets.items()):
+        data = {
+            'name': name,
+            'id': target_ids[name],
+            'type': target_type,
+            'dependencies': [{'id': target_ids[d]} for d in dependencies],
+        }
+        if target_type != 'UTILITY':
+            data['artifacts'] = [{'path': 'lib' + name + '.so'}]
+        if component:
+            data['install'] = {'destinations': [{'path': 'lib'}]}
+            installers.append({
+                'component': component, 'type': 'target', 'targetId': target_ids[name]})
+        _write_json(build_space, 'target-%s.json' % name, data)
+    _write_json(build_space, 'directory-.json', {'installers': installers})
+    _write_json(build_space, 'codemodel-v2.json', {
+        'configurations': [{
+            'name': configuration,
+            'directories': [{'source': '.', 'jsonFile': 'directory-.json'}],
+            'targets': [{
+                'name': name,
+                'id': target_ids[name],
+                'jsonFile': 'target-%s.json' % name,
+            } for name in sorted(targets.keys())],
+        } for configuration in configurations],
+    })
+    _write_json(build_space, 'cache-v2.json', {'entries': [
+        {'name': 'CMAKE_BUILD_TYPE', 'type': 'STRING', 'value': configurations[0]},
+        {'name': 'CMAKE_INSTALL_PREFIX', 'type': 'PATH', 'value': '/opt/install'},
+    ]})
+    _write_json(build_space, index_name, {
+        'cmake': {'generator': {'name': generator, 'multiConfig': multi_config}},
+        'reply': {FILE_API_CLIENT: {'query.json': {'responses': [
+            {'kind': 'codemodel', 'version': {'major': 2}, 'jsonFile': 'codemodel-v2.json'},
+            {'kind': 'cache', 'version': {'major': 2}, 'jsonFile': 'cache-v2.json'},
+        ]}}},
+    })
+
+
+def test_get_file_api_data():
+    with tempfile.TemporaryDirectory() as build_space:
+        assert get_file_api_data(build_space) is None
+
+        write_file_api_reply(build_space)
+        data = get_file_api_data(build_space)
+        assert data['cache']['CMAKE_BUILD_TYPE'] == 'Release'
+        assert data['configurations'] == ['Release']
+        assert data['generator'] == 'Ninja'
+        assert data['has_install_rule'] is True
+        assert not data['multi_config']
+        assert data['targets']['foo_tool'] == {
+            'artifacts': ['libfoo_tool.so'],
+            'dependencies': ['foo'],
+            'install': ['lib'],
+            'type': 'EXECUTABLE',
+        }
+        assert {'component': 'Headers', 'target': None} in data['installers']
+        assert {'component': 'Runtime', 'target': 'foo'} in data['installers']
+        # the condensed data is cached on disk
+        assert get_cached_config(build_space, FILE_API_CACHE) == data
+
+
+def test_get_file_api_data_multi_config():
+    with tempfile.TemporaryDirectory() as build_space:
+        write_file_api_reply(
+            build_space, configurations=('Debug', 'Release', 'RelWithDebInfo'),
+            generator='Ninja Multi-Config', multi_config=True)
+        data = get_file_api_data(build_space)
+        assert data['multi_config']
+        assert data['generator'] == 'Ninja Multi-Config'
+        assert data['configurations'] == ['Debug', 'Release', 'RelWithDebInfo']
+        # targets present in multiple configurations are only listed once
+        assert sorted(data['targets'].keys()) == sorted(TARGETS.keys())
+
+
+def test_get_file_api_data_stale_reply():
+    with tempfile.TemporaryDirectory() as build_space:
+        write_file_api_reply(build_space)
+        # a reply referencing files which have been removed in the meantime
+        os.remove(os.path.join(build_space, '.cmake', 'api', 'v1', 'reply', 'target-foo.json'))
+        assert get_file_api_data(build_space) is None
+        assert has_build_target(build_space, 'foo') is None
+        assert has_build_target(build_space, 'install') is None
+
+    with tempfile.TemporaryDirectory() as build_space:
+        write_file_api_reply(build_space)
+        # an index without a response to the query of ament_tools
+        _write_json(build_space, 'index-2018-01-01T00-00-00-0001.json', {
+            'cmake': {'generator': {'name': 'Ninja'}}, 'reply': {}})
+        assert get_file_api_data(build_space) is None
+
+
+def test_get_file_api_data_invalidation():
+    with tempfile.TemporaryDirectory() as build_space:
+        write_file_api_reply(build_space)
+        assert has_build_target(build_space, 'foo')
+        assert not has_build_target(build_space, 'baz')
+
+        # a reconfigure writes a new index, the old one is removed by CMake
+        targets = dict(TARGETS)
+        targets['baz'] = ('EXECUTABLE', ['bar'], 'Runtime')
+        os.remove(os.path.join(
+            build_space, '.cmake', 'api', 'v1', 'reply', 'index-2018-01-01T00-00-00-0000.json'))
+        write_file_api_reply(
+            build_space, targets=targets, index_name='index-2018-01-02T00-00-00-0000.json')
+        assert has_build_target(build_space, 'baz')
+        assert get_cached_config(build_space, FILE_API_CACHE)['index'] == \
+            'index-2018-01-02T00-00-00-0000.json'
+
+        # without the data in memory the data cached on disk is used
+        cmake_file_api._file_api_cache.pop(build_space)
+        os.remove(os.path.join(build_space, '.cmake', 'api', 'v1', 'reply', 'target-baz.json'))
+        assert has_build_target(build_space, 'baz')
+
+        # the data cached on disk is ignored once the index changes
+        write_file_api_reply(build_space, index_name='index-2018-01-03T00-00-00-0000.json')
+        assert not has_build_target(build_space, 'baz')
+
+
+def test_has_build_target():
+    with tempfile.TemporaryDirectory() as build_space:
+        assert has_build_target(build_space, 'foo') is None
+
+        write_file_api_reply(build_space)
+        assert has_build_target(build_space, 'foo') is True
+        assert has_build_target(build_space, 'gen') is True
+        assert has_build_target(build_space, 'missing') is False
+        assert has_build_target(build_space, 'install') is True
+        # the test target only exists if CTest is enabled
+        assert has_build_target(build_space, 'test') is False
+        with open(os.path.join(build_space, 'CTestTestfile.cmake'), 'w'):
+            pass
+        assert has_build_target(build_space, 'test') is True
+
+
+def test_get_partial_build():
+    with tempfile.TemporaryDirectory() as build_space:
+        assert get_partial_build(build_space, ['foo']) is None
+
+        write_file_api_reply(build_space)
+        # the whole install component of a target is built and installed
+        assert get_partial_build(build_space, ['foo']) == \
+            (['foo', 'foo_tool'], ['Headers', 'Runtime'])
+        assert get_partial_build(build_space, ['foo_tool']) == \
+            (['foo', 'foo_tool'], ['Headers', 'Runtime'])
+        assert get_partial_build(build_space, ['bar']) == (['bar'], ['Development', 'Headers'])
+        # targets which aren't installed only need the components without targets
+        assert get_partial_build(build_space, ['gen']) == (['gen'], ['Headers'])
+        assert get_partial_build(build_space, ['bar', 'gen']) == \
+            (['bar', 'gen'], ['Development', 'Headers'])
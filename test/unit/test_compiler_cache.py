@@ -0,0 +1,67 @@
+# Copyright 2018 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import tempfile
+
+from ament_tools.build_types.compiler_cache import COMPILER_CACHE_STATS_LOG
+from ament_tools.build_types.compiler_cache import read_compiler_cache_stats
+from ament_tools.build_types.compiler_cache import SCCACHE_STATS_FILE
+
+CCACHE_STATS_LOG = """\
+# foo.cpp
+cache_miss
+# bar.cpp
+direct_cache_hit
+# baz.cpp
+preprocessed_cache_hit
+# main.cpp
+direct_cache_hit
+called_for_link
+"""
+
+SCCACHE_STATS = {
+    'stats': {
+        'compile_requests': 7,
+        'requests_executed': 6,
+        'cache_hits': {'counts': {'C/C++': 4, 'CUDA': 1}},
+        'cache_misses': {'counts': {'C/C++': 1}},
+        'non_cacheable_calls': 1,
+    },
+}
+
+
+def test_read_compiler_cache_stats():
+    with tempfile.TemporaryDirectory() as build_space:
+        assert read_compiler_cache_stats(build_space) is None
+
+        with open(os.path.join(build_space, COMPILER_CACHE_STATS_LOG), 'w') as h:
+            h.write(CCACHE_STATS_LOG)
+        assert read_compiler_cache_stats(build_space) == (3, 1)
+
+    with tempfile.TemporaryDirectory() as build_space:
+        path = os.path.join(build_space, SCCACHE_STATS_FILE)
+        with open(path, 'w') as h:
+            json.dump(SCCACHE_STATS, h)
+        assert read_compiler_cache_stats(build_space) == (5, 1)
+
+        # older versions of sccache report plain numbers
+        with open(path, 'w') as h:
+            json.dump({'stats': {'cache_hits': 2, 'cache_misses': 3}}, h)
+        assert read_compiler_cache_stats(build_space) == (2, 3)
+
+        with open(path, 'w') as h:
+            h.write('not json')
+        assert read_compiler_cache_stats(build_space) is None
@@ -0,0 +1,86 @@
+# Copyright 2018 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import os
+import sys
+from threading import Thread
+import time
+
+from ament_tools import distributed
+
+
+def _start_worker(slots):
+    # the job echoes its options and exits with the requested return code
+    job_command = [
+        sys.executable, '-c',
+        'import json, sys, time; options = json.loads(sys.stdin.read()); '
+        "print(options['path']); sys.stdout.flush(); "
+        "time.sleep(options.get('sleep', 0)); sys.exit(options['rc'])"]
+    server = distributed.WorkerServer(
+        ('127.0.0.1', 0), slots, job_command=job_command, heartbeat_interval=0.1)
+    thread = Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def test_parse_address():
+    assert distributed.parse_address('host') == ('host', distributed.DEFAULT_PORT)
+    assert distributed.parse_address('host:1234') == ('host', 1234)
+
+
+def test_get_plain_options():
+    opts = argparse.Namespace(path='foo', cmake_args=['-DA=1'], main=test_parse_address)
+    assert distributed.get_plain_options(opts) == {'path': 'foo', 'cmake_args': ['-DA=1']}
+
+
+def test_coordinator(capsys):
+    servers = [_start_worker(1), _start_worker(2)]
+    try:
+        coordinator = distributed.Coordinator(
+            ['127.0.0.1:%d' % s.server_address[1] for s in servers])
+        assert coordinator.slots == 3
+        opts = argparse.Namespace(path='pkg_a', directory=os.getcwd(), rc=0)
+        assert coordinator.run_job(opts) == 0
+        opts = argparse.Namespace(path='pkg_b', directory=os.getcwd(), rc=3)
+        assert coordinator.run_job(opts) == 3
+        coordinator.close()
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+    out = capsys.readouterr().out
+    assert 'pkg_a' in out
+    assert 'pkg_b' in out
+
+
+def test_coordinator_stop():
+    server = _start_worker(1)
+    try:
+        coordinator = distributed.Coordinator(['127.0.0.1:%d' % server.server_address[1]])
+        results = []
+        opts = argparse.Namespace(path='pkg_a', directory=os.getcwd(), rc=0, sleep=60)
+        thread = Thread(target=lambda: results.append(coordinator.run_job(opts)))
+        thread.start()
+        time.sleep(1)
+        # the running job is terminated instead of finishing
+        coordinator.stop()
+        thread.join(timeout=30)
+        assert not thread.is_alive()
+        assert results and results[0] != 0
+        coordinator.close()
+    finally:
+        server.shutdown()
+        server.server_close()
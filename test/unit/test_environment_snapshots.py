@@ -0,0 +1,61 @@
+# Copyright 2018 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+
+import pytest
+
+from ament_tools import environment_snapshots
+
+
+def _create_package(prefix, name):
+    share_path = os.path.join(prefix, 'share', name)
+    os.makedirs(share_path)
+    with open(os.path.join(share_path, 'local_setup.sh'), 'w') as h:
+        h.write(
+            'export AMENT_PREFIX_PATH="%s${AMENT_PREFIX_PATH:+:$AMENT_PREFIX_PATH}"\n'
+            'export %s_FOUND=1\n' % (prefix, name.upper()))
+    return share_path
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='requires a POSIX shell')
+def test_dependency_environment():
+    with tempfile.TemporaryDirectory() as basepath:
+        build_space_base = os.path.join(basepath, 'build')
+        share_a = _create_package(os.path.join(basepath, 'install', 'a'), 'a')
+        share_b = _create_package(os.path.join(basepath, 'install', 'b'), 'b')
+
+        snapshot = environment_snapshots.capture_environment_snapshot(
+            os.path.join(share_a, 'local_setup.sh'),
+            base_env={'AMENT_PREFIX_PATH': '/opt/ros'})
+        assert snapshot == {
+            'AMENT_PREFIX_PATH': ('prepend', os.path.join(basepath, 'install', 'a')),
+            'A_FOUND': ('set', '1'),
+        }
+
+        env = environment_snapshots.get_dependency_environment(
+            build_space_base, [share_a, share_b], base_env={'AMENT_PREFIX_PATH': '/opt/ros'})
+        assert env['AMENT_PREFIX_PATH'] == os.pathsep.join([
+            os.path.join(basepath, 'install', 'b'),
+            os.path.join(basepath, 'install', 'a'),
+            '/opt/ros'])
+        assert env['A_FOUND'] == '1'
+        assert env['B_FOUND'] == '1'
+        assert os.path.isfile(os.path.join(
+            build_space_base, environment_snapshots.SNAPSHOT_DIRECTORY, 'a.json'))
+
+        # the snapshot is captured again in a different environment
+        assert environment_snapshots._get_snapshot_key(share_a, {'PATH': '/usr/bin'}) != \
+            environment_snapshots._get_snapshot_key(share_a, {'PATH': '/opt/bin'})
@@ -0,0 +1,89 @@
+# Copyright 2018 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+
+from ament_tools import fingerprint
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as h:
+        h.write(content)
+
+
+def test_source_fingerprint():
+    with tempfile.TemporaryDirectory() as source_space:
+        _write(os.path.join(source_space, 'package.xml'), '<package/>')
+        _write(os.path.join(source_space, 'src', 'foo.c'), 'int foo;')
+        _write(os.path.join(source_space, '.git', 'HEAD'), 'ref')
+        _write(os.path.join(source_space, 'build', 'CMakeCache.txt'), '')
+
+        files = fingerprint.compute_source_files(
+            source_space, ignored_paths=[os.path.join(source_space, 'build')])
+        assert sorted(files.keys()) == ['package.xml', os.path.join('src', 'foo.c')]
+        source_fingerprint = fingerprint.compute_source_fingerprint(files)
+
+        # unchanged stats reuse the previous hashes
+        previous = {k: v[:2] + ['cached'] for k, v in files.items()}
+        cached = fingerprint.compute_source_files(source_space, previous_files=previous)
+        assert cached['package.xml'][2] == 'cached'
+
+        _write(os.path.join(source_space, 'src', 'foo.c'), 'int bar;')
+        files2 = fingerprint.compute_source_files(source_space, previous_files=files)
+        assert fingerprint.compute_source_fingerprint(files2) != source_fingerprint
+
+
+def test_explain_changes():
+    previous = {
+        'files': {'a': [0, 0, 'x'], 'b': [0, 0, 'y']},
+        'options': {'cmake_args': []},
+        'dependencies': {'dep': '1'},
+    }
+    current = {
+        'files': {'a': [1, 0, 'z']},
+        'options': {'cmake_args': ['-DFOO=1']},
+        'dependencies': {'dep': '2'},
+    }
+    reasons = fingerprint.explain_changes(previous, current)
+    assert reasons == [
+        'changed files: a',
+        'removed files: b',
+        'changed options: cmake_args',
+        'changed dependencies: dep',
+    ]
+    assert fingerprint.explain_changes(None, current) == ['no previous successful build']
+    assert fingerprint.compute_package_fingerprint('s', {}, {}) != \
+        fingerprint.compute_package_fingerprint('s', {}, {'dep': '1'})
+
+
+def test_tree_stamp():
+    with tempfile.TemporaryDirectory() as build_space:
+        _write(os.path.join(build_space, 'lib', 'libfoo.so'), 'foo')
+        _write(os.path.join(build_space, 'Testing', 'results.xml'), '')
+        ignored_paths = [os.path.join(build_space, 'Testing')]
+        stamp = fingerprint.compute_tree_stamp(build_space, ignored_paths=ignored_paths)
+        assert stamp[1] == 1
+
+        # ignored and removed files don't affect the stamp
+        _write(os.path.join(build_space, 'Testing', 'other.xml'), '')
+        _write(os.path.join(build_space, 'tmp', 'progress'), '')
+        os.remove(os.path.join(build_space, 'tmp', 'progress'))
+        assert fingerprint.compute_tree_stamp(
+            build_space, ignored_paths=ignored_paths) == stamp
+
+        os.utime(os.path.join(build_space, 'lib', 'libfoo.so'), ns=(0, stamp[0] + 1))
+        assert fingerprint.compute_tree_stamp(
+            build_space, ignored_paths=ignored_paths) != stamp
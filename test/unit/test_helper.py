@@ -12,7 +12,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import argparse
+import os
+import tempfile
+
+import pytest
+
 from ament_tools import helper
+from ament_tools.context import Context
 
 
 def test_extract_jobs_flags():
@@ -74,3 +81,143 @@ def test_extract_argument_group():
     expected = (['foo', 'bar'], [])
     results = extract_argument_group(args, '--args')
     assert expected == results, (args, expected, results)
+
+
+def test_argparse_priorities():
+    assert helper.argparse_nice_level('test=10') == ('test', 10)
+    assert helper.argparse_ionice_class('install=idle') == ('install', 'idle')
+    for argument in ['10', 'compile=10', 'test=high', 'test=20']:
+        try:
+            helper.argparse_nice_level(argument)
+        except argparse.ArgumentTypeError:
+            pass
+        else:
+            assert False, "should not accept '{0}'".format(argument)
+    try:
+        helper.argparse_ionice_class('install=realtime')
+    except argparse.ArgumentTypeError:
+        pass
+    else:
+        assert False, "should not accept 'install=realtime'"
+
+
+def test_deploy_file():
+    with tempfile.TemporaryDirectory() as base:
+        source_space = os.path.join(base, 'src')
+        os.makedirs(source_space)
+        with open(os.path.join(source_space, 'hook.sh'), 'w') as h:
+            h.write('export FOO=1\n')
+        context = Context()
+        context.install_space = os.path.join(base, 'install')
+        context.symlink_install = False
+
+        helper.deploy_file(context, source_space, 'hook.sh', 'share', executable=True)
+        destination_path = os.path.join(context.install_space, 'share', 'hook.sh')
+        with open(destination_path, 'r') as h:
+            assert h.read() == 'export FOO=1\n'
+        assert os.access(destination_path, os.X_OK)
+        helper.flush_deploy_manifest(context.install_space)
+        assert os.path.isfile(
+            os.path.join(context.install_space, helper.DEPLOY_MANIFEST_FILENAME))
+
+        # unchanged files are skipped without touching the destination
+        inode = os.stat(destination_path).st_ino
+        context.deployed_files = []
+        helper.deploy_file(context, source_space, 'hook.sh', 'share', executable=True)
+        assert os.stat(destination_path).st_ino == inode
+        assert context.deployed_files == [destination_path]
+
+        with open(os.path.join(source_space, 'hook.sh'), 'w') as h:
+            h.write('export FOO=2\n')
+        helper.deploy_file(context, source_space, 'hook.sh', 'share', executable=True)
+        with open(destination_path, 'r') as h:
+            assert h.read() == 'export FOO=2\n'
+
+
+def test_deploy_file_link_mode():
+    with tempfile.TemporaryDirectory() as base:
+        source_space = os.path.join(base, 'src')
+        os.makedirs(source_space)
+        source_path = os.path.join(source_space, 'data.txt')
+        with open(source_path, 'w') as h:
+            h.write('data')
+        context = Context()
+        context.source_space = source_space
+        context.build_space = os.path.join(base, 'build')
+        context.install_space = os.path.join(base, 'install')
+        context.symlink_install = False
+        context.install_mode = 'link'
+
+        helper.deploy_file(context, source_space, 'data.txt', 'share')
+        destination_path = os.path.join(context.install_space, 'share', 'data.txt')
+        with open(destination_path, 'r') as h:
+            assert h.read() == 'data'
+
+        # hardlinks are removed before the install step and deployed again
+        if os.stat(destination_path).st_nlink > 1:
+            helper.break_deployed_hardlinks(context)
+            assert not os.path.exists(destination_path)
+            assert os.path.exists(source_path)
+            helper.deploy_file(context, source_space, 'data.txt', 'share')
+            assert os.path.exists(destination_path)
+
+
+def test_link_installed_files():
+    with tempfile.TemporaryDirectory() as base:
+        context = Context()
+        context.source_space = os.path.join(base, 'src')
+        context.build_space = os.path.join(base, 'build')
+        context.install_space = os.path.join(base, 'install')
+        files = {
+            os.path.join(context.source_space, 'include', 'foo.h'): 'header',
+            os.path.join(context.build_space, 'libfoo.so'): 'library',
+            os.path.join(context.install_space, 'include', 'foo.h'): 'header',
+            # e.g. the RPATH has been changed while installing
+            os.path.join(context.install_space, 'lib', 'libfoo.so'): 'changed',
+        }
+        for path, content in files.items():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as h:
+                h.write(content)
+        installed_files = [
+            os.path.join(context.install_space, 'include', 'foo.h'),
+            os.path.join(context.install_space, 'lib', 'libfoo.so')]
+
+        assert helper.link_installed_files(context, installed_files) == 1
+        with open(installed_files[0], 'r') as h:
+            assert h.read() == 'header'
+        with open(installed_files[1], 'r') as h:
+            assert h.read() == 'changed'
+        assert sorted(os.listdir(os.path.join(context.install_space, 'include'))) == ['foo.h']
+
+        # hardlinked files are removed before the next install step
+        helper.break_deployed_hardlinks(context)
+        if os.path.exists(installed_files[0]):
+            assert os.stat(installed_files[0]).st_nlink == 1
+
+
+def test_write_file_if_changed(monkeypatch):
+    with tempfile.TemporaryDirectory() as base:
+        path = os.path.join(base, 'local_setup.sh')
+        assert helper.write_file_if_changed(path, 'content\n')
+        os.utime(path, ns=(0, 0))
+        assert not helper.write_file_if_changed(path, 'content\n')
+        assert os.stat(path).st_mtime_ns == 0
+        assert helper.write_file_if_changed(path, 'changed\n')
+        with open(path, 'r') as h:
+            assert h.read() == 'changed\n'
+        assert os.listdir(base) == ['local_setup.sh']
+
+        # the mode of the existing file is preserved
+        os.chmod(path, 0o750)
+        assert helper.write_file_if_changed(path, 'executable\n')
+        assert os.stat(path).st_mode & 0o777 == 0o750
+
+        # the temporary file is removed on failure
+        def replace(src, dst):
+            raise OSError('replace failed')
+
+        monkeypatch.setattr(helper.os, 'replace', replace)
+        with pytest.raises(OSError):
+            helper.write_file_if_changed(path, 'failure\n')
+        assert os.listdir(base) == ['local_setup.sh']
@@ -0,0 +1,61 @@
+# Copyright 2018 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+from ament_tools.python_workers import is_python_worker_command
+from ament_tools.python_workers import run_in_python_worker
+
+
+def test_is_python_worker_command():
+    if not hasattr(os, 'fork'):
+        pytest.skip('fork is not available')
+    assert is_python_worker_command(['python3', 'setup.py', 'build'])
+    assert is_python_worker_command(['python3', '-c', 'print()'])
+    assert not is_python_worker_command(['python3', '-m', 'pytest'])
+    assert not is_python_worker_command(['cmake', '--build', '.'])
+    assert not is_python_worker_command(['.', 'setup.sh', '&&', 'python3', 'setup.py'])
+
+
+def test_run_in_python_worker():
+    if not hasattr(os, 'fork'):
+        pytest.skip('fork is not available')
+    with tempfile.TemporaryDirectory() as basepath:
+        output_path = os.path.join(basepath, 'output')
+        env = dict(os.environ)
+        env.pop('PYTHONPATH', None)
+        code = 'import os, sys; print(os.getcwd(), os.environ.get("VALUE"), sys.argv)'
+        for value in ['first', 'second']:
+            rc = run_in_python_worker(
+                [sys.executable, '-c', code, 'arg'], basepath,
+                env=dict(env, VALUE=value), stdout=output_path)
+            assert rc == 0
+            with open(output_path, 'r') as h:
+                assert h.read() == "%s %s ['-c', 'arg']\n" % (
+                    os.path.realpath(basepath), value)
+
+        # the environment of a previous job doesn't leak into the next one
+        rc = run_in_python_worker(
+            [sys.executable, '-c', code], basepath, env=env, stdout=output_path)
+        assert rc == 0
+        with open(output_path, 'r') as h:
+            assert ' None ' in h.read()
+
+        rc = run_in_python_worker(
+            [sys.executable, '-c', 'import sys; sys.exit(3)'], basepath, env=env)
+        assert rc == 3
@@ -0,0 +1,53 @@
+# Copyright 2018 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+from threading import Thread
+
+from ament_tools.artifact_cache import ArtifactCache
+from ament_tools.remote_artifact_cache import ArtifactServer
+from ament_tools.remote_artifact_cache import RemoteArtifactCache
+
+
+def test_upload_and_fetch():
+    with tempfile.TemporaryDirectory() as basepath:
+        server = ArtifactServer(('127.0.0.1', 0), os.path.join(basepath, 'server'), quiet=True)
+        thread = Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        try:
+            remote = RemoteArtifactCache('http://127.0.0.1:%d' % server.server_address[1])
+            key = 'a' * 64
+
+            install_space = os.path.join(basepath, 'install')
+            os.makedirs(install_space)
+            with open(os.path.join(install_space, 'data'), 'w') as h:
+                h.write('content')
+            cache = ArtifactCache(os.path.join(basepath, 'cache'))
+            cache.store(key, install_space, ['data'])
+
+            other_cache = ArtifactCache(os.path.join(basepath, 'other_cache'))
+            assert not remote.fetch(key, other_cache)
+            remote.upload(key, cache)
+            assert remote.wait_for_uploads() == 0
+            assert remote.fetch(key, other_cache)
+
+            other_install_space = os.path.join(basepath, 'other_install')
+            assert other_cache.restore(key, other_install_space) is not None
+            with open(os.path.join(other_install_space, 'data'), 'r') as h:
+                assert h.read() == 'content'
+        finally:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,64 @@
+# Copyright 2018 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import OrderedDict
+
+from ament_tools.super_build import partition_super_build_jobs
+from ament_tools.super_build import rewrite_package_build_file
+
+
+def test_partition_super_build_jobs():
+    jobs = OrderedDict([
+        ('msgs', {'depends': []}),
+        ('py_util', {'depends': []}),
+        ('core', {'depends': ['msgs', 'py_util']}),
+        ('py_tool', {'depends': ['core', 'msgs', 'py_util']}),
+        ('gui', {'depends': ['core', 'msgs', 'py_tool', 'py_util']}),
+        ('plugin', {'depends': ['core', 'msgs', 'py_util']}),
+    ])
+    build_types = {
+        'core': 'ament_cmake', 'gui': 'cmake', 'msgs': 'ament_cmake',
+        'plugin': 'ament_cmake', 'py_tool': 'ament_python', 'py_util': 'ament_python'}
+    pre_jobs, super_jobs, post_jobs = partition_super_build_jobs(jobs, build_types)
+    assert list(pre_jobs.keys()) == ['py_util']
+    assert list(super_jobs.keys()) == ['msgs', 'core', 'plugin']
+    assert list(post_jobs.keys()) == ['py_tool', 'gui']
+
+
+def test_rewrite_package_build_file():
+    content = '\n'.join([
+        'include pkg/CMakeFiles/rules.ninja',
+        'build cmake_object_order_depends_target_lib: phony || pkg/CMakeFiles/lib.dir',
+        'build pkg/CMakeFiles/lib.dir/lib.c.o: C_COMPILER__lib_ /src/pkg/lib.c $',
+        '    || cmake_object_order_depends_target_lib',
+        '  FLAGS = -O2',
+        'build pkg/liblib.a: C_STATIC_LIBRARY_LINKER__lib_ pkg/CMakeFiles/lib.dir/lib.c.o',
+        'build pkg/build.ninja: RERUN_CMAKE | /src/pkg/CMakeLists.txt pkg/CMakeCache.txt',
+        '  pool = console',
+        'build /src/pkg/CMakeLists.txt pkg/CMakeCache.txt: phony',
+        'build pkg/all: phony pkg/liblib.a',
+    ])
+    lines = rewrite_package_build_file(
+        content, 'pkg', ['.super_build/dep.installed']).splitlines()
+    assert lines == [
+        'include pkg/CMakeFiles/rules.ninja',
+        'build pkg/cmake_object_order_depends_target_lib: phony '
+        '|| .super_build/dep.installed pkg/CMakeFiles/lib.dir',
+        'build pkg/CMakeFiles/lib.dir/lib.c.o: C_COMPILER__lib_ /src/pkg/lib.c '
+        '|| .super_build/dep.installed pkg/cmake_object_order_depends_target_lib',
+        '  FLAGS = -O2',
+        'build pkg/liblib.a: C_STATIC_LIBRARY_LINKER__lib_ pkg/CMakeFiles/lib.dir/lib.c.o '
+        '|| .super_build/dep.installed',
+        'build pkg/all: phony pkg/liblib.a || .super_build/dep.installed',
+    ]
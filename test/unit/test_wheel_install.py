@@ -0,0 +1,112 @@
+# Copyright 2018 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import zipfile
+
+from ament_tools.wheel_install import install_wheel
+from ament_tools.wheel_install import sync_source_tree
+
+
+def _write_wheel(path, files):
+    with zipfile.ZipFile(path, 'w') as wheel:
+        for name, content in files.items():
+            wheel.writestr(name, content)
+
+
+def test_install_wheel():
+    with tempfile.TemporaryDirectory() as basepath:
+        install_space = os.path.join(basepath, 'install')
+        python_lib = os.path.join('lib', 'site-packages')
+        manifest = os.path.join(basepath, 'install.log')
+        wheel_path = os.path.join(basepath, 'foo-0.1-py3-none-any.whl')
+
+        _write_wheel(wheel_path, {
+            'foo/__init__.py': '',
+            'foo/old.py': '',
+            'foo-0.1.dist-info/WHEEL': 'Wheel-Version: 1.0\n',
+            'foo-0.1.dist-info/RECORD': '',
+            'foo-0.1.dist-info/entry_points.txt':
+                '[console_scripts]\nfoo = foo.cli:main\n',
+            'foo-0.1.data/scripts/bar': '#!python\nprint()\n',
+            'foo-0.1.data/data/share/foo/data.txt': 'data',
+        })
+        installed_files = install_wheel(
+            wheel_path, install_space, python_lib, '/usr/bin/python3', manifest)
+        lib_path = os.path.join(install_space, python_lib)
+        assert sorted(os.path.relpath(f, install_space) for f in installed_files) == sorted([
+            os.path.join('bin', 'bar'),
+            os.path.join('bin', 'foo'),
+            os.path.join(python_lib, 'foo', '__init__.py'),
+            os.path.join(python_lib, 'foo', 'old.py'),
+            os.path.join(python_lib, 'foo-0.1.dist-info', 'INSTALLER'),
+            os.path.join(python_lib, 'foo-0.1.dist-info', 'RECORD'),
+            os.path.join(python_lib, 'foo-0.1.dist-info', 'WHEEL'),
+            os.path.join(python_lib, 'foo-0.1.dist-info', 'entry_points.txt'),
+            os.path.join('share', 'foo', 'data.txt'),
+        ])
+        with open(os.path.join(install_space, 'bin', 'bar'), 'r') as h:
+            assert h.readline() == '#!/usr/bin/python3\n'
+        with open(os.path.join(install_space, 'bin', 'foo'), 'r') as h:
+            assert 'from foo.cli import main' in h.read()
+        with open(manifest, 'r') as h:
+            assert h.read().splitlines() == installed_files
+
+        # files which are not part of the wheel anymore are removed
+        _write_wheel(wheel_path, {
+            'foo/__init__.py': '',
+            'foo-0.1.dist-info/WHEEL': 'Wheel-Version: 1.0\n',
+        })
+        installed_files = install_wheel(
+            wheel_path, install_space, python_lib, '/usr/bin/python3', manifest)
+        assert len(installed_files) == 4
+        assert not os.path.exists(os.path.join(lib_path, 'foo', 'old.py'))
+        assert not os.path.exists(os.path.join(install_space, 'bin'))
+        assert not os.path.exists(os.path.join(install_space, 'share'))
+
+
+def test_sync_source_tree():
+    with tempfile.TemporaryDirectory() as basepath:
+        source_space = os.path.join(basepath, 'src')
+        for rel_path in [
+            os.path.join('foo', '__init__.py'),
+            os.path.join('foo', 'build', 'data.txt'),
+            os.path.join('foo', '__pycache__', 'x.pyc'),
+            os.path.join('build', 'lib', 'foo.py'),
+            os.path.join('foo.egg-info', 'PKG-INFO'),
+            os.path.join('shared', 'data.txt'),
+        ]:
+            os.makedirs(os.path.join(source_space, os.path.dirname(rel_path)), exist_ok=True)
+            with open(os.path.join(source_space, rel_path), 'w') as h:
+                h.write('')
+        os.symlink(
+            os.path.join(source_space, 'shared'), os.path.join(source_space, 'foo', 'shared'))
+        path = os.path.join(basepath, 'mirror')
+
+        sync_source_tree(source_space, path)
+        assert os.path.islink(os.path.join(path, 'foo', '__init__.py'))
+        assert os.path.islink(os.path.join(path, 'foo', 'build', 'data.txt'))
+        assert os.path.islink(os.path.join(path, 'foo', 'shared'))
+        assert os.path.exists(os.path.join(path, 'foo', 'shared', 'data.txt'))
+        assert not os.path.exists(os.path.join(path, 'foo', '__pycache__'))
+        assert not os.path.exists(os.path.join(path, 'build'))
+        assert not os.path.exists(os.path.join(path, 'foo.egg-info'))
+
+        # removed files and symlinked directories are removed from the mirror
+        os.remove(os.path.join(source_space, 'foo', 'shared'))
+        os.remove(os.path.join(source_space, 'foo', '__init__.py'))
+        sync_source_tree(source_space, path)
+        assert not os.path.lexists(os.path.join(path, 'foo', 'shared'))
+        assert not os.path.lexists(os.path.join(path, 'foo', '__init__.py'))